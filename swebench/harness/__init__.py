@@ -1,8 +1,18 @@
 from swebench.harness import (
+    build_graph,
+    buildkit,
+    container_pool,
+    docker_async,
     docker_build,
     docker_utils,
+    log_capture,
+    parsed_log_cache,
     grading,
+    image_cache,
+    image_inventory,
+    image_prefetch,
     prepare_images,
+    regrade,
     remove_containers,
     reporting,
     run_evaluation,
@@ -12,13 +22,24 @@ from swebench.harness import (
     log_parsers,
     modal_eval,
     test_spec,
+    validation_ledger,
 )
 
 __all__ = [
+    "build_graph",
+    "buildkit",
+    "container_pool",
+    "docker_async",
     "docker_build",
     "docker_utils",
+    "log_capture",
+    "parsed_log_cache",
     "grading",
+    "image_cache",
+    "image_inventory",
+    "image_prefetch",
     "prepare_images",
+    "regrade",
     "remove_containers",
     "reporting",
     "run_evaluation",
@@ -28,4 +49,5 @@ __all__ = [
     "log_parsers",
     "modal_eval",
     "test_spec",
+    "validation_ledger",
 ]
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import heapq
+import traceback
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+from tqdm import tqdm
+
+# Rough relative build times of the image kinds, used to find the critical path
+# (env images install the dependencies, instance images only check out the repo)
+BUILD_COST = {"base": 5, "env": 10, "instance": 1}
+IMAGE_KINDS = list(BUILD_COST)
+
+
+@dataclass
+class BuildNode:
+    image_name: str
+    kind: str
+    func: Callable
+    args: tuple
+    parent: str | None = None
+    children: list[str] = field(default_factory=list)
+    # Build cost of the longest chain of builds starting at this image
+    priority: int = 0
+
+
+class BuildGraph:
+    """
+    Dependency graph of image builds (base -> env -> instance).
+
+    An image becomes ready to build as soon as its parent image is built, so
+    e.g. the instance images of an env image start building right after it, not
+    after every env image. Among the ready images, the one starting the longest
+    remaining chain of builds (the critical path) goes first. When a build
+    fails, every image depending on it is skipped.
+    """
+
+    def __init__(self):
+        self.nodes: dict[str, BuildNode] = {}
+        self.succeeded: list[str] = []
+        self.failed: list[str] = []
+        self.skipped: list[str] = []
+        self.building: set[str] = set()
+        self._ready: list[tuple[int, int, str]] | None = None
+        self._pending = 0
+        self._order = 0
+
+    def add(
+        self,
+        image_name: str,
+        kind: str,
+        func: Callable,
+        args: tuple,
+        parent: str | None = None,
+    ):
+        """
+        Add an image build to the graph.
+
+        Args:
+            image_name (str): Name of the image
+            kind (str): Kind of image ("base", "env" or "instance")
+            func (Callable): Function building the image
+            args (tuple): Arguments of `func`
+            parent (str): Image the image is built from; if it is not in the graph
+                (e.g. it exists already), the image is ready to build right away
+        """
+        if image_name in self.nodes:
+            return
+        self.nodes[image_name] = BuildNode(image_name, kind, func, args, parent)
+
+    def __len__(self):
+        """Number of builds not yet started (or skipped)"""
+        self._prepare()
+        return self._pending
+
+    def _prepare(self):
+        if self._ready is not None:
+            return
+        roots = []
+        for node in self.nodes.values():
+            if node.parent in self.nodes:
+                self.nodes[node.parent].children.append(node.image_name)
+            else:
+                roots.append(node)
+        # Depth of the graph is bounded by the image kinds, so recursion is fine
+        for node in roots:
+            self._set_priority(node)
+        self._ready = []
+        for node in roots:
+            self._push(node)
+        self._pending = len(self.nodes)
+
+    def _push(self, node: BuildNode):
+        # Ties are broken by the order images became ready
+        heapq.heappush(self._ready, (-node.priority, self._order, node.image_name))
+        self._order += 1
+
+    def _set_priority(self, node: BuildNode) -> int:
+        node.priority = BUILD_COST.get(node.kind, 1) + max(
+            (self._set_priority(self.nodes[c]) for c in node.children), default=0
+        )
+        return node.priority
+
+    def next(self) -> BuildNode | None:
+        """
+        Return the next image to build, or None if no image can start until a
+        running build finishes (or everything has been started).
+        """
+        self._prepare()
+        if not self._ready:
+            return None
+        node = self.nodes[heapq.heappop(self._ready)[2]]
+        self._pending -= 1
+        self.building.add(node.image_name)
+        return node
+
+    def done(self, image_name: str, success: bool):
+        """Mark a build as finished, making its children ready or skipping them"""
+        self.building.discard(image_name)
+        node = self.nodes[image_name]
+        if success:
+            self.succeeded.append(image_name)
+            for child in node.children:
+                self._push(self.nodes[child])
+            return
+        self.failed.append(image_name)
+        stack = list(node.children)
+        while stack:
+            child = self.nodes[stack.pop()]
+            self.skipped.append(child.image_name)
+            self._pending -= 1
+            stack.extend(child.children)
+
+    def progress(self) -> str:
+        """Summary of the state of the graph, e.g. for a progress bar"""
+        finished = set(self.succeeded)
+        counts = []
+        for kind in IMAGE_KINDS:
+            names = [n for n, node in self.nodes.items() if node.kind == kind]
+            if names:
+                built = sum(name in finished for name in names)
+                counts.append(f"{kind} {built}/{len(names)}")
+        summary = ", ".join(counts)
+        summary += f" | {len(self.building)} building, {len(self.failed)} failed"
+        if self.skipped:
+            summary += f", {len(self.skipped)} skipped"
+        return summary
+
+
+def run_build_graph(
+    graph: BuildGraph, max_workers: int
+) -> tuple[list[str], list[str]]:
+    """
+    Run the builds of a graph in a thread pool, starting each build as soon as its
+    parent image is built.
+
+    Args:
+        graph (BuildGraph): Image builds to run
+        max_workers (int): Maximum number of concurrent builds
+    Returns:
+        tuple: names of the images built, and of the images that failed to build
+            or were skipped because an image they depend on failed to build
+    """
+    max_workers = max(max_workers, 1)
+    with tqdm(total=len(graph.nodes), smoothing=0) as pbar:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            while len(graph) or futures:
+                while len(futures) < max_workers:
+                    node = graph.next()
+                    if node is None:
+                        break
+                    futures[executor.submit(node.func, *node.args)] = node
+                if not futures:
+                    break
+                pbar.set_description(graph.progress())
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = futures.pop(future)
+                    skipped = len(graph.skipped)
+                    try:
+                        future.result()
+                        graph.done(node.image_name, True)
+                    except Exception as e:
+                        print(f"{type(e)}: {e}")
+                        traceback.print_exc()
+                        graph.done(node.image_name, False)
+                    pbar.update(1 + len(graph.skipped) - skipped)
+                pbar.set_description(graph.progress())
+    return graph.succeeded, graph.failed + graph.skipped
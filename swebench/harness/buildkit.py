@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import logging
+import re
+import subprocess
+
+from pathlib import Path
+
+from swebench.harness.utils import ansi_escape
+
+# Download caches of the package managers used by the setup scripts, mounted as
+# BuildKit cache mounts so they persist across builds without ending up in images
+CACHE_MOUNT_TARGETS = [
+    "/root/.cache/pip",
+    "/root/.cache/conda/pkgs",
+    # Only npm's content cache: ~/.npm also holds its logs and the npx installs
+    "/root/.npm/_cacache",
+    "/usr/local/share/.cache/yarn",
+    # Only the downloaded crates: cargo builds from the sources it extracts to
+    # registry/src, which have to end up in the image
+    "/root/.cargo/registry/cache",
+    "/usr/local/cargo/registry/cache",
+]
+# Conda only uses the cache mount if it is its first package directory. Set as a
+# build argument of each stage, so every RUN command of the stage sees it without
+# it ending up in the environment of the image
+CONDA_PKGS_DIRS = "/root/.cache/conda/pkgs,/opt/miniconda3/pkgs"
+CONDA_PKGS_DIRS_ARG = f"ARG CONDA_PKGS_DIRS={CONDA_PKGS_DIRS}"
+
+# RUN instructions that install dependencies (and so benefit from the caches):
+# running the setup scripts, or running a package manager directly
+INSTALL_RUN = re.compile(
+    r"^RUN (?!--mount|\[)(?!sed |chmod )"
+    r"(?=.*(?:setup_env\.sh|setup_repo\.sh|pip |conda |npm |yarn |cargo ))",
+    re.MULTILINE,
+)
+FROM_IMAGE = re.compile(r"^FROM\s+(?:--platform=\S+\s+)?(\S+)", re.MULTILINE)
+FROM_LINE = re.compile(r"^FROM\s.*$", re.MULTILINE)
+
+
+def add_cache_mounts(dockerfile: str) -> str:
+    """
+    Dockerfile with package manager cache mounts added to its dependency install
+    RUN instructions, and conda pointed at its cache mount in every stage (requires
+    BuildKit).
+    """
+    mounts = " ".join(
+        f"--mount=type=cache,target={target},sharing=shared"
+        for target in CACHE_MOUNT_TARGETS
+    )
+    dockerfile = INSTALL_RUN.sub(f"RUN {mounts} ", dockerfile)
+    if CONDA_PKGS_DIRS_ARG not in dockerfile:
+        dockerfile = FROM_LINE.sub(
+            lambda m: f"{m.group(0)}\n{CONDA_PKGS_DIRS_ARG}", dockerfile
+        )
+    if not dockerfile.startswith("# syntax="):
+        dockerfile = "# syntax=docker/dockerfile:1\n" + dockerfile.lstrip("\n")
+    return dockerfile
+
+
+def get_cache_scope(image_name: str) -> str:
+    """Name of the build cache of an image (e.g. sweb.env.py.x86_64.abc__latest)"""
+    return re.sub(r"[^a-zA-Z0-9_.-]", "_", image_name.replace(":", "__"))
+
+
+class BuildKitBuilder:
+    """
+    Image builder backend using `docker buildx build`, with the layer cache of
+    every image exported to and imported from a local cache directory or a
+    registry (e.g. a local registry stand-in), so fresh hosts reuse the layers
+    built elsewhere instead of rebuilding base / env images from scratch.
+
+    Each image imports its own cache and the cache of its parent image (its FROM
+    image), and exports all of its layers (`mode=max`) to its own cache.
+
+    Cache export to a local directory / registry requires a builder that
+    supports it: the `docker` driver with the containerd image store, or a
+    `docker-container` builder (`builder`) for which parent images are pullable.
+
+    Only `prepare_images` builds with this backend; images that `run_evaluation`
+    builds on demand use the classic builder, so prebuild images with
+    `prepare_images --buildkit` to get the layer and package manager caches.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | str | None = None,
+        cache_registry: str | None = None,
+        builder: str | None = None,
+        cache_mounts: bool = True,
+    ):
+        """
+        Args:
+            cache_dir (Path): Local directory to store the build caches in
+            cache_registry (str): Registry repository to store the build caches in
+                (e.g. localhost:5000/sweb-cache), one tag per image
+            builder (str): buildx builder instance to use (default: current builder)
+            cache_mounts (bool): Add package manager cache mounts to the Dockerfiles
+        """
+        if cache_dir is not None and cache_registry is not None:
+            raise ValueError("Set at most one of cache_dir and cache_registry")
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.cache_registry = cache_registry
+        self.builder = builder
+        self.cache_mounts = cache_mounts
+
+    def prepare_dockerfile(self, dockerfile: str) -> str:
+        """Dockerfile to build with this backend"""
+        return add_cache_mounts(dockerfile) if self.cache_mounts else dockerfile
+
+    def cache_import(self, image_name: str) -> str | None:
+        scope = get_cache_scope(image_name)
+        if self.cache_dir is not None:
+            if not (self.cache_dir / scope / "index.json").exists():
+                return None
+            return f"type=local,src={self.cache_dir / scope}"
+        if self.cache_registry is not None:
+            return f"type=registry,ref={self.cache_registry}:{scope}"
+        return None
+
+    def cache_export(self, image_name: str) -> str | None:
+        scope = get_cache_scope(image_name)
+        if self.cache_dir is not None:
+            return f"type=local,dest={self.cache_dir / scope},mode=max"
+        if self.cache_registry is not None:
+            return f"type=registry,ref={self.cache_registry}:{scope},mode=max"
+        return None
+
+    def build_command(
+        self,
+        image_name: str,
+        build_dir: Path,
+        dockerfile: str,
+        platform: str,
+        nocache: bool = False,
+    ) -> list[str]:
+        """`docker buildx build` command for an image"""
+        command = ["docker", "buildx", "build"]
+        if self.builder:
+            command += ["--builder", self.builder]
+        command += [
+            "--load",
+            "--progress=plain",
+            "--platform",
+            platform,
+            "--tag",
+            image_name,
+        ]
+        if nocache:
+            command.append("--no-cache")
+        parents = FROM_IMAGE.findall(dockerfile)
+        for name in [image_name, *parents]:
+            cache_from = self.cache_import(name)
+            if cache_from is not None:
+                command += ["--cache-from", cache_from]
+        cache_to = self.cache_export(image_name)
+        if cache_to is not None:
+            command += ["--cache-to", cache_to]
+        command.append(str(build_dir))
+        return command
+
+    def build(
+        self,
+        image_name: str,
+        build_dir: Path,
+        dockerfile: str,
+        platform: str,
+        logger: logging.Logger,
+        nocache: bool = False,
+    ):
+        """
+        Build an image from the context in `build_dir` (which contains `dockerfile`
+        as its Dockerfile), streaming the build output to `logger`.
+
+        Raises:
+            RuntimeError: if the build fails
+        """
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        command = self.build_command(
+            image_name, build_dir, dockerfile, platform, nocache
+        )
+        logger.info(f"Running {' '.join(command)}")
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+        )
+        buildlog = []
+        for line in process.stdout:
+            line = ansi_escape(line).rstrip()
+            logger.info(line)
+            buildlog.append(line)
+        if process.wait() != 0:
+            raise RuntimeError(
+                f"docker buildx build exited with code {process.returncode}: "
+                + "\n".join(buildlog[-20:])
+            )
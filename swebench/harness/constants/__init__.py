@@ -71,13 +71,25 @@ KEY_PREDICTION = "model_patch"
 
 # Constants - Harness
 DOCKER_PATCH = "/tmp/patch.diff"
+# Terminates every process of a container but its init process (and the kill
+# itself). The exec PIDs the daemon reports are host PIDs, so a command run by an
+# exec cannot be killed by its PID from inside the container.
+DOCKER_KILL_PROCESSES = ["/bin/bash", "-c", "kill -TERM -1"]
+DOCKER_SNAPSHOT_ENV = "/tmp/snapshot.env"
 DOCKER_USER = "root"
 DOCKER_WORKDIR = "/testbed"
 LOG_REPORT = "report.json"
 LOG_INSTANCE = "run_instance.log"
 LOG_TEST_OUTPUT = "test_output.txt"
 LOG_PRE_TEST_OUTPUT = "pre_test_output.txt"
+LOG_PREPARE_OUTPUT = "prepare_output.txt"
+LOG_VALIDATION_LEDGER = "ledger.jsonl"
 UTF8 = "utf-8"
+GIT_APPLY_CMDS = [
+    "git apply --verbose",
+    "git apply --verbose --reject",
+    "patch --batch --fuzz=5 -p1 -i",
+]
 
 # Constants - Logging
 APPLY_PATCH_FAIL = ">>>>> Patch Apply Failed"
@@ -92,6 +104,13 @@ TESTS_PASSED = ">>>>> All Tests Passed"
 TESTS_TIMEOUT = ">>>>> Tests Timed Out"
 START_TEST_OUTPUT = ">>>>> Start Test Output"
 END_TEST_OUTPUT = ">>>>> End Test Output"
+START_TEST_REPORT = ">>>>> Start Test Report"
+END_TEST_REPORT = ">>>>> End Test Report"
+# Any of these in a test log means the evaluation did not run properly
+LOG_BAD_CODES = [APPLY_PATCH_FAIL, RESET_FAILED, TESTS_ERROR, TESTS_TIMEOUT]
+APPLY_PATCH_STRATEGY = ">>>>> Patch Apply Strategy:"
+GIT_DIFF_OUTPUT = ">>>>> Git Diff Output"
+GIT_DIFF_HASH = ">>>>> Git Diff Hash:"
 
 
 # Constants - Patch Types
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import docker
+import itertools
+import logging
+import threading
+import traceback
+
+from collections import OrderedDict
+
+from docker.models.containers import Container
+
+from swebench.harness.constants import DOCKER_PATCH, DOCKER_USER, DOCKER_WORKDIR, UTF8
+from swebench.harness.docker_build import build_container
+from swebench.harness.docker_utils import cleanup_container
+from swebench.harness.test_spec.test_spec import TestSpec
+
+# For containers removed outside of an instance's run (evictions, closing the pool)
+logger = logging.getLogger(__name__)
+
+# `core.fileMode=false` matches the diff check in run_instance: instance images chmod
+# the repo to 777, which would otherwise show up as a change to every file.
+GIT = "git -c core.fileMode=false -c safe.directory='*'"
+# Ignored files count as changes: a previous run's caches and build outputs (e.g.
+# __pycache__, target/) must not reach the next run
+SNAPSHOT_SCRIPT = (
+    f"cd {DOCKER_WORKDIR} && {GIT} rev-parse HEAD && {GIT} status --porcelain --ignored"
+)
+RESET_SCRIPT = (
+    f"cd {DOCKER_WORKDIR} && "
+    f"{GIT} reset --hard -q {{head}} && "
+    f"{GIT} clean -ffdxq && "
+    f"rm -f {DOCKER_PATCH} /eval.sh && "
+    f'test -z "$({GIT} status --porcelain --ignored)"'
+)
+
+
+class ContainerPool:
+    """
+    Pool of started containers, keyed by instance image.
+
+    Instead of creating, starting, stopping and removing a container for every
+    prediction, `run_instance` can acquire a container from the pool and release it
+    when done. Released containers are reset to the snapshot taken when they were
+    first started (`git reset --hard <HEAD> && git clean -ffdx` in the repo) and
+    handed to the next prediction for the same instance image.
+
+    Only containers whose repo is clean when first started, without ignored files
+    either (which the reset would remove), are pooled; anything that cannot be
+    reset back to that state is removed instead. The reset does not undo changes
+    outside the repo, so containers of test specs whose eval script builds /
+    installs the repo (`TestSpec.build_commands`) are not pooled, nor are
+    containers whose run did not finish normally.
+    """
+
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        run_id: str,
+        max_idle: int | None = None,
+    ):
+        """
+        Args:
+            client (docker.DockerClient): Docker client
+            run_id (str): Run ID, used for container names
+            max_idle (int): Maximum number of idle containers kept across all images
+                (least recently released containers are removed first). None for no limit.
+        """
+        self.client = client
+        self.run_id = run_id
+        self.max_idle = max_idle
+        self._idle: OrderedDict[str, tuple[Container, str]] = OrderedDict()
+        self._snapshots: dict[str, tuple[str, str]] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(
+        self,
+        test_spec: TestSpec,
+        logger: logging.Logger,
+        nocache: bool,
+        force_rebuild: bool = False,
+        image_ready: bool = False,
+    ) -> Container:
+        """
+        Get a started container for the test spec's instance image, reusing an idle
+        one if available.
+        """
+        image_key = test_spec.instance_image_key
+        with self._lock:
+            container_id = next(
+                (cid for cid, (c, key) in self._idle.items() if key == image_key), None
+            )
+            if container_id is not None:
+                container, _ = self._idle.pop(container_id)
+        if container_id is not None:
+            logger.info(
+                f"Reusing pooled container for {test_spec.instance_id}: {container.id}"
+            )
+            return container
+
+        name = f"{test_spec.get_instance_container_name(self.run_id)}.{next(self._counter)}"
+        container = build_container(
+            test_spec,
+            self.client,
+            self.run_id,
+            logger,
+            nocache,
+            force_rebuild,
+            container_name=name,
+            image_ready=image_ready,
+        )
+        container.start()
+        logger.info(f"Container for {test_spec.instance_id} started: {container.id}")
+        if test_spec.build_commands:
+            # Build outputs are often ignored by git, so a reset would not undo them
+            logger.info(
+                f"Container {container.name} will not be pooled, eval script builds the repo"
+            )
+            return container
+        head = self._take_snapshot(container, logger)
+        if head is not None:
+            with self._lock:
+                self._snapshots[container.id] = (head, image_key)
+        return container
+
+    def release(
+        self,
+        container: Container | None,
+        logger: logging.Logger,
+        reusable: bool = True,
+    ):
+        """
+        Reset a container to its snapshot and return it to the pool.
+        Containers that cannot be reset are removed.
+
+        Args:
+            container (Container): Container from `acquire`
+            logger (logging.Logger): Instance logger
+            reusable (bool): False if the run in the container did not finish
+                normally (timed out, stopped early or raised), so processes of the
+                run may still be running in it; the container is removed
+        """
+        if container is None:
+            return
+        with self._lock:
+            snapshot = self._snapshots.get(container.id)
+        if not reusable:
+            logger.info(f"Removing container {container.name}, its run did not finish")
+            self._discard(container, logger)
+            return
+        if snapshot is None or not self._restore_snapshot(
+            container, snapshot[0], logger
+        ):
+            self._discard(container, logger)
+            return
+
+        evicted = []
+        with self._lock:
+            self._idle[container.id] = (container, snapshot[1])
+            while self.max_idle is not None and len(self._idle) > self.max_idle:
+                evicted.append(self._idle.popitem(last=False)[1][0])
+        for c in evicted:
+            self._discard(c, logger)
+
+    def evict(self, image_key: str):
+        """
+        Remove all idle containers for an instance image (e.g. before removing the image).
+        """
+        with self._lock:
+            evicted = [cid for cid, (_, key) in self._idle.items() if key == image_key]
+            containers = [self._idle.pop(cid)[0] for cid in evicted]
+        for container in containers:
+            self._discard(container, logger)
+
+    def close(self):
+        """
+        Remove all idle containers.
+        """
+        with self._lock:
+            containers = [c for c, _ in self._idle.values()]
+            self._idle.clear()
+        for container in containers:
+            self._discard(container, logger)
+
+    def _take_snapshot(self, container: Container, logger) -> str | None:
+        """
+        Record the repo HEAD of a freshly started container. Returns None (and the
+        container won't be pooled) if the repo has uncommitted changes or ignored files.
+        """
+        val = container.exec_run(["/bin/bash", "-c", SNAPSHOT_SCRIPT], user=DOCKER_USER)
+        lines = val.output.decode(UTF8, errors="replace").strip().splitlines()
+        if val.exit_code != 0 or len(lines) != 1:
+            logger.info(
+                f"Container {container.name} will not be pooled, repo is not clean:\n"
+                + "\n".join(lines)
+            )
+            return None
+        return lines[0].strip()
+
+    def _restore_snapshot(self, container: Container, head: str, logger) -> bool:
+        try:
+            val = container.exec_run(
+                ["/bin/bash", "-c", RESET_SCRIPT.format(head=head)], user=DOCKER_USER
+            )
+        except Exception as e:
+            logger.info(f"Failed to reset container {container.name}: {e}")
+            return False
+        if val.exit_code != 0:
+            logger.info(
+                f"Failed to reset container {container.name}, removing it:\n"
+                f"{val.output.decode(UTF8, errors='replace')}"
+            )
+            return False
+        logger.info(f"Container {container.name} reset and returned to pool.")
+        return True
+
+    def _discard(self, container: Container, logger: logging.Logger):
+        with self._lock:
+            self._snapshots.pop(container.id, None)
+        try:
+            # `tail -f /dev/null` ignores SIGTERM, so skip the graceful stop
+            container.remove(force=True)
+            return
+        except Exception:
+            logger.info(
+                f"Failed to remove pooled container {container.name}:\n"
+                f"{traceback.format_exc()}"
+            )
+        # Logs (rather than raises) its own errors, given a logger
+        cleanup_container(self.client, container, logger)
@@ -0,0 +1,310 @@
+"""
+Asyncio Docker backend for the evaluation harness.
+
+Talks to the Docker Engine API directly over its unix socket, so that hundreds of
+concurrent container executions can run from a single event loop instead of one
+(or two) OS threads blocked on docker-py sockets per evaluation.
+
+Only the operations the harness needs to run an evaluation are implemented:
+create / start / exec / put_archive / stop / remove.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shlex
+import struct
+import time
+
+from urllib.parse import quote, urlencode
+
+from swebench.harness.constants import DOCKER_KILL_PROCESSES
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class AsyncDockerError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class AsyncDockerClient:
+    """
+    Minimal asyncio client for the Docker Engine API over a unix socket.
+    Each request uses its own connection, so requests can run concurrently and be
+    cancelled independently.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_DOCKER_SOCKET):
+        self.socket_path = socket_path
+
+    @classmethod
+    def from_env(cls) -> "AsyncDockerClient":
+        """
+        Create a client from DOCKER_HOST (only unix:// hosts are supported).
+        """
+        host = os.environ.get("DOCKER_HOST")
+        if not host:
+            return cls()
+        if not host.startswith("unix://"):
+            raise ValueError(
+                f"Async Docker backend only supports unix sockets, got DOCKER_HOST={host}"
+            )
+        return cls(host[len("unix://") :])
+
+    async def _open(self, method: str, path: str, params=None, body=None, headers=None):
+        """
+        Send a request and read the response status + headers.
+        Returns (status, headers, reader, writer); the caller owns the connection.
+        """
+        if params:
+            path += "?" + urlencode(
+                {k: v for k, v in params.items() if v is not None}
+            )
+        headers = {"Host": "docker", **(headers or {})}
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        if body is not None:
+            headers["Content-Length"] = str(len(body))
+        else:
+            headers.setdefault("Content-Length", "0")
+        reader, writer = await asyncio.open_unix_connection(
+            self.socket_path, limit=MAX_HEADER_BYTES
+        )
+        try:
+            request = f"{method} {path} HTTP/1.1\r\n" + "".join(
+                f"{k}: {v}\r\n" for k, v in headers.items()
+            )
+            writer.write(request.encode() + b"\r\n")
+            if body:
+                writer.write(body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                response_headers[key.strip().lower()] = value.strip()
+        except BaseException:
+            writer.close()
+            raise
+        return status, response_headers, reader, writer
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: dict) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            return b"".join(chunks)
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"]))
+        return await reader.read()
+
+    async def request(self, method: str, path: str, params=None, body=None):
+        """
+        Send a request and return the decoded JSON response (or None if empty).
+        Raises AsyncDockerError for non-2xx responses.
+        """
+        status, headers, reader, writer = await self._open(
+            method, path, params, body, headers={"Connection": "close"}
+        )
+        try:
+            data = await self._read_body(reader, headers)
+        finally:
+            writer.close()
+        if status >= 400:
+            try:
+                message = json.loads(data).get("message", data.decode())
+            except ValueError:
+                message = data.decode(errors="replace")
+            raise AsyncDockerError(status, message)
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+
+    # MARK: Containers
+    async def create_container(
+        self,
+        image: str,
+        name: str | None = None,
+        command: list[str] | None = None,
+        user: str | None = None,
+        platform: str | None = None,
+        cap_add: list[str] | None = None,
+    ) -> str:
+        """Create a container, returning its ID"""
+        config = {
+            "Image": image,
+            "Cmd": command,
+            "User": user or "",
+            "HostConfig": {"CapAdd": cap_add or None},
+        }
+        result = await self.request(
+            "POST",
+            "/containers/create",
+            params={"name": name, "platform": platform},
+            body=config,
+        )
+        return result["Id"]
+
+    async def start_container(self, container_id: str):
+        await self.request("POST", f"/containers/{container_id}/start")
+
+    async def stop_container(self, container_id: str, timeout: int = 15):
+        await self.request(
+            "POST", f"/containers/{container_id}/stop", params={"t": timeout}
+        )
+
+    async def remove_container(self, container_id: str, force: bool = True):
+        await self.request(
+            "DELETE",
+            f"/containers/{container_id}",
+            params={"force": "true" if force else "false", "v": "true"},
+        )
+
+    async def put_archive(self, container_id: str, path: str, data: bytes):
+        """Extract a tar archive into a directory of the container"""
+        await self.request(
+            "PUT",
+            f"/containers/{container_id}/archive",
+            params={"path": path},
+            body=data,
+        )
+
+    # MARK: Exec
+    async def exec_create(
+        self,
+        container_id: str,
+        cmd: str | list[str],
+        workdir: str | None = None,
+        user: str | None = None,
+    ) -> str:
+        if isinstance(cmd, str):
+            cmd = shlex.split(cmd)
+        config = {
+            "AttachStdout": True,
+            "AttachStderr": True,
+            "Cmd": cmd,
+            "User": user or "",
+        }
+        if workdir:
+            config["WorkingDir"] = workdir
+        result = await self.request(
+            "POST", f"/containers/{container_id}/exec", body=config
+        )
+        return result["Id"]
+
+    async def exec_inspect(self, exec_id: str) -> dict:
+        return await self.request("GET", f"/exec/{quote(exec_id)}/json")
+
+    async def exec_stream(self, exec_id: str, on_output) -> bool:
+        """
+        Start an exec and call `on_output(chunk)` for each chunk of (stdout + stderr)
+        output until the command exits, or until `on_output` returns True.
+        Returns whether reading was stopped by `on_output`.
+        """
+        status, headers, reader, writer = await self._open(
+            "POST",
+            f"/exec/{quote(exec_id)}/start",
+            body={"Detach": False, "Tty": False},
+            headers={"Connection": "Upgrade", "Upgrade": "tcp"},
+        )
+        try:
+            if status >= 400:
+                data = await self._read_body(reader, headers)
+                raise AsyncDockerError(status, data.decode(errors="replace"))
+            # Hijacked connection: multiplexed stream of 8 byte header + payload frames
+            while True:
+                try:
+                    header = await reader.readexactly(8)
+                except asyncio.IncompleteReadError:
+                    break
+                _, size = struct.unpack(">BxxxL", header)
+                if size and on_output(await reader.readexactly(size)):
+                    return True
+            return False
+        finally:
+            writer.close()
+
+    async def exec_run(
+        self,
+        container_id: str,
+        cmd: str | list[str],
+        workdir: str | None = None,
+        user: str | None = None,
+        timeout: float | None = None,
+        on_output=None,
+    ) -> tuple[int | None, bytes, bool, float]:
+        """
+        Run a command in a container, with an optional timeout.
+        If the timeout expires (or the task is cancelled, or `on_output` returns True
+        to stop early) the command is killed.
+
+        Args:
+            container_id (str): Container to run the command in
+            cmd (str | list): Command to run
+            workdir (str): Working directory
+            user (str): User to run the command as
+            timeout (float): Timeout in seconds, None for no timeout
+            on_output (callable): If given, called with each output chunk and the
+                output is not accumulated
+        Returns:
+            exit code (None if timed out or stopped), output, whether it timed out, runtime
+        """
+        exec_id = await self.exec_create(container_id, cmd, workdir, user)
+        output = bytearray()
+        start_time = time.time()
+        timed_out = False
+        stopped = False
+        try:
+            stopped = await asyncio.wait_for(
+                self.exec_stream(exec_id, on_output or output.extend), timeout
+            )
+            if stopped:
+                await self.exec_kill(container_id, exec_id)
+        except asyncio.TimeoutError:
+            timed_out = True
+            await self.exec_kill(container_id, exec_id)
+        except asyncio.CancelledError:
+            await asyncio.shield(self.exec_kill(container_id, exec_id))
+            raise
+        runtime = time.time() - start_time
+        exit_code = None
+        if not timed_out and not stopped:
+            exit_code = (await self.exec_inspect(exec_id)).get("ExitCode")
+        return exit_code, bytes(output), timed_out, runtime
+
+    async def exec_kill(self, container_id: str, exec_id: str):
+        """
+        Terminate the process started by an exec (if it is still running), along
+        with every other process of the container but its init process.
+        """
+        try:
+            if (await self.exec_inspect(exec_id)).get("Running"):
+                kill_id = await self.exec_create(container_id, DOCKER_KILL_PROCESSES)
+                await self.request(
+                    "POST",
+                    f"/exec/{quote(kill_id)}/start",
+                    body={"Detach": True, "Tty": False},
+                )
+        except (AsyncDockerError, OSError):
+            pass
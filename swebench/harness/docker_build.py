@@ -8,6 +8,8 @@ import traceback
 
 from pathlib import Path
 
+from swebench.harness.build_graph import BuildGraph, run_build_graph
+from swebench.harness.buildkit import BuildKitBuilder
 from swebench.harness.constants import (
     BASE_IMAGE_BUILD_DIR,
     DOCKER_USER,
@@ -15,13 +17,15 @@ from swebench.harness.constants import (
     INSTANCE_IMAGE_BUILD_DIR,
     UTF8,
 )
-from swebench.harness.docker_utils import cleanup_container, remove_image
+from swebench.harness.docker_utils import cleanup_container, list_images, remove_image
+from swebench.harness.image_inventory import get_image_inventory
+from swebench.harness.image_prefetch import ImagePrefetcher
 from swebench.harness.test_spec.test_spec import (
     get_test_specs_from_dataset,
     make_test_spec,
     TestSpec,
 )
-from swebench.harness.utils import ansi_escape, run_threadpool
+from swebench.harness.utils import ansi_escape
 
 
 class BuildImageError(Exception):
@@ -81,6 +85,7 @@ def build_image(
     client: docker.DockerClient,
     build_dir: Path,
     nocache: bool = False,
+    builder: BuildKitBuilder | None = None,
 ):
     """
     Builds a docker image with the given name, setup scripts, dockerfile, and platform.
@@ -93,7 +98,11 @@ def build_image(
         client (docker.DockerClient): Docker client to use for building the image
         build_dir (Path): Directory for the build context (will also contain logs, scripts, and artifacts)
         nocache (bool): Whether to use the cache when building
+        builder (BuildKitBuilder): BuildKit backend to build with (with its layer and
+            package manager caches); if None, the image is built with `client.api.build`
     """
+    if builder is not None:
+        dockerfile = builder.prepare_dockerfile(dockerfile)
     # Create a logger for the build process
     logger = setup_logger(image_name, build_dir / "build_image.log")
     logger.info(
@@ -124,6 +133,11 @@ def build_image(
         logger.info(
             f"Building docker image {image_name} in {build_dir} with platform {platform}"
         )
+        if builder is not None:
+            builder.build(image_name, build_dir, dockerfile, platform, logger, nocache)
+            get_image_inventory(client).add(image_name)
+            logger.info("Image built successfully!")
+            return
         response = client.api.build(
             path=str(build_dir),
             tag=image_name,
@@ -150,6 +164,7 @@ def build_image(
                 raise docker.errors.BuildError(
                     chunk["errorDetail"]["message"], buildlog
                 )
+        get_image_inventory(client).add(image_name)
         logger.info("Image built successfully!")
     except docker.errors.BuildError as e:
         logger.error(f"docker.errors.BuildError during {image_name}: {e}")
@@ -161,8 +176,110 @@ def build_image(
         close_logger(logger)  # functions that create loggers should close them
 
 
+def make_build_graph(
+    client: docker.DockerClient,
+    test_specs: list[TestSpec],
+    kinds: tuple[str, ...] = ("base", "env", "instance"),
+    force_rebuild: bool = False,
+    builder: BuildKitBuilder | None = None,
+) -> BuildGraph:
+    """
+    Returns the dependency graph of the builds of the images of the given kinds
+    ("base", "env", "instance") needed by the test specs that do not exist yet.
+
+    Args:
+        client (docker.DockerClient): Docker client to use for building the images
+        test_specs (list): Test specs to build images for
+        kinds (tuple): Kinds of images to build
+        force_rebuild (bool): Whether to remove and rebuild the images even if they
+            already exist
+        builder (BuildKitBuilder): BuildKit backend to build with (see `build_image`)
+    """
+    if force_rebuild:
+        image_keys = {
+            getattr(spec, f"{kind}_image_key") for spec in test_specs for kind in kinds
+        }
+        for key in image_keys:
+            remove_image(client, key, "quiet")
+    existing_images = list_images(client)
+
+    graph = BuildGraph()
+    for spec in test_specs:
+        if "base" in kinds and spec.base_image_key not in existing_images:
+            graph.add(
+                spec.base_image_key,
+                "base",
+                build_image,
+                (
+                    spec.base_image_key,
+                    {},
+                    spec.base_dockerfile,
+                    spec.platform,
+                    client,
+                    BASE_IMAGE_BUILD_DIR / spec.base_image_key.replace(":", "__"),
+                    False,
+                    builder,
+                ),
+            )
+        if "env" in kinds and spec.env_image_key not in existing_images:
+            graph.add(
+                spec.env_image_key,
+                "env",
+                build_image,
+                (
+                    spec.env_image_key,
+                    {"setup_env.sh": spec.setup_env_script},
+                    spec.env_dockerfile,
+                    spec.platform,
+                    client,
+                    ENV_IMAGE_BUILD_DIR / spec.env_image_key.replace(":", "__"),
+                    False,
+                    builder,
+                ),
+                parent=spec.base_image_key,
+            )
+        if "instance" in kinds and spec.instance_image_key not in existing_images:
+            # `logger` is set to None b/c logger is created in build_instance_image
+            graph.add(
+                spec.instance_image_key,
+                "instance",
+                build_instance_image,
+                (spec, client, None, False, builder),
+                parent=spec.env_image_key,
+            )
+    return graph
+
+
+def run_image_builds(graph: BuildGraph, max_workers: int, images: str):
+    """
+    Runs the builds of a build graph, reporting the progress of every image kind.
+
+    Args:
+        graph (BuildGraph): Builds to run
+        max_workers (int): Maximum number of concurrent builds
+        images (str): Description of the images, for messages (e.g. "base")
+    Returns:
+        tuple: names of the images built, and of the images that failed to build
+    """
+    if len(graph.nodes) == 0:
+        print(f"No {images} images need to be built.")
+        return [], []
+    print(f"Total {images} images to build: {len(graph.nodes)}")
+    successful, failed = run_build_graph(graph, max_workers)
+    # Show how many images failed to build
+    if len(failed) == 0:
+        print(f"All {images} images built successfully.")
+    else:
+        print(f"{len(failed)} {images} images failed to build: {graph.progress()}")
+    return successful, failed
+
+
 def build_base_images(
-    client: docker.DockerClient, dataset: list, force_rebuild: bool = False
+    client: docker.DockerClient,
+    dataset: list,
+    force_rebuild: bool = False,
+    builder: BuildKitBuilder | None = None,
+    max_workers: int = 4,
 ):
     """
     Builds the base images required for the dataset if they do not already exist.
@@ -171,37 +288,12 @@ def build_base_images(
         client (docker.DockerClient): Docker client to use for building the images
         dataset (list): List of test specs or dataset to build images for
         force_rebuild (bool): Whether to force rebuild the images even if they already exist
+        builder (BuildKitBuilder): BuildKit backend to build with (see `build_image`)
+        max_workers (int): Maximum number of workers to use for building images
     """
-    # Get the base images to build from the dataset
     test_specs = get_test_specs_from_dataset(dataset)
-    base_images = {
-        x.base_image_key: (x.base_dockerfile, x.platform) for x in test_specs
-    }
-
-    # Build the base images
-    for image_name, (dockerfile, platform) in base_images.items():
-        try:
-            # Check if the base image already exists
-            client.images.get(image_name)
-            if force_rebuild:
-                # Remove the base image if it exists and force rebuild is enabled
-                remove_image(client, image_name, "quiet")
-            else:
-                print(f"Base image {image_name} already exists, skipping build.")
-                continue
-        except docker.errors.ImageNotFound:
-            pass
-        # Build the base image (if it does not exist or force rebuild is enabled)
-        print(f"Building base image ({image_name})")
-        build_image(
-            image_name=image_name,
-            setup_scripts={},
-            dockerfile=dockerfile,
-            platform=platform,
-            client=client,
-            build_dir=BASE_IMAGE_BUILD_DIR / image_name.replace(":", "__"),
-        )
-    print("Base images built successfully.")
+    graph = make_build_graph(client, test_specs, ("base",), force_rebuild, builder)
+    return run_image_builds(graph, max_workers, "base")
 
 
 def get_env_configs_to_build(
@@ -217,31 +309,19 @@ def get_env_configs_to_build(
         dataset (list): List of test specs or dataset to build images for
     """
     image_scripts = dict()
-    base_images = dict()
+    images = get_image_inventory(client)
     test_specs = get_test_specs_from_dataset(dataset)
 
     for test_spec in test_specs:
         # Check if the base image exists
-        try:
-            if test_spec.base_image_key not in base_images:
-                base_images[test_spec.base_image_key] = client.images.get(
-                    test_spec.base_image_key
-                )
-            base_image = base_images[test_spec.base_image_key]
-        except docker.errors.ImageNotFound:
+        if not images.exists(test_spec.base_image_key):
             raise Exception(
                 f"Base image {test_spec.base_image_key} not found for {test_spec.env_image_key}\n."
                 "Please build the base images first."
             )
 
         # Check if the environment image exists
-        image_exists = False
-        try:
-            env_image = client.images.get(test_spec.env_image_key)
-            image_exists = True
-        except docker.errors.ImageNotFound:
-            pass
-        if not image_exists:
+        if not images.exists(test_spec.env_image_key):
             # Add the environment image to the list of images to build
             image_scripts[test_spec.env_image_key] = {
                 "setup_script": test_spec.setup_env_script,
@@ -256,50 +336,26 @@ def build_env_images(
     dataset: list,
     force_rebuild: bool = False,
     max_workers: int = 4,
+    builder: BuildKitBuilder | None = None,
 ):
     """
-    Builds the environment images required for the dataset if they do not already exist.
+    Builds the environment images required for the dataset (and the base images
+    they are built from) if they do not already exist. Each environment image is
+    built as soon as its base image is.
 
     Args:
         client (docker.DockerClient): Docker client to use for building the images
         dataset (list): List of test specs or dataset to build images for
         force_rebuild (bool): Whether to force rebuild the images even if they already exist
         max_workers (int): Maximum number of workers to use for building images
+        builder (BuildKitBuilder): BuildKit backend to build with (see `build_image`)
     """
-    # Get the environment images to build from the dataset
-    if force_rebuild:
-        env_image_keys = {x.env_image_key for x in get_test_specs_from_dataset(dataset)}
-        for key in env_image_keys:
-            remove_image(client, key, "quiet")
-    build_base_images(client, dataset, force_rebuild)
-    configs_to_build = get_env_configs_to_build(client, dataset)
-    if len(configs_to_build) == 0:
-        print("No environment images need to be built.")
-        return [], []
-    print(f"Total environment images to build: {len(configs_to_build)}")
-
-    args_list = list()
-    for image_name, config in configs_to_build.items():
-        args_list.append(
-            (
-                image_name,
-                {"setup_env.sh": config["setup_script"]},
-                config["dockerfile"],
-                config["platform"],
-                client,
-                ENV_IMAGE_BUILD_DIR / image_name.replace(":", "__"),
-            )
-        )
-
-    successful, failed = run_threadpool(build_image, args_list, max_workers)
-    # Show how many images failed to build
-    if len(failed) == 0:
-        print("All environment images built successfully.")
-    else:
-        print(f"{len(failed)} environment images failed to build.")
-
+    test_specs = get_test_specs_from_dataset(dataset)
+    graph = make_build_graph(
+        client, test_specs, ("base", "env"), force_rebuild, builder
+    )
     # Return the list of (un)successfuly built images
-    return successful, failed
+    return run_image_builds(graph, max_workers, "environment")
 
 
 def build_instance_images(
@@ -309,54 +365,34 @@ def build_instance_images(
     max_workers: int = 4,
     namespace: str = None,
     tag: str = None,
+    builder: BuildKitBuilder | None = None,
 ):
     """
-    Builds the instance images required for the dataset if they do not already exist.
+    Builds the instance images required for the dataset (and the base and
+    environment images they are built from) if they do not already exist.
+
+    The images are built as one dependency graph: each instance image is built as
+    soon as its own environment image is, instead of after every environment image,
+    and instances of failed environment images are skipped.
 
     Args:
         dataset (list): List of test specs or dataset to build images for
         client (docker.DockerClient): Docker client to use for building the images
         force_rebuild (bool): Whether to force rebuild the images even if they already exist
         max_workers (int): Maximum number of workers to use for building images
+        builder (BuildKitBuilder): BuildKit backend to build with (see `build_image`)
     """
-    # Build environment images (and base images as needed) first
     test_specs = list(
         map(
             lambda x: make_test_spec(x, namespace=namespace, instance_image_tag=tag),
             dataset,
         )
     )
-    if force_rebuild:
-        for spec in test_specs:
-            remove_image(client, spec.instance_image_key, "quiet")
-    _, env_failed = build_env_images(client, test_specs, force_rebuild, max_workers)
-
-    if len(env_failed) > 0:
-        # Don't build images for instances that depend on failed-to-build env images
-        dont_run_specs = [
-            spec for spec in test_specs if spec.env_image_key in env_failed
-        ]
-        test_specs = [
-            spec for spec in test_specs if spec.env_image_key not in env_failed
-        ]
-        print(
-            f"Skipping {len(dont_run_specs)} instances - due to failed env image builds"
-        )
-    print(f"Building instance images for {len(test_specs)} instances")
-    successful, failed = list(), list()
-
-    # `logger` is set to None b/c logger is created in build-instage_image
-    payloads = [(spec, client, None, False) for spec in test_specs]
-    # Build the instance images
-    successful, failed = run_threadpool(build_instance_image, payloads, max_workers)
-    # Show how many images failed to build
-    if len(failed) == 0:
-        print("All instance images built successfully.")
-    else:
-        print(f"{len(failed)} instance images failed to build.")
-
+    graph = make_build_graph(
+        client, test_specs, force_rebuild=force_rebuild, builder=builder
+    )
     # Return the list of (un)successfuly built images
-    return successful, failed
+    return run_image_builds(graph, max_workers, "base, environment and instance")
 
 
 def build_instance_image(
@@ -364,6 +400,7 @@ def build_instance_image(
     client: docker.DockerClient,
     logger: logging.Logger | None,
     nocache: bool,
+    builder: BuildKitBuilder | None = None,
 ):
     """
     Builds the instance image for the given test spec if it does not already exist.
@@ -373,6 +410,7 @@ def build_instance_image(
         client (docker.DockerClient): Docker client to use for building the image
         logger (logging.Logger): Logger to use for logging the build process
         nocache (bool): Whether to use the cache when building
+        builder (BuildKitBuilder): BuildKit backend to build with (see `build_image`)
     """
     # Set up logging for the build process
     build_dir = INSTANCE_IMAGE_BUILD_DIR / test_spec.instance_image_key.replace(
@@ -389,29 +427,20 @@ def build_instance_image(
     dockerfile = test_spec.instance_dockerfile
 
     # Check that the env. image the instance image is based on exists
-    try:
-        env_image = client.images.get(env_image_name)
-    except docker.errors.ImageNotFound as e:
+    images = get_image_inventory(client)
+    if not images.exists(env_image_name):
         raise BuildImageError(
             test_spec.instance_id,
             f"Environment image {env_image_name} not found for {test_spec.instance_id}",
             logger,
-        ) from e
+        )
     logger.info(
         f"Environment image {env_image_name} found for {test_spec.instance_id}\n"
         f"Building instance image {image_name} for {test_spec.instance_id}"
     )
 
-    # Check if the instance image already exists
-    image_exists = False
-    try:
-        client.images.get(image_name)
-        image_exists = True
-    except docker.errors.ImageNotFound:
-        pass
-
-    # Build the instance image
-    if not image_exists:
+    # Build the instance image (if it does not exist yet)
+    if not images.exists(image_name):
         build_image(
             image_name=image_name,
             setup_scripts={
@@ -422,6 +451,7 @@ def build_instance_image(
             client=client,
             build_dir=build_dir,
             nocache=nocache,
+            builder=builder,
         )
     else:
         logger.info(f"Image {image_name} already exists, skipping build.")
@@ -430,6 +460,48 @@ def build_instance_image(
         close_logger(logger)
 
 
+def ensure_instance_image(
+    test_spec: TestSpec,
+    client: docker.DockerClient,
+    logger: logging.Logger,
+    nocache: bool,
+    force_rebuild: bool = False,
+    prefetcher: ImagePrefetcher | None = None,
+):
+    """
+    Makes sure the instance image for the given test spec exists locally, building it
+    (or pulling it, for remote images) if it does not.
+
+    Args:
+        test_spec (TestSpec): Test spec to get the instance image for
+        client (docker.DockerClient): Docker client for building / pulling the image
+        logger (logging.Logger): Logger to use for logging the build process
+        nocache (bool): Whether to use the cache when building
+        force_rebuild (bool): Whether to force rebuild the image even if it already exists
+        prefetcher (ImagePrefetcher): Prefetcher that may be pulling the (remote) image
+            already; its pull is waited for instead of pulling the image again
+    """
+    if force_rebuild:
+        remove_image(client, test_spec.instance_image_key, "quiet")
+    if not test_spec.is_remote_image:
+        build_instance_image(test_spec, client, logger, nocache)
+        return
+    if prefetcher is not None and prefetcher.wait(test_spec.instance_image_key):
+        logger.info(f"Image {test_spec.instance_image_key} was prefetched.")
+        return
+    images = get_image_inventory(client)
+    if not images.exists(test_spec.instance_image_key):
+        try:
+            client.images.pull(test_spec.instance_image_key)
+            images.add(test_spec.instance_image_key)
+        except docker.errors.NotFound as e:
+            raise BuildImageError(test_spec.instance_id, str(e), logger) from e
+        except Exception as e:
+            raise Exception(
+                f"Error occurred while pulling image {test_spec.base_image_key}: {str(e)}"
+            )
+
+
 def build_container(
     test_spec: TestSpec,
     client: docker.DockerClient,
@@ -437,6 +509,9 @@ def build_container(
     logger: logging.Logger,
     nocache: bool,
     force_rebuild: bool = False,
+    container_name: str | None = None,
+    image_ready: bool = False,
+    image: str | None = None,
 ):
     """
     Builds the instance image for the given test spec and creates a container from the image.
@@ -448,24 +523,14 @@ def build_container(
         logger (logging.Logger): Logger to use for logging the build process
         nocache (bool): Whether to use the cache when building
         force_rebuild (bool): Whether to force rebuild the image even if it already exists
+        container_name (str): Name for the container (defaults to the test spec's container name)
+        image_ready (bool): Skip checking for (and building / pulling) the instance image
+        image (str): Create the container from this image (e.g. a snapshot of another
+            container) instead of the instance image
     """
     # Build corresponding instance image
-    if force_rebuild:
-        remove_image(client, test_spec.instance_image_key, "quiet")
-    if not test_spec.is_remote_image:
-        build_instance_image(test_spec, client, logger, nocache)
-    else:
-        try:
-            client.images.get(test_spec.instance_image_key)
-        except docker.errors.ImageNotFound:
-            try:
-                client.images.pull(test_spec.instance_image_key)
-            except docker.errors.NotFound as e:
-                raise BuildImageError(test_spec.instance_id, str(e), logger) from e
-            except Exception as e:
-                raise Exception(
-                    f"Error occurred while pulling image {test_spec.base_image_key}: {str(e)}"
-                )
+    if not image_ready and image is None:
+        ensure_instance_image(test_spec, client, logger, nocache, force_rebuild)
 
     container = None
     try:
@@ -477,8 +542,8 @@ def build_container(
         cap_add = run_args.get("cap_add", [])
 
         container = client.containers.create(
-            image=test_spec.instance_image_key,
-            name=test_spec.get_instance_container_name(run_id),
+            image=image or test_spec.instance_image_key,
+            name=container_name or test_spec.get_instance_container_name(run_id),
             user=DOCKER_USER,
             detach=True,
             command="tail -f /dev/null",
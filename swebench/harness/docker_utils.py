@@ -2,19 +2,87 @@ from __future__ import annotations
 
 import docker
 import docker.errors
+import io
 import os
 import signal
+import stat
 import tarfile
 import threading
 import time
+import shlex
 import traceback
-from pathlib import Path
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
 
 from docker.models.containers import Container
 
+from swebench.harness.image_inventory import get_image_inventory
+from swebench.harness.log_capture import TestOutputCapture
+from swebench.harness.constants import (
+    APPLY_PATCH_STRATEGY,
+    DOCKER_KILL_PROCESSES,
+    DOCKER_PATCH,
+    DOCKER_USER,
+    DOCKER_WORKDIR,
+    GIT_APPLY_CMDS,
+    GIT_DIFF_HASH,
+    GIT_DIFF_OUTPUT,
+    UTF8,
+)
+
 HEREDOC_DELIMITER = "EOF_1399519320"  # different from dataset HEREDOC_DELIMITERs!
 
 
+def make_archive(
+    files: dict[PurePosixPath | str, str | bytes],
+    modes: dict[PurePosixPath | str, int] | None = None,
+) -> bytes:
+    """
+    Build an in-memory tar archive, to be extracted at `/` in a container.
+
+    No directory entries are written: the Docker daemon creates missing parent
+    directories on extraction, while an explicit entry would reset the mode of
+    existing directories (e.g. /tmp).
+
+    Args:
+        files (dict): Map of absolute destination path in the container to file contents
+        modes (dict): Permission bits of some of the files, by destination path
+            (the others are 0o644)
+    """
+    modes = {PurePosixPath(dst): mode for dst, mode in (modes or {}).items()}
+    buffer = io.BytesIO()
+    mtime = int(time.time())
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for dst, content in files.items():
+            dst = PurePosixPath(dst)
+            if not dst.is_absolute() or dst.parent == dst:
+                raise ValueError(f"Destination path must be an absolute file path, dst: {dst}")
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            info = tarfile.TarInfo(str(dst.relative_to("/")))
+            info.size = len(content)
+            info.mode = modes.get(dst, 0o644)
+            info.mtime = mtime
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def copy_files_to_container(
+    container: Container,
+    files: dict[PurePosixPath | str, str | bytes],
+    modes: dict[PurePosixPath | str, int] | None = None,
+):
+    """
+    Write several files to a docker container with a single `put_archive` call
+
+    Args:
+        container (Container): Docker container to copy to
+        files (dict): Map of absolute destination path in the container to file contents
+        modes (dict): Permission bits of some of the files (see `make_archive`)
+    """
+    container.put_archive("/", make_archive(files, modes))
+
+
 def copy_to_container(container: Container, src: Path, dst: Path):
     """
     Copy a file from local to a docker container
@@ -29,26 +97,12 @@ def copy_to_container(container: Container, src: Path, dst: Path):
         raise ValueError(
             f"Destination path parent directory cannot be empty!, dst: {dst}"
         )
-
-    # temporary tar file
-    tar_path = src.with_suffix(".tar")
-    with tarfile.open(tar_path, "w") as tar:
-        tar.add(
-            src, arcname=dst.name
-        )  # use destination name, so after `put_archive`, name is correct
-
-    # get bytes for put_archive cmd
-    with open(tar_path, "rb") as tar_file:
-        data = tar_file.read()
-
-    # Make directory if necessary
-    container.exec_run(f"mkdir -p {dst.parent}")
-
-    # Send tar file to container and extract
-    container.put_archive(os.path.dirname(dst), data)
-
-    # clean up in locally and in container
-    tar_path.unlink()
+    # Keep the permission bits of the source file (e.g. executable scripts)
+    copy_files_to_container(
+        container,
+        {dst: Path(src).read_bytes()},
+        {dst: stat.S_IMODE(os.stat(src).st_mode)},
+    )
 
 
 def write_to_container(container: Container, data: str, dst: Path):
@@ -60,6 +114,125 @@ def write_to_container(container: Container, data: str, dst: Path):
     container.exec_run(command)
 
 
+# Ignore permission changes: instance images chmod the repo
+GIT_DIFF = "git -c core.fileMode=false diff"
+
+
+@dataclass
+class ApplyPatchResult:
+    """
+    Result of applying a patch in a container with the apply patch script.
+    """
+
+    applied: bool
+    strategy: str | None  # entry of GIT_APPLY_CMDS that applied the patch
+    output: str  # output of the apply commands that were tried
+    diff_hash: str | None = None  # hash of `git diff` after applying the patch
+    diff: str | None = None  # full `git diff`, only if requested
+
+
+def make_git_diff_script(log_diff: bool = False) -> str:
+    """
+    Shell snippet printing a hash of the repo's `git diff` (and, if `log_diff`,
+    the diff itself), to be run in DOCKER_WORKDIR.
+    """
+    if not log_diff:
+        return f'echo "{GIT_DIFF_HASH} $({GIT_DIFF} | git hash-object --stdin)"'
+    return (
+        f'diff_file=$(mktemp) && {GIT_DIFF} > "$diff_file" && '
+        f'echo "{GIT_DIFF_OUTPUT}" && cat "$diff_file" && '
+        f'echo "{GIT_DIFF_HASH} $(git hash-object "$diff_file")" && '
+        f'rm -f "$diff_file"'
+    )
+
+
+def make_apply_patch_script(patch_path: str = DOCKER_PATCH, log_diff: bool = False) -> str:
+    """
+    Script that tries each of GIT_APPLY_CMDS in turn inside the container, reports
+    the command that succeeded and the resulting diff hash, all in a single exec.
+    Exits 0 if the patch was applied, 1 otherwise.
+    """
+    cmds = " ".join(shlex.quote(cmd) for cmd in GIT_APPLY_CMDS)
+    return "\n".join(
+        [
+            f"cd {DOCKER_WORKDIR}",
+            f"for cmd in {cmds}; do",
+            f"    if $cmd {patch_path} 2>&1; then",
+            f'        echo "{APPLY_PATCH_STRATEGY} $cmd"',
+            f"        {make_git_diff_script(log_diff)}",
+            "        exit 0",
+            "    fi",
+            '    echo "Failed to apply patch to container: $cmd"',
+            "done",
+            "exit 1",
+        ]
+    )
+
+
+def parse_git_diff_output(output: str) -> tuple[str, str | None, str | None]:
+    """
+    Split the output of a script ending with `make_git_diff_script`.
+
+    Returns:
+        output before the diff, diff hash (None if missing), full diff (None if not logged)
+    """
+    head, found, diff_hash = output.rpartition(GIT_DIFF_HASH)
+    if not found:
+        return output, None, None
+    output = head
+    diff = None
+    if GIT_DIFF_OUTPUT in output:
+        output, _, diff = output.rpartition(GIT_DIFF_OUTPUT + "\n")
+        diff = diff.strip()
+    return output, diff_hash.strip() or None, diff
+
+
+def parse_apply_patch_output(exit_code: int | None, output: str) -> ApplyPatchResult:
+    """
+    Parse the output of the script built by `make_apply_patch_script`.
+    """
+    output, diff_hash, diff = parse_git_diff_output(output)
+    strategy = None
+    if APPLY_PATCH_STRATEGY in output:
+        output, _, strategy = output.rpartition(APPLY_PATCH_STRATEGY)
+        strategy = strategy.strip()
+    return ApplyPatchResult(
+        applied=exit_code == 0 and strategy is not None,
+        strategy=strategy,
+        output=output,
+        diff_hash=diff_hash,
+        diff=diff,
+    )
+
+
+def apply_patch(container: Container, log_diff: bool = False) -> ApplyPatchResult:
+    """
+    Apply DOCKER_PATCH to the repo in a container, trying each of GIT_APPLY_CMDS
+    in a single exec.
+
+    Args:
+        container (Container): Container holding the patch file
+        log_diff (bool): Also return the full `git diff` after applying the patch
+    """
+    val = container.exec_run(
+        ["/bin/bash", "-c", make_apply_patch_script(log_diff=log_diff)],
+        user=DOCKER_USER,
+    )
+    return parse_apply_patch_output(val.exit_code, val.output.decode(UTF8, errors="replace"))
+
+
+def get_git_diff(container: Container, log_diff: bool = False) -> tuple[str | None, str | None]:
+    """
+    Get a hash of the repo's `git diff` in a container, and the diff itself if `log_diff`.
+    """
+    val = container.exec_run(
+        ["/bin/bash", "-c", f"cd {DOCKER_WORKDIR} && {make_git_diff_script(log_diff)}"],
+        user=DOCKER_USER,
+    )
+    _, diff_hash, diff = parse_git_diff_output(val.output.decode(UTF8, errors="replace"))
+    return diff_hash, diff
+
+
 def remove_image(client, image_id, logger=None):
     """
     Remove a Docker image by ID.
@@ -88,8 +261,10 @@ def remove_image(client, image_id, logger=None):
     try:
         log_info(f"Attempting to remove image {image_id}...")
         client.images.remove(image_id, force=True)
+        get_image_inventory(client).discard(image_id)
         log_info(f"Image {image_id} removed.")
     except docker.errors.ImageNotFound:
+        get_image_inventory(client).discard(image_id)
         log_info(f"Image {image_id} not found, removing has no effect.")
     except Exception as e:
         if raise_error:
@@ -172,29 +347,38 @@ def cleanup_container(client, container, logger):
         )
 
 
-def exec_run_with_timeout(container, cmd, timeout: int | None = 60):
+def exec_run_with_timeout(
+    container,
+    cmd,
+    timeout: int | None = 60,
+    capture: TestOutputCapture | None = None,
+):
     """
     Run a command in a container with a timeout.
+    The command is also killed if `capture` asks to stop early.
 
     Args:
         container (docker.Container): Container to run the command in.
         cmd (str): Command to run.
         timeout (int): Timeout in seconds.
+        capture (TestOutputCapture): If given, output is streamed into it instead of
+            being held in memory, and only its test output region is returned.
     """
     # Local variables to store the result of executing the command
-    exec_result = b""
+    chunks = []
     exec_id = None
     exception = None
-    timed_out = False
+    on_output = capture.feed if capture is not None else chunks.append
 
     # Wrapper function to run the command
     def run_command():
-        nonlocal exec_result, exec_id, exception
+        nonlocal exec_id, exception
         try:
             exec_id = container.client.api.exec_create(container.id, cmd)["Id"]
             exec_stream = container.client.api.exec_start(exec_id, stream=True)
             for chunk in exec_stream:
-                exec_result += chunk
+                if on_output(chunk):
+                    break
         except Exception as e:
             exception = e
 
@@ -208,13 +392,14 @@ def exec_run_with_timeout(container, cmd, timeout: int | None = 60):
         raise exception
 
     # If the thread is still alive, the command timed out
-    if thread.is_alive():
-        if exec_id is not None:
-            exec_pid = container.client.api.exec_inspect(exec_id)["Pid"]
-            container.exec_run(f"kill -TERM {exec_pid}", detach=True)
-        timed_out = True
+    timed_out = thread.is_alive()
+    stopped = capture is not None and capture.stopped_early
+    if (timed_out or stopped) and exec_id is not None:
+        container.exec_run(DOCKER_KILL_PROCESSES, detach=True)
     end_time = time.time()
-    return exec_result.decode(), timed_out, end_time - start_time
+    if capture is not None:
+        return capture.test_output, timed_out, end_time - start_time
+    return b"".join(chunks).decode(), timed_out, end_time - start_time
 
 
 def find_dependent_images(client: docker.DockerClient, image_name: str):
@@ -257,10 +442,9 @@ def find_dependent_images(client: docker.DockerClient, image_name: str):
 
 def list_images(client: docker.DockerClient):
     """
-    List all images from the Docker client.
+    List all images from the Docker client (from its shared image inventory).
     """
-    # don't use this in multi-threaded context
-    return {tag for i in client.images.list(all=True) for tag in i.tags}
+    return get_image_inventory(client).tags()
 
 
 def clean_images(
@@ -1,81 +1,144 @@
 from typing import Any
 
 from swebench.harness.constants import (
-    APPLY_PATCH_FAIL,
     END_TEST_OUTPUT,
     FAIL_ONLY_REPOS,
     FAIL_TO_FAIL,
     FAIL_TO_PASS,
     KEY_INSTANCE_ID,
     KEY_PREDICTION,
+    LOG_BAD_CODES,
     MAP_REPO_VERSION_TO_SPECS,
     PASS_TO_FAIL,
     PASS_TO_PASS,
-    RESET_FAILED,
     START_TEST_OUTPUT,
-    TESTS_ERROR,
-    TESTS_TIMEOUT,
     EvalType,
     ResolvedStatus,
     TestStatus,
 )
 from swebench.harness.test_spec.test_spec import TestSpec
 from swebench.harness.log_parsers import MAP_REPO_TO_PARSER
+from swebench.harness.log_parsers.structured import make_structured_log_parser
+from swebench.harness.parsed_log_cache import ParsedLogCache
 
 
 # MARK: Utility functions
+PASSED_STATUSES = frozenset([TestStatus.PASSED.value, TestStatus.XFAIL.value])
+FAILED_STATUSES = frozenset([TestStatus.FAILED.value, TestStatus.ERROR.value])
+
+
 def test_passed(case: str, sm: dict[str, str]) -> bool:
-    return case in sm and sm[case] in [TestStatus.PASSED.value, TestStatus.XFAIL.value]
+    return sm.get(case) in PASSED_STATUSES
 
 
 def test_failed(case: str, sm: dict[str, str]) -> bool:
-    return case not in sm or sm[case] in [TestStatus.FAILED.value, TestStatus.ERROR.value]
+    return case not in sm or sm[case] in FAILED_STATUSES
+
+
+def get_log_parser(test_spec: TestSpec):
+    """
+    Log parser for a test spec: its own parser if set, else the repo's parser.
+    If the test spec has a structured `test_report`, its report(s) are parsed
+    instead, with that parser as fallback.
+    """
+    if test_spec.log_parser:
+        log_parser = test_spec.log_parser
+    elif test_spec.test_report:
+        log_parser = MAP_REPO_TO_PARSER.get(test_spec.repo)
+    else:
+        log_parser = MAP_REPO_TO_PARSER[test_spec.repo]
+    if test_spec.test_report:
+        return make_structured_log_parser(test_spec.test_report, log_parser)
+    return log_parser
+
+
+class TestsDoneCondition:
+    """
+    Stop condition for streamed test results (see `TestOutputCapture`): called with
+    the statuses reported by each line, returns True as soon as a PASS_TO_PASS test
+    fails, at which point the instance is known to be unresolved.
+
+    Only failures are decisive: the log parsers keep the last status reported for a
+    test, and a passing test may still be reported as failed later on (e.g. pytest
+    -rA reports PASSED before an ERROR in the test's teardown), so a run is never
+    stopped just because every test has reported a status.
+
+    With `decide_fast`, also returns True as soon as a FAIL_TO_PASS test fails,
+    though the FAIL_TO_PASS / PASS_TO_PASS breakdown of the report is then
+    incomplete.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(self, test_spec: TestSpec, decide_fast: bool = False):
+        self.pass_to_pass = set(test_spec.PASS_TO_PASS)
+        self.fail_to_pass = set(test_spec.FAIL_TO_PASS)
+        self.decide_fast = decide_fast
+
+    def __call__(self, updates: dict[str, str]) -> bool:
+        return any(
+            test_failed(test, updates)
+            and (
+                test in self.pass_to_pass
+                or (self.decide_fast and test in self.fail_to_pass)
+            )
+            for test in updates
+        )
 
 
 # MARK: Evaluation report functions
-def get_logs_eval(test_spec: TestSpec, log_fp: str) -> tuple[dict[str, str], bool]:
+def get_logs_eval(
+    test_spec: TestSpec, log_fp: str, use_cache: bool = True
+) -> tuple[dict[str, str], bool]:
     """
     Retrieve evaluation results for a task instance from its corresponding log file
 
     Args:
         log_fp (str): path to log file
+        use_cache (bool): load / store the result in the log's parsed-log cache
+            (see `parsed_log_cache.ParsedLogCache`)
     Returns:
         bool: whether the patch applied successfully
         dict: status map
 
     TODO(john-b-yang): Check this is working properly...
     """
-    repo = test_spec.repo
-    version = test_spec.version
-    
-    if test_spec.log_parser:
-        log_parser = test_spec.log_parser
-    else:
-        log_parser = MAP_REPO_TO_PARSER[repo]
+    log_parser = get_log_parser(test_spec)
+
+    parsed_cache = ParsedLogCache(log_fp, log_parser) if use_cache else None
+    if parsed_cache is not None:
+        cached = parsed_cache.load_fresh()
+        if cached is not None:
+            return cached
 
     with open(log_fp) as f:
         content = f.read()
-        # TODO fix constant here
-        bad_codes = list(
-            filter(
-                lambda x: x in content,
-                [
-                    APPLY_PATCH_FAIL,
-                    RESET_FAILED,
-                    TESTS_ERROR,
-                    TESTS_TIMEOUT,
-                ],
-            )
-        )
-        if bad_codes:
-            return {}, False
-        elif not (START_TEST_OUTPUT in content and END_TEST_OUTPUT in content):
-            # Test patch did not apply (should not happen at all)
-            return {}, False
+    if parsed_cache is not None:
+        cached = parsed_cache.load(content)
+        if cached is None:
+            cached = parse_logs_eval(log_parser, test_spec, content)
+            parsed_cache.store(content, cached)
+        return cached
+    return parse_logs_eval(log_parser, test_spec, content)
+
+
+def parse_logs_eval(
+    log_parser, test_spec: TestSpec, content: str
+) -> tuple[dict[str, str], bool]:
+    """
+    Evaluation results of a task instance from the content of its log file (see
+    `get_logs_eval`)
+    """
+    bad_codes = [code for code in LOG_BAD_CODES if code in content]
+    if bad_codes:
+        return {}, False
+    elif not (START_TEST_OUTPUT in content and END_TEST_OUTPUT in content):
+        # Test patch did not apply (should not happen at all)
+        return {}, False
 
-        # Get status map of evaluation results
-        content = content.split(START_TEST_OUTPUT)[1].split(END_TEST_OUTPUT)[0]
-        return log_parser(content, test_spec), True
+    # Get status map of evaluation results
+    content = content.split(START_TEST_OUTPUT)[1].split(END_TEST_OUTPUT)[0]
+    return log_parser(content, test_spec), True
 
 
 def get_eval_tests_report(
@@ -106,38 +169,33 @@ def get_eval_tests_report(
     - Fail-Fail (F2F) + P: Success (Extra Credit)
     - Pass-Fail (P2F) + P: Not considered
     """
+    # Classify the status map once, so each gold test is a single set lookup
+    if eval_type == EvalType.PASS_AND_FAIL:
+        passed = {t for t, s in eval_status_map.items() if s in PASSED_STATUSES}
+        # Tests with a status that is neither passed nor failed (e.g. SKIPPED) count
+        # as neither; tests missing from the status map count as failed
+        not_failed = {t for t, s in eval_status_map.items() if s not in FAILED_STATUSES}
+
+        def check_test_cases(test_cases):
+            success = [t for t in test_cases if t in passed]
+            failed = [t for t in test_cases if t not in not_failed]
+            return success, failed
 
-    def check_pass_and_fail(test_case, eval_status_map, success, failed):
-        if test_passed(test_case, eval_status_map):
-            # Assume silent success for now (test case not in eval_sm)
-            success.append(test_case)
-        elif test_failed(test_case, eval_status_map):
-            failed.append(test_case)
-
-    def check_fail_only(test_case, eval_status_map, success, failed):
-        if (
-            test_case in eval_status_map
-            and eval_status_map[test_case] == TestStatus.FAILED.value
-        ):
-            failed.append(test_case)
-        else:
-            success.append(test_case)
-
-    check_test_case = (
-        check_pass_and_fail if eval_type == EvalType.PASS_AND_FAIL else check_fail_only
-    )
+    else:
+        failed_only = {
+            t for t, s in eval_status_map.items() if s == TestStatus.FAILED.value
+        }
+
+        def check_test_cases(test_cases):
+            success = [t for t in test_cases if t not in failed_only]
+            failed = [t for t in test_cases if t in failed_only]
+            return success, failed
 
     # Calculate resolution metrics
-    f2p_success = []
-    f2p_failure = []
-    for test_case in gold_results[FAIL_TO_PASS]:
-        check_test_case(test_case, eval_status_map, f2p_success, f2p_failure)
+    f2p_success, f2p_failure = check_test_cases(gold_results[FAIL_TO_PASS])
 
     # Calculate maintenance metrics
-    p2p_success = []
-    p2p_failure = []
-    for test_case in gold_results[PASS_TO_PASS]:
-        check_test_case(test_case, eval_status_map, p2p_success, p2p_failure)
+    p2p_success, p2p_failure = check_test_cases(gold_results[PASS_TO_PASS])
 
     results = {
         FAIL_TO_PASS: {
@@ -156,12 +214,10 @@ def get_eval_tests_report(
     p2f_failure = []
     if calculate_to_fail:
         # Calculate "extra credit" metrics
-        for test_case in gold_results[FAIL_TO_FAIL]:
-            check_test_case(test_case, eval_status_map, f2f_success, f2f_failure)
+        f2f_success, f2f_failure = check_test_cases(gold_results[FAIL_TO_FAIL])
 
         # Calculate not considered metrics
-        for test_case in gold_results[PASS_TO_FAIL]:
-            check_test_case(test_case, eval_status_map, p2f_success, p2f_failure)
+        p2f_success, p2f_failure = check_test_cases(gold_results[PASS_TO_FAIL])
 
     results.update(
         {
@@ -224,6 +280,7 @@ def get_eval_report(
     prediction: dict[str, str],
     test_log_path: str,
     include_tests_status: bool,
+    parsed_log: tuple[dict[str, str], bool] | None = None,
 ) -> dict[str, Any]:
     """
     Generate a report of model evaluation results from a prediction, task instance,
@@ -234,6 +291,8 @@ def get_eval_report(
         prediction (dict): prediction containing keys "instance_id", "model_name_or_path", and "model_patch"
         log_path (str): path to evaluation log
         include_tests_status (bool): whether to include the status of each test in the returned report
+        parsed_log (tuple): result of `get_logs_eval` if already computed while the
+            tests ran (e.g. by `TestOutputCapture.logs_eval`); the log is not re-read
     Returns:
         report (dict): report of metrics
     """
@@ -254,7 +313,9 @@ def get_eval_report(
     report_map[instance_id]["patch_exists"] = True
 
     # Get evaluation logs
-    eval_status_map, found = get_logs_eval(test_spec, test_log_path)
+    if parsed_log is None:
+        parsed_log = get_logs_eval(test_spec, test_log_path)
+    eval_status_map, found = parsed_log
 
     if not found:
         return report_map
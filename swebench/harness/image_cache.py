@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+
+from pathlib import Path
+from typing import Callable
+
+import docker
+
+from swebench.harness.docker_utils import remove_image
+
+# Eviction order of the image kinds: instance images first, base images last
+EVICTION_ORDER = ["sweb.eval", "sweb.env", "sweb.base"]
+
+# Disk usage is re-read from the daemon at most this often (in seconds); in between
+# it is estimated from the sizes of the evicted images
+REFRESH_INTERVAL = 60
+
+# Default file for the last-use times of the images
+DEFAULT_STATE_PATH = Path("logs/image_cache.json")
+
+SIZE_UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+
+
+def parse_size(size: str | int) -> int:
+    """Size such as "500GB" or "1.5TB" (or a number of bytes) in bytes"""
+    if isinstance(size, int):
+        return size
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?B)?", size.strip().upper())
+    if not match:
+        raise ValueError(f"Invalid size: {size}")
+    value, unit = match.groups()
+    return int(float(value) * SIZE_UNITS[unit or "B"])
+
+
+def get_eviction_rank(image_name: str) -> int | None:
+    """Position of an image's kind in EVICTION_ORDER, or None if it is not a sweb image"""
+    if "/" in image_name:
+        image_name = image_name.split("/", 1)[-1]
+    for rank, prefix in enumerate(EVICTION_ORDER):
+        if image_name.startswith(prefix):
+            return rank
+    return None
+
+
+class ImageCache:
+    """
+    Keeps the local sweb images within a disk budget, evicting the least recently
+    used ones first.
+
+    Disk usage and image sizes come from `docker system df` (an image frees its
+    size minus the layers it shares with other images). When usage exceeds the
+    budget, instance images are evicted first, then env images, then base
+    images, each kind least recently used first. Images that pending payloads
+    still need (see `protect` / `release`) are never evicted.
+
+    Last-use times can be kept in a JSON file (`state_path`), so the LRU order
+    survives restarts of long-running evaluation processes.
+    """
+
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        budget: int | str,
+        state_path: Path | str | None = None,
+        on_evict: Callable[[str], None] | None = None,
+    ):
+        """
+        Args:
+            client (docker.DockerClient): Docker client
+            budget (int | str): Disk budget for images, in bytes or as e.g. "500GB"
+            state_path (Path): JSON file to load / save the last-use times in
+            on_evict (Callable): Called with an image's name before it is removed
+                (e.g. to stop the pooled containers using it)
+        """
+        self.client = client
+        self.budget = parse_size(budget)
+        self.state_path = Path(state_path) if state_path is not None else None
+        self.on_evict = on_evict
+        self.usage = 0
+        self.last_used: dict[str, float] = {}
+        # Image name -> (image ID, bytes freed by removing the image)
+        self.sizes: dict[str, tuple[str, int]] = {}
+        self._protected: dict[str, int] = {}
+        self._refreshed: float | None = None
+        self._lock = threading.RLock()
+        if self.state_path is not None and self.state_path.exists():
+            try:
+                self.last_used = json.loads(self.state_path.read_text())
+            except (OSError, ValueError):
+                pass
+
+    def protect(self, image_names: list[str]):
+        """Protect images from eviction until each of them is `release`d (as often)"""
+        with self._lock:
+            for name in image_names:
+                self._protected[name] = self._protected.get(name, 0) + 1
+
+    def release(self, image_name: str):
+        """Mark one use of an image as done, and the image as just used"""
+        with self._lock:
+            count = self._protected.get(image_name, 0) - 1
+            if count > 0:
+                self._protected[image_name] = count
+            else:
+                self._protected.pop(image_name, None)
+            self.touch(image_name)
+
+    def touch(self, image_name: str):
+        """Mark an image as just used"""
+        with self._lock:
+            self.last_used[image_name] = time.time()
+
+    def refresh(self):
+        """Read the disk usage and image sizes from the daemon"""
+        df = self.client.df()
+        with self._lock:
+            self.sizes = {}
+            for image in df.get("Images") or []:
+                shared = max(image.get("SharedSize", 0), 0)
+                for tag in image.get("RepoTags") or []:
+                    self.sizes[tag] = (image["Id"], image["Size"] - shared)
+                    # Images without a recorded use are as old as their creation
+                    self.last_used.setdefault(tag, image.get("Created", 0))
+            self.usage = df.get("LayersSize", 0)
+            self._refreshed = time.monotonic()
+
+    def candidates(self) -> list[str]:
+        """Images that may be evicted, in eviction order"""
+        with self._lock:
+            ranked = [
+                (rank, self.last_used.get(name, 0), name)
+                for name in self.sizes
+                if name not in self._protected
+                and (rank := get_eviction_rank(name)) is not None
+            ]
+        return [name for _, _, name in sorted(ranked)]
+
+    def enforce(self) -> list[str]:
+        """
+        Evict images until the disk usage is within the budget.
+
+        Returns:
+            list: names of the evicted images
+        """
+        with self._lock:
+            if (
+                self._refreshed is None
+                or time.monotonic() - self._refreshed > REFRESH_INTERVAL
+            ):
+                self.refresh()
+            if self.usage <= self.budget:
+                return []
+            evicted = []
+            for name in self.candidates():
+                if self.usage <= self.budget:
+                    break
+                if self._evict(name):
+                    evicted.append(name)
+            if evicted:
+                print(
+                    f"Evicted {len(evicted)} images to stay within the "
+                    f"{self.budget / SIZE_UNITS['GB']:.1f} GB image budget"
+                )
+                self.save()
+            return evicted
+
+    def save(self):
+        """Save the last-use times to `state_path` (if set)"""
+        if self.state_path is None:
+            return
+        with self._lock:
+            state = json.dumps(self.last_used)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(state)
+        os.replace(tmp_path, self.state_path)
+
+    def _evict(self, image_name: str) -> bool:
+        image_id, size = self.sizes[image_name]
+        if self.on_evict is not None:
+            self.on_evict(image_name)
+        try:
+            remove_image(self.client, image_name, "quiet")
+        except Exception as e:
+            # E.g. an image other images are built from
+            print(f"Error evicting image {image_name}: {e}")
+            return False
+        del self.sizes[image_name]
+        self.last_used.pop(image_name, None)
+        # The layers are only freed once the image's last tag is removed
+        if all(other_id != image_id for other_id, _ in self.sizes.values()):
+            self.usage -= size
+        return True
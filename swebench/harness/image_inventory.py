@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import threading
+import time
+import traceback
+
+import docker
+import docker.errors
+
+# Image events after which the tags of the image are looked up again
+TAG_ACTIONS = {"build", "import", "load", "pull", "tag"}
+UNTAG_ACTIONS = {"delete", "untag"}
+
+
+class ImageInventory:
+    """
+    Thread-safe set of the local image tags of a Docker daemon.
+
+    The inventory is a single `images.list` snapshot, kept up to date from the
+    daemon's event stream (`/events`) by a background thread, so checking whether
+    an image exists is a set lookup instead of an `images.get` round trip per
+    image. Images the harness builds, pulls or removes itself are recorded right
+    away with `add` / `discard`, without waiting for their events.
+
+    Use `get_image_inventory` to share one inventory per Docker daemon.
+    """
+
+    def __init__(self, client: docker.DockerClient, watch: bool = True):
+        """
+        Args:
+            client (docker.DockerClient): Docker client
+            watch (bool): Follow the event stream to stay up to date; if False, the
+                inventory only changes through `refresh`, `add` and `discard`
+        """
+        self.client = client
+        self.watch = watch
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._tag_to_id: dict[str, str] = {}
+        self._id_to_tags: dict[str, set[str]] = {}
+        self._events = None
+        self._watcher: threading.Thread | None = None
+        # Set by the current watcher once it stops following events (it may still
+        # be alive for a moment after that)
+        self._watcher_ended = threading.Event()
+        self._stale = True
+        self._closed = False
+
+    def refresh(self):
+        """Replace the inventory with a new snapshot, and (re)start following events"""
+        since = int(time.time())
+        images = self.client.images.list(all=True)
+        with self._lock:
+            self._tag_to_id.clear()
+            self._id_to_tags.clear()
+            for image in images:
+                self._set_tags(image.id, image.tags)
+            self._stale = False
+        if self.watch and not self._closed:
+            self._start_watcher(since)
+
+    def tags(self) -> set[str]:
+        """All local image tags"""
+        self._ensure_fresh()
+        with self._lock:
+            return set(self._tag_to_id)
+
+    def exists(self, image_name: str) -> bool:
+        """Whether an image with this tag (or ID) exists locally"""
+        self._ensure_fresh()
+        with self._lock:
+            return image_name in self._tag_to_id or image_name in self._id_to_tags
+
+    __contains__ = exists
+
+    def add(self, image_name: str):
+        """Record that an image was built / pulled under `image_name`"""
+        self._sync(image_name)
+
+    def discard(self, image_name: str):
+        """Record that an image was removed"""
+        with self._lock:
+            self._drop(image_name)
+
+    def close(self):
+        """Stop following the event stream"""
+        self._closed = True
+        if self._events is not None:
+            self._events.close()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+
+    def handle_event(self, event: dict):
+        """Update the inventory for an image event of the Docker event stream"""
+        if event.get("Type") != "image":
+            return
+        action = event.get("Action") or event.get("status")
+        actor = event.get("Actor", {})
+        image_id = actor.get("ID") or event.get("id")
+        name = actor.get("Attributes", {}).get("name")
+        if action in TAG_ACTIONS:
+            self._sync(name or image_id)
+        elif action in UNTAG_ACTIONS and image_id:
+            # Untag events name the image ID, not the tag that was removed
+            self._sync(image_id)
+
+    def _ensure_fresh(self):
+        if not self._stale:
+            return
+        with self._refresh_lock:
+            # Another thread may have refreshed while this one waited
+            if self._stale:
+                self.refresh()
+
+    def _start_watcher(self, since: int):
+        if self._watcher is not None and not self._watcher_ended.is_set():
+            return
+        self._events = self.client.events(
+            decode=True, filters={"type": "image"}, since=since
+        )
+        self._watcher_ended = threading.Event()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(self._events, self._watcher_ended), daemon=True
+        )
+        self._watcher.start()
+
+    def _watch(self, events, ended: threading.Event):
+        try:
+            for event in events:
+                self.handle_event(event)
+        except Exception as e:
+            if not self._closed:
+                print(f"Image event stream failed, will take a new snapshot: {e}")
+                traceback.print_exc()
+        # Signal the end before marking the inventory stale, so the refresh this
+        # triggers always starts a new watcher
+        ended.set()
+        # Events may have been missed, so take a new snapshot on the next lookup
+        self._stale = not self._closed
+
+    def _sync(self, image_name: str | None):
+        if not image_name:
+            return
+        try:
+            image = self.client.images.get(image_name)
+        except docker.errors.ImageNotFound:
+            with self._lock:
+                self._drop(image_name)
+            return
+        with self._lock:
+            self._set_tags(image.id, image.tags)
+
+    def _set_tags(self, image_id: str, tags: list[str]):
+        for tag in self._id_to_tags.pop(image_id, set()):
+            self._tag_to_id.pop(tag, None)
+        # A tag moved to this image no longer names its previous image
+        for tag in tags:
+            previous = self._tag_to_id.get(tag)
+            if previous is not None:
+                self._id_to_tags[previous].discard(tag)
+            self._tag_to_id[tag] = image_id
+        self._id_to_tags[image_id] = set(tags)
+
+    def _drop(self, image_name: str):
+        image_id = self._tag_to_id.pop(image_name, None)
+        if image_id is not None:
+            self._id_to_tags[image_id].discard(image_name)
+            return
+        for tag in self._id_to_tags.pop(image_name, set()):
+            self._tag_to_id.pop(tag, None)
+
+
+# Inventories by Docker daemon URL
+_inventories: dict[str, ImageInventory] = {}
+_inventories_lock = threading.Lock()
+
+
+def _daemon_url(client: docker.DockerClient) -> str:
+    api = getattr(client, "api", None)
+    return getattr(api, "base_url", None) or str(id(client))
+
+
+def get_image_inventory(client: docker.DockerClient) -> ImageInventory:
+    """
+    Image inventory of the Docker daemon of a client, shared by every client of
+    the daemon (the first client to ask is used for the daemon's inventory).
+    """
+    key = _daemon_url(client)
+    with _inventories_lock:
+        inventory = _inventories.get(key)
+        if inventory is None:
+            inventory = _inventories[key] = ImageInventory(client)
+        return inventory
+
+
+def close_image_inventory(client: docker.DockerClient):
+    """Stop following the event stream of the image inventory of a client's daemon"""
+    with _inventories_lock:
+        inventory = _inventories.pop(_daemon_url(client), None)
+    if inventory is not None:
+        inventory.close()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import threading
+import time
+import traceback
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import docker
+import docker.errors
+
+from docker.utils import parse_repository_tag
+
+from swebench.harness.image_inventory import get_image_inventory
+
+# Pull statuses after which a layer is fully downloaded
+LAYER_DONE_STATUSES = {"Already exists", "Download complete", "Pull complete"}
+
+
+@dataclass
+class PullProgress:
+    """Progress of the pull of one image, from the pull's progress messages"""
+
+    image_name: str
+    started: float = field(default_factory=time.time)
+    finished: float | None = None
+    error: str | None = None
+    # Layer ID -> [downloaded bytes, total bytes]
+    layers: dict[str, list[int]] = field(default_factory=dict)
+
+    def update(self, message: dict):
+        """Update the progress from a message of the pull's progress stream"""
+        layer_id = message.get("id")
+        status = message.get("status", "")
+        detail = message.get("progressDetail") or {}
+        if status == "Downloading" and detail.get("total"):
+            self.layers[layer_id] = [detail.get("current", 0), detail["total"]]
+        elif status in LAYER_DONE_STATUSES and layer_id in self.layers:
+            # Only layers that were downloaded count, not ones that existed already
+            self.layers[layer_id][0] = self.layers[layer_id][1]
+
+    @property
+    def bytes_done(self) -> int:
+        return sum(current for current, _ in self.layers.values())
+
+    @property
+    def bytes_total(self) -> int:
+        return sum(total for _, total in self.layers.values())
+
+
+class ImagePrefetcher:
+    """
+    Pulls remote images ahead of the workers that need them.
+
+    Images are pulled in the order the workers will need them, at most
+    `max_pulls` at a time and at most `max_ahead` images ahead of the workers
+    (pulled or being pulled, but not yet claimed with `wait`), so prefetching
+    does not fill the disk with images that are only needed much later.
+
+    Workers call `wait(image_name)` before using an image: it waits for the
+    image's prefetch if it has started, and otherwise takes the image off the
+    queue so the worker pulls it itself. Each image is pulled at most once.
+    """
+
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        image_names: list[str],
+        max_pulls: int = 2,
+        max_ahead: int = 4,
+    ):
+        """
+        Args:
+            client (docker.DockerClient): Docker client to pull with
+            image_names (list): Images to prefetch, in the order they will be needed
+            max_pulls (int): Maximum number of concurrent pulls
+            max_ahead (int): Maximum number of prefetched images not yet claimed
+        """
+        self.client = client
+        self.images = get_image_inventory(client)
+        self.max_pulls = max(max_pulls, 1)
+        self.max_ahead = max(max_ahead, 1)
+        self.progress: dict[str, PullProgress] = {}
+        self._queue = deque(
+            name for name in dict.fromkeys(image_names) if not self.images.exists(name)
+        )
+        self._pulls: dict[str, Future] = {}
+        self._claimed: set[str] = set()
+        self._ahead = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_pulls, thread_name_prefix="prefetch"
+        )
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+
+    def __len__(self):
+        """Number of images left to prefetch"""
+        return len(self._queue)
+
+    def start(self):
+        """Start prefetching in the background"""
+        if not self._feeder.is_alive():
+            self._feeder.start()
+        return self
+
+    def wait(self, image_name: str) -> bool:
+        """
+        Claim an image: wait for its prefetch to finish, if it was started.
+
+        Returns:
+            bool: True if the image was prefetched (so it does not need to be
+                pulled), False if the caller needs to pull (or build) it itself
+        """
+        with self._cond:
+            if image_name in self._claimed:
+                future = self._pulls.get(image_name)
+                return future is not None and future.done() and not future.exception()
+            self._claimed.add(image_name)
+            future = self._pulls.get(image_name)
+            if future is None:
+                try:
+                    self._queue.remove(image_name)
+                except ValueError:
+                    pass
+                return False
+        try:
+            future.result()
+            return True
+        except Exception:
+            # The caller pulls the image itself, logging the error to its own log
+            return False
+        finally:
+            with self._cond:
+                self._ahead -= 1
+                self._cond.notify_all()
+
+    def close(self):
+        """Stop prefetching (pulls in progress finish in the background)"""
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self) -> str:
+        """Summary of the prefetched images, e.g. to print after the run"""
+        pulls = list(self.progress.values())
+        done = [p for p in pulls if p.finished is not None and p.error is None]
+        failed = [p for p in pulls if p.error is not None]
+        gigabytes = sum(p.bytes_done for p in pulls) / 1e9
+        seconds = sum((p.finished or time.time()) - p.started for p in done)
+        return (
+            f"Prefetched {len(done)} images ({gigabytes:.2f} GB, "
+            f"{seconds:.0f}s of pulls), {len(failed)} failed"
+        )
+
+    def _feed(self):
+        while True:
+            with self._cond:
+                while (
+                    not self._closed and self._queue and self._ahead >= self.max_ahead
+                ):
+                    self._cond.wait()
+                if self._closed or not self._queue:
+                    return
+                image_name = self._queue.popleft()
+                self._ahead += 1
+                self._pulls[image_name] = self._executor.submit(self._pull, image_name)
+
+    def _pull(self, image_name: str):
+        progress = self.progress[image_name] = PullProgress(image_name)
+        repository, tag = parse_repository_tag(image_name)
+        try:
+            for message in self.client.api.pull(
+                repository, tag=tag or "latest", stream=True, decode=True
+            ):
+                if "error" in message:
+                    raise docker.errors.APIError(message["error"])
+                progress.update(message)
+            self.images.add(image_name)
+        except Exception as e:
+            progress.error = str(e)
+            print(f"Error prefetching image {image_name}: {e}")
+            traceback.print_exc()
+            raise
+        finally:
+            progress.finished = time.time()
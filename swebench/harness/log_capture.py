@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import codecs
+import threading
+
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+from swebench.harness.constants import (
+    END_TEST_OUTPUT,
+    LOG_BAD_CODES,
+    START_TEST_OUTPUT,
+    UTF8,
+)
+
+if TYPE_CHECKING:
+    from swebench.harness.log_parsers import IncrementalLogParser
+
+# Default cap on the test output region kept in memory by the harness
+# (the full output is always written to the log file)
+MAX_HEAD_CHARS = 1_000_000
+MAX_TAIL_CHARS = 1_000_000
+
+
+class TestOutputCapture:
+    """
+    Streaming sink for the output of an eval script.
+
+    Output chunks are decoded incrementally and written straight to `output_path`,
+    so the full log never has to be held in memory. Only the test output region
+    (between START_TEST_OUTPUT and END_TEST_OUTPUT, exactly as `get_logs_eval`
+    splits it) is kept in memory, optionally capped to its first `max_head` and
+    last `max_tail` characters.
+
+    If a `parser` is given, each line of the test output region is fed to it as it
+    arrives, and `logs_eval` then gives the same result as `get_logs_eval` on the
+    log file without re-reading it. `should_stop` is called with the statuses
+    reported by each line; once it returns True, `feed` returns True to tell the
+    caller the rest of the run is not needed.
+
+    `feed` may be called from a worker thread; once `close` has been called any
+    further output (e.g. from a command that is still being killed) is dropped.
+    Use as a context manager around the exec.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(
+        self,
+        output_path: Path | str | None = None,
+        max_head: int | None = None,
+        max_tail: int | None = None,
+        parser: IncrementalLogParser | None = None,
+        should_stop: Callable[[dict[str, str]], bool] | None = None,
+    ):
+        """
+        Args:
+            output_path (Path): File to write the full output to (None to only
+                keep the test output region)
+            max_head (int): If `max_head` or `max_tail` is set, number of leading
+                characters of the test output region to keep
+            max_tail (int): Number of trailing characters of the test output region to keep
+            parser (IncrementalLogParser): Parser to feed the test output lines to
+            should_stop (callable): Early stop condition, see above
+        """
+        self.output_path = output_path
+        self.capped = max_head is not None or max_tail is not None
+        self.max_head = max_head or 0
+        self.max_tail = max_tail or 0
+        self.size = 0  # characters of output seen
+        self.found_start = False
+        self.found_end = False
+        self.stopped_early = False
+        self.bad_codes: set[str] = set()
+        self.parser = parser
+        self.should_stop = should_stop
+        self._file = open(output_path, "w", encoding=UTF8) if output_path else None
+        self._decoder = codecs.getincrementaldecoder(UTF8)(errors="replace")
+        self._carry = ""  # possible start of a marker split across chunks
+        self._code_carry = ""  # same, for the bad codes
+        self._line = ""  # partial line of the test output region
+        self._head: list[str] = []
+        self._head_size = 0
+        self._tail: deque[str] = deque()
+        self._tail_size = 0
+        self._dropped = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "TestOutputCapture":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Consume a chunk of raw output.
+        Returns True if the run can be stopped early (see `should_stop`).
+        """
+        with self._lock:
+            if not self._closed:
+                self._feed_text(self._decoder.decode(chunk))
+            return self.stopped_early
+
+    def close(self):
+        """Flush pending output and close the output file"""
+        with self._lock:
+            if not self._closed:
+                self._feed_text(self._decoder.decode(b"", final=True))
+                if self.found_start and not self.found_end:
+                    self._region(self._carry)
+                    self._carry = ""
+                self._flush_line()
+                self._closed = True
+            if self._file is not None:
+                self._file.close()
+
+    @property
+    def test_output(self) -> str:
+        """Test output region seen so far (with a truncation notice if capped)"""
+        text = "".join(self._head)
+        if self._dropped:
+            text += f"\n[... {self._dropped} characters truncated ...]\n"
+        return text + "".join(self._tail)
+
+    def logs_eval(self) -> tuple[dict[str, str], bool] | None:
+        """
+        Result of `get_logs_eval` for the captured output, from the lines fed to
+        the parser. Call after `close`. Returns None if there is no parser or it
+        failed, in which case the log file should be parsed instead.
+        """
+        if self.parser is None or self.parser.error is not None:
+            return None
+        if self.bad_codes or not self.found_start:
+            return {}, False
+        if not self.found_end and not self.stopped_early:
+            return {}, False
+        return self.parser.finish(), True
+
+    def _feed_text(self, text: str):
+        if not text:
+            return
+        self.size += len(text)
+        if self._file is not None:
+            self._file.write(text)
+        self._scan_codes(text)
+        if self.found_end:
+            return
+        text = self._carry + text
+        self._carry = ""
+        if not self.found_start:
+            idx = text.find(START_TEST_OUTPUT)
+            if idx == -1:
+                self._carry = text[-(len(START_TEST_OUTPUT) - 1) :]
+                return
+            self.found_start = True
+            text = text[idx + len(START_TEST_OUTPUT) :]
+        idx = text.find(END_TEST_OUTPUT)
+        if idx != -1:
+            self.found_end = True
+            self._region(text[:idx])
+            self._flush_line()
+            return
+        split = max(len(text) - (len(END_TEST_OUTPUT) - 1), 0)
+        self._region(text[:split])
+        self._carry = text[split:]
+
+    def _scan_codes(self, text: str):
+        if len(self.bad_codes) == len(LOG_BAD_CODES):
+            return
+        text = self._code_carry + text
+        for code in LOG_BAD_CODES:
+            if code in text:
+                self.bad_codes.add(code)
+        self._code_carry = text[-(max(map(len, LOG_BAD_CODES)) - 1) :]
+
+    def _region(self, text: str):
+        self._keep(text)
+        if self.parser is None or not text:
+            return
+        lines = (self._line + text).split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            self._parse_line(line)
+
+    def _flush_line(self):
+        if self.parser is not None and self._line:
+            self._parse_line(self._line)
+        self._line = ""
+
+    def _parse_line(self, line: str):
+        updates = self.parser.feed_line(line)
+        if (
+            updates
+            and self.should_stop is not None
+            and not self.stopped_early
+            and self.should_stop(updates)
+        ):
+            self.stopped_early = True
+
+    def _keep(self, text: str):
+        if not text:
+            return
+        if not self.capped:
+            self._head.append(text)
+            return
+        if self._head_size < self.max_head:
+            room = self.max_head - self._head_size
+            self._head.append(text[:room])
+            self._head_size += len(text[:room])
+            text = text[room:]
+        if not text:
+            return
+        self._tail.append(text)
+        self._tail_size += len(text)
+        while self._tail_size > self.max_tail:
+            excess = self._tail_size - self.max_tail
+            first = self._tail[0]
+            if len(first) <= excess:
+                self._tail.popleft()
+                self._tail_size -= len(first)
+                self._dropped += len(first)
+            else:
+                self._tail[0] = first[excess:]
+                self._tail_size -= excess
+                self._dropped += excess
@@ -1,11 +1,19 @@
 from swebench.harness.log_parsers.c import MAP_REPO_TO_PARSER_C
 from swebench.harness.log_parsers.go import MAP_REPO_TO_PARSER_GO
+from swebench.harness.log_parsers.incremental import (
+    LINE_LOCAL_PARSERS,
+    IncrementalLogParser,
+)
 from swebench.harness.log_parsers.java import MAP_REPO_TO_PARSER_JAVA
 from swebench.harness.log_parsers.javascript import MAP_REPO_TO_PARSER_JS
 from swebench.harness.log_parsers.php import MAP_REPO_TO_PARSER_PHP
 from swebench.harness.log_parsers.python import MAP_REPO_TO_PARSER_PY
 from swebench.harness.log_parsers.ruby import MAP_REPO_TO_PARSER_RUBY
 from swebench.harness.log_parsers.rust import MAP_REPO_TO_PARSER_RUST
+from swebench.harness.log_parsers.structured import (
+    MAP_FORMAT_TO_PARSER,
+    make_structured_log_parser,
+)
 
 MAP_REPO_TO_PARSER = {
     **MAP_REPO_TO_PARSER_C,
@@ -20,5 +28,9 @@ MAP_REPO_TO_PARSER = {
 
 
 __all__ = [
+    "IncrementalLogParser",
+    "LINE_LOCAL_PARSERS",
+    "MAP_FORMAT_TO_PARSER",
     "MAP_REPO_TO_PARSER",
+    "make_structured_log_parser",
 ]
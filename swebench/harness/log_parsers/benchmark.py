@@ -0,0 +1,505 @@
+"""
+Benchmark and regression suite for the log parsers.
+
+For each parser family, a synthetic log is generated at each of the given sizes
+and every parser of the family is timed on it (throughput in MB/s, best of
+`--repeat` runs) and traced for its peak memory. Results can be saved as a
+baseline and compared against one, failing on regressions beyond `--tolerance`.
+
+Parsers that were optimized keep their previous implementation here
+(LEGACY_PARSERS); both must give identical status maps, on the synthetic logs
+and on every real log under `--logs_dir` (e.g. logs/run_evaluation).
+
+Usage:
+    python -m swebench.harness.log_parsers.benchmark --sizes 1KB 1MB 50MB \\
+        --save_baseline benchmarks.json
+    python -m swebench.harness.log_parsers.benchmark --baseline benchmarks.json \\
+        --logs_dir logs/run_evaluation
+"""
+
+import json
+import random
+import re
+import time
+import tracemalloc
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from swebench.harness.constants import (
+    END_TEST_OUTPUT,
+    LOG_TEST_OUTPUT,
+    RUN_EVALUATION_LOG_DIR,
+    START_TEST_OUTPUT,
+    TestStatus,
+)
+from swebench.harness.log_parsers.go import parse_log_gotest
+from swebench.harness.log_parsers.java import parse_log_ant, parse_log_maven
+from swebench.harness.log_parsers.javascript import parse_log_calypso, parse_log_jest
+from swebench.harness.log_parsers.php import parse_log_phpunit
+from swebench.harness.log_parsers.python import (
+    parse_log_django,
+    parse_log_matplotlib,
+    parse_log_pytest,
+    parse_log_pytest_options,
+    parse_log_pytest_v2,
+    parse_log_sympy,
+)
+from swebench.harness.log_parsers.ruby import (
+    parse_log_minitest,
+    parse_log_rspec_transformed_json,
+)
+from swebench.harness.log_parsers.rust import parse_log_cargo
+
+# MARK: Legacy implementations
+
+
+def legacy_parse_log_pytest(log: str, test_spec) -> dict[str, str]:
+    """Reference implementation of parse_log_pytest before the shared regex core"""
+    test_status_map = {}
+    for line in log.split("\n"):
+        if any([line.startswith(x.value) for x in TestStatus]):
+            # Additional parsing for FAILED status
+            if line.startswith(TestStatus.FAILED.value):
+                line = line.replace(" - ", " ")
+            test_case = line.split()
+            if len(test_case) <= 1:
+                continue
+            test_status_map[test_case[1]] = test_case[0]
+    return test_status_map
+
+
+def legacy_parse_log_pytest_options(log: str, test_spec) -> dict[str, str]:
+    """Reference implementation of parse_log_pytest_options before the regex core"""
+    option_pattern = re.compile(r"(.*?)\[(.*)\]")
+    test_status_map = {}
+    for line in log.split("\n"):
+        if any([line.startswith(x.value) for x in TestStatus]):
+            # Additional parsing for FAILED status
+            if line.startswith(TestStatus.FAILED.value):
+                line = line.replace(" - ", " ")
+            test_case = line.split()
+            if len(test_case) <= 1:
+                continue
+            has_option = option_pattern.search(test_case[1])
+            if has_option:
+                main, option = has_option.groups()
+                if (
+                    option.startswith("/")
+                    and not option.startswith("//")
+                    and "*" not in option
+                ):
+                    option = "/" + option.split("/")[-1]
+                test_name = f"{main}[{option}]"
+            else:
+                test_name = test_case[1]
+            test_status_map[test_name] = test_case[0]
+    return test_status_map
+
+
+def legacy_parse_log_pytest_v2(log: str, test_spec) -> dict[str, str]:
+    """Reference implementation of parse_log_pytest_v2 before the shared regex core"""
+    test_status_map = {}
+    escapes = "".join([chr(char) for char in range(1, 32)])
+    for line in log.split("\n"):
+        line = re.sub(r"\[(\d+)m", "", line)
+        translator = str.maketrans("", "", escapes)
+        line = line.translate(translator)
+        if any([line.startswith(x.value) for x in TestStatus]):
+            if line.startswith(TestStatus.FAILED.value):
+                line = line.replace(" - ", " ")
+            test_case = line.split()
+            if len(test_case) >= 2:
+                test_status_map[test_case[1]] = test_case[0]
+        # Support older pytest versions by checking if the line ends with the test status
+        elif any([line.endswith(x.value) for x in TestStatus]):
+            test_case = line.split()
+            if len(test_case) >= 2:
+                test_status_map[test_case[0]] = test_case[1]
+    return test_status_map
+
+
+def legacy_parse_log_matplotlib(log: str, test_spec) -> dict[str, str]:
+    """Reference implementation of parse_log_matplotlib before the shared regex core"""
+    test_status_map = {}
+    for line in log.split("\n"):
+        line = line.replace("MouseButton.LEFT", "1")
+        line = line.replace("MouseButton.RIGHT", "3")
+        if any([line.startswith(x.value) for x in TestStatus]):
+            # Additional parsing for FAILED status
+            if line.startswith(TestStatus.FAILED.value):
+                line = line.replace(" - ", " ")
+            test_case = line.split()
+            if len(test_case) <= 1:
+                continue
+            test_status_map[test_case[1]] = test_case[0]
+    return test_status_map
+
+
+# Optimized parser -> its previous implementation
+LEGACY_PARSERS = {
+    parse_log_pytest: legacy_parse_log_pytest,
+    parse_log_pytest_options: legacy_parse_log_pytest_options,
+    parse_log_pytest_v2: legacy_parse_log_pytest_v2,
+    parse_log_matplotlib: legacy_parse_log_matplotlib,
+}
+
+
+# MARK: Synthetic logs
+
+# Output interleaved with the test results in every synthetic log
+NOISE_LINES = [
+    "    def test_something(self):",
+    ">       assert result == expected",
+    "E       AssertionError: assert 1 == 2",
+    "src/module.py:42: in helper",
+    "----------------------------- Captured stdout call -----------------------------",
+    "\x1b[1mcollecting ... \x1b[0m",
+    "    at Object.<anonymous> (src/index.js:10:5)",
+    "[INFO] -------------------------------------------------------",
+    "",
+]
+
+
+def _results_pytest(rng, block):
+    lines = []
+    for i in range(10):
+        status = rng.choice([x.value for x in TestStatus])
+        test = f"tests/test_mod{block}.py::test_case_{i}[param-{i}]"
+        if status == TestStatus.FAILED.value:
+            lines.append(f"{status} {test} - AssertionError: assert {i} == 0")
+        else:
+            lines.append(f"{status} {test}")
+    lines.append(f"tests/test_mod{block}.py::test_legacy PASSED")
+    return lines
+
+
+def _results_django(rng, block):
+    outcomes = ["ok", "ok", "FAIL", "ERROR", "skipped 'reason'"]
+    return [
+        f"test_case_{i} (app{block}.tests.FooTests) ... {rng.choice(outcomes)}"
+        for i in range(10)
+    ]
+
+
+def _results_sympy(rng, block):
+    return [f"test_case_{block}_{i} {rng.choice(['ok', 'F', 'E'])}" for i in range(10)]
+
+
+def _results_jest(rng, block):
+    return [
+        f"    {rng.choice(['✓', '✕', '○'])} case {block} {i} ({rng.randint(1, 99)} ms)"
+        for i in range(10)
+    ]
+
+
+def _results_calypso(rng, block):
+    lines = [f"+ ./node_modules/.bin/jest client/mod{block}", f"  suite {block}"]
+    lines += [
+        f"    {rng.choice(['✓', '✕'])} case {i} ({rng.randint(1, 99)}ms)"
+        for i in range(10)
+    ]
+    return lines
+
+
+def _results_maven(rng, block):
+    return [
+        f"+ mvn test -Dtest=com.example.Mod{block}Test#test{i}\n"
+        f"[INFO] BUILD {rng.choice(['SUCCESS', 'FAILURE'])}"
+        for i in range(10)
+    ]
+
+
+def _results_ant(rng, block):
+    return [
+        f"    [junit] [{rng.choice(['PASS', 'FAIL', 'ERR'])}] Mod{block}Test.test{i}"
+        for i in range(10)
+    ]
+
+
+def _results_gotest(rng, block):
+    lines = []
+    for i in range(10):
+        lines.append(f"=== RUN   TestMod{block}Case{i}")
+        status = rng.choice(["PASS", "FAIL", "SKIP"])
+        lines.append(f"--- {status}: TestMod{block}Case{i} (0.0{i}s)")
+    return lines
+
+
+def _results_cargo(rng, block):
+    return [
+        f"test mod{block}::tests::case_{i} ... {rng.choice(['ok', 'FAILED', 'ignored'])}"
+        for i in range(10)
+    ]
+
+
+def _results_phpunit(rng, block):
+    lines = [f"Mod{block} (Tests\\Unit\\Mod{block}Test)"]
+    lines += [f" {rng.choice(['✔', '✘', '↩'])} Case {i}" for i in range(10)]
+    return lines
+
+
+def _results_minitest(rng, block):
+    return [
+        f"Mod{block}Test#test_case_{i}. = 0.00 s = {rng.choice(['.', 'F', 'E'])}"
+        for i in range(10)
+    ]
+
+
+def _results_rspec(rng, block):
+    return [
+        f"spec/mod{block}_spec.rb:{i} does thing - {rng.choice(['passed', 'failed'])}"
+        for i in range(10)
+    ]
+
+
+# Parser family -> (result lines generator, parsers of the family)
+PARSER_FAMILIES = {
+    "pytest": (
+        _results_pytest,
+        [
+            parse_log_pytest,
+            parse_log_pytest_options,
+            parse_log_pytest_v2,
+            parse_log_matplotlib,
+        ],
+    ),
+    "django": (_results_django, [parse_log_django]),
+    "sympy": (_results_sympy, [parse_log_sympy]),
+    "jest": (_results_jest, [parse_log_jest]),
+    "calypso": (_results_calypso, [parse_log_calypso]),
+    "maven": (_results_maven, [parse_log_maven]),
+    "ant": (_results_ant, [parse_log_ant]),
+    "gotest": (_results_gotest, [parse_log_gotest]),
+    "cargo": (_results_cargo, [parse_log_cargo]),
+    "phpunit": (_results_phpunit, [parse_log_phpunit]),
+    "minitest": (_results_minitest, [parse_log_minitest]),
+    "rspec": (_results_rspec, [parse_log_rspec_transformed_json]),
+}
+
+
+def make_log(family: str, size: int, seed: int = 0) -> str:
+    """
+    Synthetic test log of a parser family of roughly `size` characters: blocks
+    of output noise, each followed by a few test results in the family's format.
+
+    Args:
+        family (str): parser family (key of PARSER_FAMILIES)
+        size (int): approximate size of the log
+        seed (int): random seed
+    Returns:
+        str: log content
+    """
+    rng = random.Random(seed)
+    make_results, _ = PARSER_FAMILIES[family]
+    chunks, total, block = [], 0, 0
+    while total < size:
+        lines = [rng.choice(NOISE_LINES) for _ in range(40)]
+        lines += make_results(rng, block)
+        chunk = "\n".join(lines) + "\n"
+        chunks.append(chunk)
+        total += len(chunk)
+        block += 1
+    return "".join(chunks)[: max(size, 1)]
+
+
+def parse_size(size: str) -> int:
+    """Size such as "1KB", "20MB" or "1GB" in bytes"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?B)?", size.strip().upper())
+    if not match:
+        raise ValueError(f"Invalid size: {size}")
+    value, unit = match.groups()
+    units = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+    return int(float(value) * units[unit or "B"])
+
+
+# MARK: Measurement
+
+
+def measure(log_parser, log: str, repeat: int) -> tuple[float, dict[str, str]]:
+    """Best throughput of `log_parser` on `log` over `repeat` runs, in MB/s"""
+    best, result = float("inf"), {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = log_parser(log, None)
+        best = min(best, time.perf_counter() - start)
+    return len(log) / (1 << 20) / max(best, 1e-9), result
+
+
+def measure_peak_memory(log_parser, log: str) -> float:
+    """Peak memory allocated by `log_parser` while parsing `log`, in MB"""
+    tracemalloc.start()
+    try:
+        log_parser(log, None)
+        return tracemalloc.get_traced_memory()[1] / (1 << 20)
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_family(
+    family: str, sizes: list[str], repeat: int, seed: int
+) -> tuple[dict[str, dict], list[str]]:
+    """
+    Benchmark every parser of a family on synthetic logs of each size.
+
+    Returns:
+        dict: `<family>/<parser>/<size>` -> {"mb_per_s", "peak_mb"}
+        list: mismatches between optimized parsers and their legacy implementation
+    """
+    _, parsers = PARSER_FAMILIES[family]
+    results, mismatches = {}, []
+    for size in sizes:
+        log = make_log(family, parse_size(size), seed)
+        for log_parser in parsers:
+            key = f"{family}/{log_parser.__name__}/{size}"
+            mb_per_s, status_map = measure(log_parser, log, repeat)
+            results[key] = {
+                "mb_per_s": round(mb_per_s, 2),
+                "peak_mb": round(measure_peak_memory(log_parser, log), 3),
+            }
+            legacy_parser = LEGACY_PARSERS.get(log_parser)
+            if legacy_parser is not None:
+                legacy_mb_per_s, legacy_map = measure(legacy_parser, log, 1)
+                results[key]["legacy_mb_per_s"] = round(legacy_mb_per_s, 2)
+                if legacy_map != status_map:
+                    mismatches.append(key)
+    return results, mismatches
+
+
+def compare_to_baseline(
+    results: dict[str, dict], baseline: dict[str, dict], tolerance: float
+) -> list[str]:
+    """Results that regressed by more than `tolerance` relative to the baseline"""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        expected = baseline[key]
+        if result["mb_per_s"] < expected["mb_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: {result['mb_per_s']} MB/s (baseline {expected['mb_per_s']})"
+            )
+        # Small absolute slack, so tiny logs do not fail on allocator noise
+        if result["peak_mb"] > expected["peak_mb"] * (1 + tolerance) + 0.1:
+            regressions.append(
+                f"{key}: {result['peak_mb']} MB peak (baseline {expected['peak_mb']})"
+            )
+    return regressions
+
+
+def check_log_corpus(logs_dir: Path) -> list[str]:
+    """
+    Run every optimized parser and its legacy implementation on the test output
+    of every log under `logs_dir`.
+
+    Returns:
+        list: `<log path>: <parser>` for every log where they differ
+    """
+    mismatches = []
+    for log_fp in sorted(Path(logs_dir).rglob(LOG_TEST_OUTPUT)):
+        content = log_fp.read_text(errors="replace")
+        if START_TEST_OUTPUT in content:
+            content = content.split(START_TEST_OUTPUT)[1].split(END_TEST_OUTPUT)[0]
+        for log_parser, legacy_parser in LEGACY_PARSERS.items():
+            if log_parser(content, None) != legacy_parser(content, None):
+                mismatches.append(f"{log_fp}: {log_parser.__name__}")
+    return mismatches
+
+
+def main(
+    families: list[str] | None,
+    sizes: list[str],
+    repeat: int,
+    seed: int,
+    max_workers: int,
+    baseline: str | None,
+    save_baseline: str | None,
+    tolerance: float,
+    logs_dir: str | None,
+):
+    families = families or list(PARSER_FAMILIES)
+    results, mismatches = {}, []
+    # Families run in separate processes; use one worker for the most stable timings
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(benchmark_family, family, sizes, repeat, seed)
+            for family in families
+        ]
+        for future in futures:
+            family_results, family_mismatches = future.result()
+            results.update(family_results)
+            mismatches += family_mismatches
+
+    for key, result in results.items():
+        line = (
+            f"{key:<56} {result['mb_per_s']:9.1f} MB/s "
+            f"{result['peak_mb']:9.2f} MB peak"
+        )
+        if "legacy_mb_per_s" in result:
+            line += f"  (legacy {result['legacy_mb_per_s']:.1f} MB/s)"
+        print(line)
+
+    failures = [
+        f"status maps differ from legacy implementation: {key}" for key in mismatches
+    ]
+    if logs_dir:
+        corpus_mismatches = check_log_corpus(Path(logs_dir))
+        failures += [f"status maps differ on real log {m}" for m in corpus_mismatches]
+    if baseline:
+        failures += [
+            f"regression {r}"
+            for r in compare_to_baseline(
+                results, json.loads(Path(baseline).read_text()), tolerance
+            )
+        ]
+    if save_baseline:
+        Path(save_baseline).write_text(json.dumps(results, indent=4))
+        print(f"Saved baseline to {save_baseline}")
+    if failures:
+        print("\n".join(failures))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--families",
+        nargs="+",
+        choices=list(PARSER_FAMILIES),
+        help="Parser families to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["1KB", "1MB", "20MB"],
+        help="Sizes of the synthetic logs (e.g. 1KB 1MB 500MB)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of timed runs per parser"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=1,
+        help="Number of families benchmarked in parallel",
+    )
+    parser.add_argument("--baseline", type=str, help="Baseline to compare against")
+    parser.add_argument(
+        "--save_baseline", type=str, help="Path to save the results as a baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative regression in throughput / peak memory",
+    )
+    parser.add_argument(
+        "--logs_dir",
+        type=str,
+        help="Check optimized parsers against their legacy implementation on the "
+        f"real logs under this directory (e.g. {RUN_EVALUATION_LOG_DIR})",
+    )
+    args = parser.parse_args()
+    main(**vars(args))
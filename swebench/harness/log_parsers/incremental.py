@@ -0,0 +1,124 @@
+from typing import TYPE_CHECKING, Callable
+
+from swebench.harness.log_parsers.c import (
+    parse_log_googletest,
+    parse_log_jq,
+    parse_log_micropython_test,
+    parse_log_redis,
+)
+from swebench.harness.log_parsers.go import parse_log_gotest
+from swebench.harness.log_parsers.java import parse_log_ant, parse_log_gradle_custom
+from swebench.harness.log_parsers.javascript import (
+    parse_log_immutable_js,
+    parse_log_jest,
+    parse_log_jest_json,
+    parse_log_marked,
+    parse_log_react_pdf,
+    parse_log_tap,
+    parse_log_vitest,
+)
+from swebench.harness.log_parsers.python import (
+    parse_log_matplotlib,
+    parse_log_pytest,
+    parse_log_pytest_options,
+    parse_log_pytest_v2,
+    parse_log_seaborn,
+)
+from swebench.harness.log_parsers.ruby import (
+    parse_log_cucumber,
+    parse_log_jekyll,
+    parse_log_minitest,
+    parse_log_rspec_transformed_json,
+    parse_log_ruby_unit,
+)
+from swebench.harness.log_parsers.rust import parse_log_cargo
+
+if TYPE_CHECKING:
+    from swebench.harness.test_spec.test_spec import TestSpec
+
+
+# Parsers whose result for a log is the same as running them on each line of the
+# log in turn and merging the results (no state carried across lines, no patterns
+# spanning lines). These can be fed one line at a time.
+LINE_LOCAL_PARSERS = {
+    parse_log_ant,
+    parse_log_cargo,
+    parse_log_cucumber,
+    parse_log_googletest,
+    parse_log_gotest,
+    parse_log_gradle_custom,
+    parse_log_immutable_js,
+    parse_log_jekyll,
+    parse_log_jest,
+    parse_log_jest_json,
+    parse_log_jq,
+    parse_log_marked,
+    parse_log_matplotlib,
+    parse_log_micropython_test,
+    parse_log_minitest,
+    parse_log_pytest,
+    parse_log_pytest_options,
+    parse_log_pytest_v2,
+    parse_log_react_pdf,
+    parse_log_redis,
+    parse_log_rspec_transformed_json,
+    parse_log_ruby_unit,
+    parse_log_seaborn,
+    parse_log_tap,
+    parse_log_vitest,
+}
+
+
+class IncrementalLogParser:
+    """
+    Line-fed wrapper around a log parser.
+
+    Line-local parsers (see LINE_LOCAL_PARSERS) update `status_map` as each line
+    arrives; any other parser buffers the lines and runs once on `finish`. Either
+    way `finish` returns the same status map as running the parser on the whole log.
+    The buffer is not bounded, so the harness only feeds line-local parsers while
+    tests run (see `run_evaluation.make_test_output_capture`).
+    """
+
+    def __init__(
+        self,
+        log_parser: Callable[[str, "TestSpec"], dict[str, str]],
+        test_spec: "TestSpec",
+    ):
+        self.log_parser = log_parser
+        self.test_spec = test_spec
+        self.line_local = log_parser in LINE_LOCAL_PARSERS
+        self.status_map: dict[str, str] = {}
+        self.error: Exception | None = None
+        self._lines: list[str] = []
+
+    def feed_line(self, line: str) -> dict[str, str]:
+        """
+        Parse one line of test output (without the trailing newline).
+        Returns the test statuses reported by this line (empty for buffering parsers).
+        """
+        if self.error is not None:
+            return {}
+        if not self.line_local:
+            self._lines.append(line)
+            return {}
+        try:
+            updates = self.log_parser(line, self.test_spec)
+        except Exception as e:
+            # Leave it to the full-log parse to surface the error
+            self.error = e
+            return {}
+        self.status_map.update(updates)
+        return updates
+
+    def finish(self) -> dict[str, str]:
+        """
+        Return the final status map.
+        Raises the parser's error if it failed on any line.
+        """
+        if self.error is not None:
+            raise self.error
+        if not self.line_local:
+            self.status_map = self.log_parser("\n".join(self._lines), self.test_spec)
+            self._lines = []
+        return self.status_map
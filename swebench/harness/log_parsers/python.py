@@ -6,6 +6,32 @@ from swebench.harness.constants import TestStatus
 if TYPE_CHECKING:
     from swebench.harness.test_spec.test_spec import TestSpec
 
+# Shared core of the pytest parser family: lines starting with a test status, found
+# with a single regex scan of the log rather than by checking every line in Python
+TEST_STATUSES = tuple(x.value for x in TestStatus)
+PYTEST_STATUS_LINE = re.compile(
+    rf"^(?:{'|'.join(TEST_STATUSES)})[^\n]*", re.MULTILINE
+)
+
+
+def iter_pytest_status_lines(log: str):
+    """Lines of the log that start with a test status (same as `log.split("\\n")`)"""
+    for match in PYTEST_STATUS_LINE.finditer(log):
+        yield match.group()
+
+
+def parse_pytest_status_line(line: str) -> tuple[str, str] | None:
+    """
+    Test case and status of a `<STATUS> <test case> ...` line (None if there is no
+    test case). For FAILED lines the ` - <message>` separator is dropped.
+    """
+    if line.startswith(TestStatus.FAILED.value):
+        line = line.replace(" - ", " ")
+    test_case = line.split(maxsplit=2)
+    if len(test_case) <= 1:
+        return None
+    return test_case[1], test_case[0]
+
 
 def parse_log_pytest(log: str, test_spec: "TestSpec") -> dict[str, str]:
     """
@@ -17,15 +43,10 @@ def parse_log_pytest(log: str, test_spec: "TestSpec") -> dict[str, str]:
         dict: test case to test status mapping
     """
     test_status_map = {}
-    for line in log.split("\n"):
-        if any([line.startswith(x.value) for x in TestStatus]):
-            # Additional parsing for FAILED status
-            if line.startswith(TestStatus.FAILED.value):
-                line = line.replace(" - ", " ")
-            test_case = line.split()
-            if len(test_case) <= 1:
-                continue
-            test_status_map[test_case[1]] = test_case[0]
+    for line in iter_pytest_status_lines(log):
+        result = parse_pytest_status_line(line)
+        if result is not None:
+            test_status_map[result[0]] = result[1]
     return test_status_map
 
 
@@ -40,27 +61,22 @@ def parse_log_pytest_options(log: str, test_spec: "TestSpec") -> dict[str, str]:
     """
     option_pattern = re.compile(r"(.*?)\[(.*)\]")
     test_status_map = {}
-    for line in log.split("\n"):
-        if any([line.startswith(x.value) for x in TestStatus]):
-            # Additional parsing for FAILED status
-            if line.startswith(TestStatus.FAILED.value):
-                line = line.replace(" - ", " ")
-            test_case = line.split()
-            if len(test_case) <= 1:
-                continue
-            has_option = option_pattern.search(test_case[1])
-            if has_option:
-                main, option = has_option.groups()
-                if (
-                    option.startswith("/")
-                    and not option.startswith("//")
-                    and "*" not in option
-                ):
-                    option = "/" + option.split("/")[-1]
-                test_name = f"{main}[{option}]"
-            else:
-                test_name = test_case[1]
-            test_status_map[test_name] = test_case[0]
+    for line in iter_pytest_status_lines(log):
+        result = parse_pytest_status_line(line)
+        if result is None:
+            continue
+        test_name, status = result
+        has_option = option_pattern.search(test_name)
+        if has_option:
+            main, option = has_option.groups()
+            if (
+                option.startswith("/")
+                and not option.startswith("//")
+                and "*" not in option
+            ):
+                option = "/" + option.split("/")[-1]
+            test_name = f"{main}[{option}]"
+        test_status_map[test_name] = status
     return test_status_map
 
 
@@ -154,19 +170,16 @@ def parse_log_pytest_v2(log: str, test_spec: "TestSpec") -> dict[str, str]:
         dict: test case to test status mapping
     """
     test_status_map = {}
-    escapes = "".join([chr(char) for char in range(1, 32)])
+    color_code = re.compile(r"\[(\d+)m")
+    translator = str.maketrans("", "", "".join([chr(char) for char in range(1, 32)]))
     for line in log.split("\n"):
-        line = re.sub(r"\[(\d+)m", "", line)
-        translator = str.maketrans("", "", escapes)
-        line = line.translate(translator)
-        if any([line.startswith(x.value) for x in TestStatus]):
-            if line.startswith(TestStatus.FAILED.value):
-                line = line.replace(" - ", " ")
-            test_case = line.split()
-            if len(test_case) >= 2:
-                test_status_map[test_case[1]] = test_case[0]
+        line = color_code.sub("", line).translate(translator)
+        if line.startswith(TEST_STATUSES):
+            result = parse_pytest_status_line(line)
+            if result is not None:
+                test_status_map[result[0]] = result[1]
         # Support older pytest versions by checking if the line ends with the test status
-        elif any([line.endswith(x.value) for x in TestStatus]):
+        elif line.endswith(TEST_STATUSES):
             test_case = line.split()
             if len(test_case) >= 2:
                 test_status_map[test_case[0]] = test_case[1]
@@ -239,17 +252,12 @@ def parse_log_matplotlib(log: str, test_spec: "TestSpec") -> dict[str, str]:
         dict: test case to test status mapping
     """
     test_status_map = {}
-    for line in log.split("\n"):
+    for line in iter_pytest_status_lines(log):
         line = line.replace("MouseButton.LEFT", "1")
         line = line.replace("MouseButton.RIGHT", "3")
-        if any([line.startswith(x.value) for x in TestStatus]):
-            # Additional parsing for FAILED status
-            if line.startswith(TestStatus.FAILED.value):
-                line = line.replace(" - ", " ")
-            test_case = line.split()
-            if len(test_case) <= 1:
-                continue
-            test_status_map[test_case[1]] = test_case[0]
+        result = parse_pytest_status_line(line)
+        if result is not None:
+            test_status_map[result[0]] = result[1]
     return test_status_map
 
 
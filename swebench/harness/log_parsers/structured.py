@@ -0,0 +1,230 @@
+"""
+Parsers for machine-readable test reports, used instead of scraping the console
+output when an instance (or its specs) sets `test_report`:
+
+    {"format": "junit", "paths": ["target/surefire-reports/*.xml"]}
+    {"format": "gotest_json"}
+
+Report files listed in `paths` are printed to the test output between
+START_TEST_REPORT / END_TEST_REPORT markers by the eval script (see
+`test_spec.utils.make_test_report_commands`); formats written to the console
+(`go test -json`, `cargo test -- -Z unstable-options --format json`) need no
+`paths` and are read from the test output itself.
+"""
+
+import json
+import xml.etree.ElementTree as ET
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from swebench.harness.constants import (
+    END_TEST_REPORT,
+    START_TEST_REPORT,
+    TestStatus,
+)
+
+if TYPE_CHECKING:
+    from swebench.harness.test_spec.test_spec import TestSpec
+
+
+# Size of the chunks fed to the incremental XML parser
+XML_CHUNK_CHARS = 1 << 16
+
+JUNIT_DEFAULT_TEST_ID = "{classname}.{name}"
+
+
+def iter_test_reports(log: str) -> Iterator[str]:
+    """Report files printed to the log between START/END_TEST_REPORT markers"""
+    for section in log.split(START_TEST_REPORT)[1:]:
+        yield section.split(END_TEST_REPORT)[0].strip()
+
+
+def iter_json_lines(report: str) -> Iterator[dict]:
+    """JSON objects of the lines of `report`, skipping any line that is not one"""
+    for line in report.split("\n"):
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def parse_junit_xml(report: str, test_report: dict) -> dict[str, str]:
+    """
+    Parser for JUnit XML reports (surefire, gradle, `pytest --junitxml`, ...).
+
+    The report is fed to an incremental XML parser in chunks and each <testcase>
+    is discarded once read, so large reports are never held as a tree. Test IDs
+    are built from the <testcase> attributes with `test_report["test_id"]`
+    (default "{classname}.{name}").
+
+    Args:
+        report (str): report content
+        test_report (dict): test report settings of the instance
+    Returns:
+        dict: test case to test status mapping
+    """
+    test_id = test_report.get("test_id", JUNIT_DEFAULT_TEST_ID)
+    test_status_map = {}
+    parser = ET.XMLPullParser(events=("end",))
+    for start in range(0, len(report), XML_CHUNK_CHARS):
+        parser.feed(report[start : start + XML_CHUNK_CHARS])
+        for _, element in parser.read_events():
+            if element.tag != "testcase":
+                continue
+            attrs = {"classname": "", "name": "", **element.attrib}
+            tags = {child.tag for child in element}
+            if "failure" in tags:
+                status = TestStatus.FAILED.value
+            elif "error" in tags:
+                status = TestStatus.ERROR.value
+            elif "skipped" in tags:
+                status = TestStatus.SKIPPED.value
+            else:
+                status = TestStatus.PASSED.value
+            test_status_map[test_id.format(**attrs)] = status
+            element.clear()
+    parser.close()
+    return test_status_map
+
+
+def parse_gotest_json(report: str, test_report: dict) -> dict[str, str]:
+    """
+    Parser for `go test -json` output. Test IDs are the test names, as for
+    `parse_log_gotest`.
+
+    Args:
+        report (str): report content
+        test_report (dict): test report settings of the instance
+    Returns:
+        dict: test case to test status mapping
+    """
+    actions = {
+        "pass": TestStatus.PASSED.value,
+        "fail": TestStatus.FAILED.value,
+        "skip": TestStatus.SKIPPED.value,
+    }
+    test_status_map = {}
+    for record in iter_json_lines(report):
+        if record.get("Test") and record.get("Action") in actions:
+            test_status_map[record["Test"]] = actions[record["Action"]]
+    return test_status_map
+
+
+def parse_cargo_json(report: str, test_report: dict) -> dict[str, str]:
+    """
+    Parser for libtest's JSON output (`cargo test -- -Z unstable-options
+    --format json`). Test IDs are the test names, as for `parse_log_cargo`.
+
+    Args:
+        report (str): report content
+        test_report (dict): test report settings of the instance
+    Returns:
+        dict: test case to test status mapping
+    """
+    events = {
+        "ok": TestStatus.PASSED.value,
+        "failed": TestStatus.FAILED.value,
+        "ignored": TestStatus.SKIPPED.value,
+    }
+    test_status_map = {}
+    for record in iter_json_lines(report):
+        if record.get("type") == "test" and record.get("event") in events:
+            test_status_map[record["name"]] = events[record["event"]]
+    return test_status_map
+
+
+def parse_jest_json(report: str, test_report: dict) -> dict[str, str]:
+    """
+    Parser for jest's `--json` results. Test IDs are the ancestor titles and the
+    test title joined with " > ", as for `parse_log_jest_json`.
+
+    Args:
+        report (str): report content
+        test_report (dict): test report settings of the instance
+    Returns:
+        dict: test case to test status mapping
+    """
+    statuses = {
+        "passed": TestStatus.PASSED.value,
+        "failed": TestStatus.FAILED.value,
+        "pending": TestStatus.SKIPPED.value,
+        "skipped": TestStatus.SKIPPED.value,
+        "todo": TestStatus.SKIPPED.value,
+    }
+    # The results are one JSON document, which may follow other console output
+    decoder = json.JSONDecoder()
+    results = None
+    start = report.find("{")
+    while start != -1 and results is None:
+        try:
+            results, _ = decoder.raw_decode(report, start)
+        except json.JSONDecodeError:
+            start = report.find("{", start + 1)
+        else:
+            if not isinstance(results, dict) or "testResults" not in results:
+                results, start = None, report.find("{", start + 1)
+    test_status_map = {}
+    for test_file in (results or {}).get("testResults", []):
+        for assertion in test_file.get("assertionResults", []):
+            if assertion.get("status") not in statuses:
+                continue
+            test_name = " > ".join(
+                [*assertion.get("ancestorTitles", []), assertion["title"]]
+            )
+            test_status_map[test_name] = statuses[assertion["status"]]
+    return test_status_map
+
+
+MAP_FORMAT_TO_PARSER = {
+    "junit": parse_junit_xml,
+    "gotest_json": parse_gotest_json,
+    "cargo_json": parse_cargo_json,
+    "jest_json": parse_jest_json,
+}
+
+
+def parse_test_report(log: str, test_report: dict) -> dict[str, str]:
+    """
+    Status map of the test report(s) in a test log.
+
+    Args:
+        log (str): test output of the eval script
+        test_report (dict): test report settings of the instance
+    Returns:
+        dict: test case to test status mapping
+    """
+    report_parser = MAP_FORMAT_TO_PARSER[test_report["format"]]
+    reports = list(iter_test_reports(log)) if test_report.get("paths") else [log]
+    test_status_map = {}
+    for report in reports:
+        test_status_map.update(report_parser(report, test_report))
+    return test_status_map
+
+
+def make_structured_log_parser(
+    test_report: dict,
+    fallback: Callable[[str, "TestSpec"], dict[str, str]],
+) -> Callable[[str, "TestSpec"], dict[str, str]]:
+    """
+    Log parser that reads the test report(s) of `test_report` and falls back to
+    the console log parser `fallback` when there is no (readable) report, e.g.
+    the test run crashed before writing it.
+    """
+
+    def parse_log_structured(log: str, test_spec: "TestSpec") -> dict[str, str]:
+        try:
+            test_status_map = parse_test_report(log, test_report)
+        except (ET.ParseError, KeyError, TypeError, ValueError):
+            test_status_map = {}
+        if test_status_map or fallback is None:
+            return test_status_map
+        return fallback(log, test_spec)
+
+    # For `parsed_log_cache.get_parser_version`
+    parse_log_structured.test_report = test_report
+    parse_log_structured.fallback = fallback
+    return parse_log_structured
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import time
+
+from functools import cache
+from pathlib import Path
+from typing import Callable
+
+# Bump to invalidate every cached result (e.g. if the cache entries change)
+CACHE_FORMAT_VERSION = 1
+
+# Modules whose source is part of every cache key, besides the parser's own module:
+# `get_logs_eval` (grading) and the markers / bad codes it checks for (constants)
+GRADING_MODULES = ["swebench.harness.grading", "swebench.harness.constants"]
+
+# A log modified this shortly before it was cached may have been rewritten within
+# the filesystem's mtime granularity, so its size / mtime alone are not trusted
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def get_cache_path(log_fp: Path | str) -> Path:
+    """Cache file of a test log, next to it (test_output.txt -> test_output.parsed.json)"""
+    log_fp = Path(log_fp)
+    return log_fp.with_name(f"{log_fp.stem}.parsed.json")
+
+
+@cache
+def _module_source_hash(module_name: str) -> str:
+    try:
+        source = inspect.getsource(
+            sys.modules.get(module_name) or importlib.import_module(module_name)
+        )
+    except (ImportError, OSError, TypeError):
+        return "unknown"
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def get_parser_version(log_parser: Callable | None) -> str:
+    """
+    Version string of a log parser: its name and a hash of the source of the module
+    it is defined in, so editing a parser module invalidates the cached results of
+    its parsers. Structured report parsers also include their report settings and
+    fallback parser (see `log_parsers.structured.make_structured_log_parser`).
+    """
+    if log_parser is None:
+        return "none"
+    version = (
+        f"{log_parser.__module__}.{log_parser.__qualname__}"
+        f"@{_module_source_hash(log_parser.__module__)}"
+    )
+    if hasattr(log_parser, "test_report"):
+        version += f"[{json.dumps(log_parser.test_report, sort_keys=True)}"
+        version += f"|{get_parser_version(log_parser.fallback)}]"
+    return version
+
+
+class ParsedLogCache:
+    """
+    Content-addressed cache of the result of `get_logs_eval` for one test log,
+    stored as JSON next to the log and keyed by the sha256 of the log and the
+    version of the parser.
+
+    The log's size and mtime are stored as well: while they are unchanged (and
+    the log was not modified just before it was cached) the cached result is
+    returned without reading the log at all.
+    """
+
+    def __init__(self, log_fp: Path | str, log_parser: Callable | None):
+        self.log_fp = Path(log_fp)
+        self.path = get_cache_path(log_fp)
+        self.parser_version = ":".join(
+            [
+                str(CACHE_FORMAT_VERSION),
+                *(_module_source_hash(module) for module in GRADING_MODULES),
+                get_parser_version(log_parser),
+            ]
+        )
+
+    def _stat(self) -> list[int]:
+        stat = os.stat(self.log_fp)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _read(self) -> dict | None:
+        try:
+            entry = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return None
+        if entry.get("parser_version") != self.parser_version:
+            return None
+        return entry
+
+    def load_fresh(self) -> tuple[dict[str, str], bool] | None:
+        """Cached result if the log is unchanged since it was cached (by size / mtime)"""
+        entry = self._read()
+        if entry is None:
+            return None
+        stat = self._stat()
+        if entry.get("stat") != stat or stat[1] + RACY_WINDOW_NS > entry["cached_at"]:
+            return None
+        return entry["status_map"], entry["found"]
+
+    def load(self, content: str) -> tuple[dict[str, str], bool] | None:
+        """
+        Cached result for the log content `content`, if any. If the log's size /
+        mtime changed (e.g. it was copied) or were cached within RACY_WINDOW_NS of
+        the log being modified, they are updated in the cache so that later lookups
+        do not need to read the log.
+        """
+        entry = self._read()
+        if entry is None or entry.get("sha256") != self.hash(content):
+            return None
+        stat = self._stat()
+        now = time.time_ns()
+        racy = stat[1] + RACY_WINDOW_NS > entry["cached_at"]
+        if entry.get("stat") != stat or (racy and stat[1] + RACY_WINDOW_NS <= now):
+            self._write({**entry, "stat": stat, "cached_at": now})
+        return entry["status_map"], entry["found"]
+
+    def store(self, content: str, result: tuple[dict[str, str], bool]):
+        """Cache `result` as the parsed result of the log content `content`"""
+        self._write(
+            {
+                "parser_version": self.parser_version,
+                "sha256": self.hash(content),
+                "stat": self._stat(),
+                "cached_at": time.time_ns(),
+                "status_map": result[0],
+                "found": result[1],
+            }
+        )
+
+    def _write(self, entry: dict):
+        try:
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(entry, separators=(",", ":")))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Caching is best effort (e.g. read-only log directories)
+            pass
+
+    @staticmethod
+    def hash(content: str) -> str:
+        return hashlib.sha256(content.encode(errors="surrogatepass")).hexdigest()
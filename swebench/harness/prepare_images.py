@@ -2,9 +2,11 @@ import docker
 
 from argparse import ArgumentParser
 
+from swebench.harness.buildkit import BuildKitBuilder
 from swebench.harness.constants import KEY_INSTANCE_ID
 from swebench.harness.docker_build import build_instance_images
 from swebench.harness.docker_utils import list_images
+from swebench.harness.image_inventory import close_image_inventory
 from swebench.harness.test_spec.test_spec import make_test_spec
 from swebench.harness.utils import load_swebench_dataset, str2bool
 
@@ -64,6 +66,10 @@ def main(
     open_file_limit,
     namespace,
     tag,
+    buildkit=False,
+    build_cache_dir=None,
+    build_cache_registry=None,
+    buildx_builder=None,
 ):
     """
     Build Docker images for the specified instances.
@@ -73,6 +79,13 @@ def main(
         max_workers (int): Number of workers for parallel processing.
         force_rebuild (bool): Whether to force rebuild all images.
         open_file_limit (int): Open file limit.
+        buildkit (bool): Build with `docker buildx` (see `BuildKitBuilder`); only
+            prepare_images builds with it, run_evaluation builds missing images
+            with the classic builder.
+        build_cache_dir (str): Local directory to export / import the layer caches.
+        build_cache_registry (str): Registry repository to export / import the
+            layer caches (e.g. localhost:5000/sweb-cache).
+        buildx_builder (str): buildx builder instance to use.
     """
     # Normalize namespace: treat empty string as no namespace
     if namespace == "":
@@ -93,15 +106,28 @@ def main(
         dataset, instance_ids, client, force_rebuild, namespace, tag
     )
 
+    builder = None
+    if buildkit or build_cache_dir or build_cache_registry:
+        builder = BuildKitBuilder(
+            cache_dir=build_cache_dir,
+            cache_registry=build_cache_registry,
+            builder=buildx_builder,
+        )
+
     # Build images for remaining instances
-    successful, failed = build_instance_images(
-        client=client,
-        dataset=dataset,
-        force_rebuild=force_rebuild,
-        max_workers=max_workers,
-        namespace=namespace,
-        tag=tag,
-    )
+    try:
+        successful, failed = build_instance_images(
+            client=client,
+            dataset=dataset,
+            force_rebuild=force_rebuild,
+            max_workers=max_workers,
+            namespace=namespace,
+            tag=tag,
+            builder=builder,
+        )
+    finally:
+        # Stop following the daemon's image events
+        close_image_inventory(client)
     print(f"Successfully built {len(successful)} images")
     print(f"Failed to build {len(failed)} images")
 
@@ -136,5 +162,29 @@ if __name__ == "__main__":
     parser.add_argument(
         "--tag", type=str, default=None, help="Tag to use for the images"
     )
+    parser.add_argument(
+        "--buildkit",
+        type=str2bool,
+        default=False,
+        help="Build images with docker buildx (implied by the build cache options); run_evaluation builds missing images without it, so prebuild them here",
+    )
+    parser.add_argument(
+        "--build_cache_dir",
+        type=str,
+        default=None,
+        help="Local directory to export / import the BuildKit layer caches",
+    )
+    parser.add_argument(
+        "--build_cache_registry",
+        type=str,
+        default=None,
+        help="Registry repository to export / import the BuildKit layer caches",
+    )
+    parser.add_argument(
+        "--buildx_builder",
+        type=str,
+        default=None,
+        help="buildx builder instance to use (default: current builder)",
+    )
     args = parser.parse_args()
     main(**vars(args))
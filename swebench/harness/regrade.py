@@ -0,0 +1,241 @@
+"""
+Script for regrading the existing test logs of evaluation runs in bulk, e.g. after
+a log parser changed. Unlike `run_evaluation --rewrite_reports`, no eval scripts
+are built: each instance gets a TestSpec with only the fields grading needs, and
+the logs are memory-mapped and parsed in a process pool.
+
+Writes `report.json` next to every `test_output.txt` under
+`logs/run_evaluation/<run_id>/<model>/<instance_id>/`, and a per-model summary
+to `logs/run_evaluation/<run_id>/regrade_summary.json`.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import time
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from swebench.harness.constants import (
+    END_TEST_OUTPUT,
+    FAIL_TO_PASS,
+    KEY_INSTANCE_ID,
+    KEY_MODEL,
+    KEY_PREDICTION,
+    LOG_BAD_CODES,
+    LOG_REPORT,
+    LOG_TEST_OUTPUT,
+    MAP_REPO_VERSION_TO_SPECS,
+    PASS_TO_PASS,
+    RUN_EVALUATION_LOG_DIR,
+    START_TEST_OUTPUT,
+)
+from swebench.harness.grading import get_eval_report, get_log_parser
+from swebench.harness.test_spec.test_spec import TestSpec, get_instance_log_parser
+from swebench.harness.test_spec.utils import get_test_report
+from swebench.harness.utils import load_swebench_dataset
+
+SUMMARY_FILE = "regrade_summary.json"
+
+
+def make_grading_spec(instance: dict) -> TestSpec:
+    """
+    TestSpec with only the fields grading needs (no setup or eval scripts).
+
+    Args:
+        instance (dict): dataset instance
+    Returns:
+        TestSpec: test spec for `get_eval_report`
+    """
+
+    def _from_json_or_obj(key: str) -> list:
+        value = instance.get(key, [])
+        return json.loads(value) if isinstance(value, str) else value
+
+    repo = instance["repo"]
+    version = instance.get("version", "none")
+    # Same specs as `make_test_spec`, for a spec-level `test_report`
+    specs = {}
+    if repo in MAP_REPO_VERSION_TO_SPECS and not instance.get("test_cmds"):
+        specs = MAP_REPO_VERSION_TO_SPECS[repo][version]
+
+    return TestSpec(
+        instance_id=instance[KEY_INSTANCE_ID],
+        repo=repo,
+        version=version,
+        repo_script_list=[],
+        eval_script_list=[],
+        env_script_list=[],
+        arch="x86_64",
+        FAIL_TO_PASS=_from_json_or_obj(FAIL_TO_PASS),
+        PASS_TO_PASS=_from_json_or_obj(PASS_TO_PASS),
+        language="",
+        docker_specs={},
+        namespace=None,
+        log_parser=get_instance_log_parser(instance),
+        test_report=get_test_report(instance, specs),
+    )
+
+
+def read_test_output(log_fp: Path) -> str | None:
+    """
+    Test output region of a log (between START/END_TEST_OUTPUT), as read by
+    `grading.get_logs_eval`, or None if the evaluation did not run properly.
+    The log is memory-mapped, so only the region itself is decoded.
+
+    Args:
+        log_fp (Path): path to the test log
+    Returns:
+        str: test output, with newlines normalized as by text-mode `open`
+    """
+    start_marker = START_TEST_OUTPUT.encode()
+    end_marker = END_TEST_OUTPUT.encode()
+    with open(log_fp, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if any(mm.find(code.encode()) != -1 for code in LOG_BAD_CODES):
+                return None
+            start = mm.find(start_marker)
+            if start == -1 or mm.find(end_marker) == -1:
+                return None
+            start += len(start_marker)
+            end = mm.find(end_marker, start)
+            region = mm[start:] if end == -1 else mm[start:end]
+    return region.decode(errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def regrade_instance(
+    test_spec: TestSpec, log_dir: Path
+) -> tuple[str, dict, bool | None]:
+    """
+    Regrade the test log of one instance and write its report.
+
+    Args:
+        test_spec (TestSpec): grading spec of the instance
+        log_dir (Path): `<run_id>/<model>/<instance_id>` log directory
+    Returns:
+        tuple: model, new report of the instance, and whether it was resolved
+            according to the previous report (None if there was none)
+    """
+    model = log_dir.parent.name
+    report_path = log_dir / LOG_REPORT
+    previous = None
+    if report_path.exists():
+        try:
+            previous = json.loads(report_path.read_text())[test_spec.instance_id][
+                "resolved"
+            ]
+        except (json.JSONDecodeError, KeyError):
+            pass
+    test_output = read_test_output(log_dir / LOG_TEST_OUTPUT)
+    if test_output is None:
+        parsed_log = {}, False
+    else:
+        parsed_log = get_log_parser(test_spec)(test_output, test_spec), True
+    prediction = {
+        KEY_INSTANCE_ID: test_spec.instance_id,
+        KEY_MODEL: model,
+        # A test log exists, so there was a patch to evaluate
+        KEY_PREDICTION: "",
+    }
+    report = get_eval_report(
+        test_spec=test_spec,
+        prediction=prediction,
+        test_log_path=str(log_dir / LOG_TEST_OUTPUT),
+        include_tests_status=True,
+        parsed_log=parsed_log,
+    )
+    with open(report_path, "w") as f:
+        f.write(json.dumps(report, indent=4))
+    return model, report[test_spec.instance_id], previous
+
+
+def find_log_dirs(run_ids: list[str] | None) -> list[Path]:
+    """Instance log directories with a test log, for the given runs (or all runs)"""
+    if not run_ids:
+        run_ids = sorted(
+            p.name for p in RUN_EVALUATION_LOG_DIR.iterdir() if p.is_dir()
+        )
+    return sorted(
+        test_output.parent
+        for run_id in run_ids
+        for test_output in (RUN_EVALUATION_LOG_DIR / run_id).glob(
+            f"*/*/{LOG_TEST_OUTPUT}"
+        )
+    )
+
+
+def main(
+    dataset_name: str,
+    split: str,
+    run_ids: list[str] | None,
+    max_workers: int,
+):
+    start = time.time()
+    dataset = load_swebench_dataset(dataset_name, split)
+    specs = {
+        instance[KEY_INSTANCE_ID]: make_grading_spec(instance) for instance in dataset
+    }
+    log_dirs = [d for d in find_log_dirs(run_ids) if d.name in specs]
+    print(f"Regrading {len(log_dirs)} test logs with {max_workers} workers...")
+
+    summaries: dict[str, dict[str, dict[str, int]]] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            regrade_instance,
+            [specs[d.name] for d in log_dirs],
+            log_dirs,
+            chunksize=max(1, len(log_dirs) // (max_workers * 16)),
+        )
+        for log_dir, (model, report, previous) in zip(log_dirs, results):
+            run_id = log_dir.parent.parent.name
+            summary = summaries.setdefault(run_id, {}).setdefault(
+                model,
+                {"total": 0, "resolved": 0, "error": 0, "changed": 0},
+            )
+            summary["total"] += 1
+            summary["resolved"] += report["resolved"]
+            summary["error"] += not report["patch_successfully_applied"]
+            summary["changed"] += previous is not None and previous != report["resolved"]
+
+    for run_id, summary in summaries.items():
+        with open(RUN_EVALUATION_LOG_DIR / run_id / SUMMARY_FILE, "w") as f:
+            f.write(json.dumps(summary, indent=4))
+        for model, counts in summary.items():
+            print(
+                f"{run_id}/{model}: {counts['resolved']}/{counts['total']} resolved, "
+                f"{counts['error']} errors, {counts['changed']} changed"
+            )
+    print(f"Regraded {len(log_dirs)} test logs in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dataset_name",
+        default="SWE-bench/SWE-bench_Lite",
+        type=str,
+        help="Name of dataset or path to JSON file.",
+    )
+    parser.add_argument(
+        "--split", type=str, default="test", help="Split of the dataset"
+    )
+    parser.add_argument(
+        "--run_ids",
+        nargs="+",
+        type=str,
+        help="Run IDs to regrade (default: every run under logs/run_evaluation)",
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes",
+    )
+    args = parser.parse_args()
+    main(**vars(args))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import docker
 import json
 import platform
@@ -9,7 +10,7 @@ if platform.system() == "Linux":
     import resource
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from pathlib import Path, PurePosixPath
+from pathlib import Path
 
 from swebench.harness.constants import (
     APPLY_PATCH_FAIL,
@@ -17,6 +18,7 @@ from swebench.harness.constants import (
     DOCKER_PATCH,
     DOCKER_USER,
     DOCKER_WORKDIR,
+    END_TEST_OUTPUT,
     INSTANCE_IMAGE_BUILD_DIR,
     KEY_INSTANCE_ID,
     KEY_MODEL,
@@ -27,12 +29,22 @@ from swebench.harness.constants import (
     RUN_EVALUATION_LOG_DIR,
     UTF8,
 )
+from swebench.harness.container_pool import ContainerPool
+from swebench.harness.docker_async import AsyncDockerClient, AsyncDockerError
 from swebench.harness.docker_utils import (
+    ApplyPatchResult,
+    apply_patch,
     clean_images,
     cleanup_container,
-    copy_to_container,
+    copy_files_to_container,
     exec_run_with_timeout,
+    get_git_diff,
     list_images,
+    make_apply_patch_script,
+    make_archive,
+    make_git_diff_script,
+    parse_apply_patch_output,
+    parse_git_diff_output,
     remove_image,
     should_remove,
 )
@@ -41,9 +53,23 @@ from swebench.harness.docker_build import (
     build_container,
     build_env_images,
     close_logger,
+    ensure_instance_image,
     setup_logger,
 )
-from swebench.harness.grading import get_eval_report
+from swebench.harness.image_cache import DEFAULT_STATE_PATH, ImageCache
+from swebench.harness.image_inventory import close_image_inventory
+from swebench.harness.image_prefetch import ImagePrefetcher
+from swebench.harness.grading import (
+    TestsDoneCondition,
+    get_eval_report,
+    get_log_parser,
+)
+from swebench.harness.log_capture import (
+    MAX_HEAD_CHARS,
+    MAX_TAIL_CHARS,
+    TestOutputCapture,
+)
+from swebench.harness.log_parsers import LINE_LOCAL_PARSERS, IncrementalLogParser
 from swebench.harness.reporting import make_run_report
 from swebench.harness.modal_eval import (
     run_instances_modal,
@@ -54,15 +80,201 @@ from swebench.harness.utils import (
     EvaluationError,
     load_swebench_dataset,
     get_predictions_from_file,
+    run_async_pool,
     run_threadpool,
     str2bool,
 )
 
-GIT_APPLY_CMDS = [
-    "git apply --verbose",
-    "git apply --verbose --reject",
-    "patch --batch --fuzz=5 -p1 -i",
-]
+
+def make_test_output_capture(
+    test_spec: TestSpec,
+    test_output_path: Path,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+) -> TestOutputCapture:
+    """
+    Capture for the eval script output of an instance, parsing the test results
+    as they stream out if the instance's log parser is line-local. Other parsers
+    would have to keep the whole test output in memory, so their logs are parsed
+    from the log file once the tests are done (and cannot stop the tests early).
+
+    Args:
+        test_spec (TestSpec): TestSpec instance
+        test_output_path (Path): Path to write the test output to
+        stop_early (bool): Stop the tests as soon as a PASS_TO_PASS test fails
+        decide_fast (bool): Also stop as soon as a FAIL_TO_PASS test fails (implies
+            `stop_early`)
+    """
+    log_parser = get_log_parser(test_spec)
+    if log_parser not in LINE_LOCAL_PARSERS:
+        return TestOutputCapture(test_output_path, MAX_HEAD_CHARS, MAX_TAIL_CHARS)
+    should_stop = None
+    if stop_early or decide_fast:
+        should_stop = TestsDoneCondition(test_spec, decide_fast=decide_fast)
+    return TestOutputCapture(
+        test_output_path,
+        MAX_HEAD_CHARS,
+        MAX_TAIL_CHARS,
+        parser=IncrementalLogParser(log_parser, test_spec),
+        should_stop=should_stop,
+    )
+
+
+def mark_stopped_early(test_output_path: Path):
+    """
+    Close the test output region of a log whose tests were stopped early, so that
+    re-grading the log gives the same result.
+    """
+    with open(test_output_path, "a") as f:
+        f.write(f"\n{END_TEST_OUTPUT}\nTests stopped early: results already decided.\n")
+
+
+# MARK: Steps shared by the threaded and asyncio backends
+def write_eval_files(test_spec: TestSpec, pred: dict, log_dir: Path, logger) -> dict:
+    """
+    Write the patch and eval script of a prediction to its log dir.
+
+    Returns:
+        dict: files to copy to the container (see `copy_files_to_container`)
+    """
+    patch_file = Path(log_dir / "patch.diff")
+    patch_file.write_text(pred[KEY_PREDICTION] or "")
+    eval_file = Path(log_dir / "eval.sh")
+    eval_file.write_text(test_spec.eval_script)
+    logger.info(
+        f"Intermediate patch for {test_spec.instance_id} written to {patch_file}, "
+        f"eval script written to {eval_file}; copying to container..."
+    )
+    return {DOCKER_PATCH: pred[KEY_PREDICTION] or "", "/eval.sh": test_spec.eval_script}
+
+
+def check_patch_applied(result: ApplyPatchResult, instance_id: str, logger):
+    """Log the result of applying the patch, raising if it did not apply"""
+    if not result.applied:
+        logger.info(f"{APPLY_PATCH_FAIL}:\n{result.output}")
+        raise EvaluationError(
+            instance_id,
+            f"{APPLY_PATCH_FAIL}:\n{result.output}",
+            logger,
+        )
+    logger.info(f"{APPLY_PATCH_PASS}:\n{result.output}")
+    logger.info(f"Patch applied with: {result.strategy}")
+    logger.info(
+        f"Git diff before: {result.diff_hash}"
+        + (f"\n{result.diff}" if result.diff is not None else "")
+    )
+
+
+def check_test_run(
+    instance_id: str,
+    test_output_path: Path,
+    capture: TestOutputCapture,
+    timed_out: bool,
+    total_runtime: float,
+    timeout: int | None,
+    logger,
+):
+    """Log the run of the eval script, raising if it timed out"""
+    logger.info(f"Test runtime: {total_runtime:_.2f} seconds")
+    logger.info(f"Test output for {instance_id} written to {test_output_path}")
+    if timed_out:
+        with open(test_output_path, "a") as f:
+            f.write(f"\n\nTimeout error: {timeout} seconds exceeded.")
+        raise EvaluationError(
+            instance_id,
+            f"Test timed out after {timeout} seconds.",
+            logger,
+        )
+    if capture.stopped_early:
+        mark_stopped_early(test_output_path)
+        logger.info("Tests stopped early: results already decided")
+
+
+def check_git_diff(
+    result: ApplyPatchResult, diff_hash_after: str | None, diff_after: str | None, logger
+):
+    """Log whether the git diff changed while the eval script ran"""
+    logger.info(
+        f"Git diff after: {diff_hash_after}"
+        + (f"\n{diff_after}" if diff_after is not None else "")
+    )
+    if diff_hash_after != result.diff_hash:
+        logger.info("Git diff changed after running eval script")
+
+
+def write_report(
+    test_spec: TestSpec,
+    pred: dict,
+    test_output_path: Path,
+    report_path: Path,
+    capture: TestOutputCapture,
+    logger,
+) -> dict:
+    """Grade the test output of a prediction and write its report.json"""
+    instance_id = test_spec.instance_id
+    logger.info(f"Grading answer for {instance_id}...")
+    report = get_eval_report(
+        test_spec=test_spec,
+        prediction=pred,
+        test_log_path=test_output_path,
+        include_tests_status=True,
+        parsed_log=capture.logs_eval(),
+    )
+    if capture.should_stop is not None:
+        report[instance_id]["decided_early"] = capture.stopped_early
+    logger.info(
+        f"report: {report}\n"
+        f"Result for {instance_id}: resolved: {report[instance_id]['resolved']}"
+    )
+
+    # Write report to report.json
+    with open(report_path, "w") as f:
+        f.write(json.dumps(report, indent=4))
+    return report
+
+
+def log_instance_error(e: Exception, instance_id: str, logger):
+    """Log an error evaluating an instance (call from the `except` block)"""
+    if isinstance(e, (EvaluationError, BuildImageError)):
+        logger.info(traceback.format_exc())
+        print(e)
+        return
+    logger.error(
+        f"Error in evaluating model for {instance_id}: {e}\n"
+        f"{traceback.format_exc()}\n"
+        f"Check ({logger.log_file}) for more information."
+    )
+
+
+def prepare_group_image(
+    test_spec: TestSpec,
+    client: docker.DockerClient,
+    rm_image: bool,
+    force_rebuild: bool,
+    prefetcher: ImagePrefetcher | None = None,
+) -> bool:
+    """
+    Check for (and build / pull) the instance image of a group of predictions once.
+    On failure, the error is logged to the image's build dir and False is
+    returned; each prediction then retries and logs the error to its own log.
+    """
+    build_dir = INSTANCE_IMAGE_BUILD_DIR / test_spec.instance_image_key.replace(
+        ":", "__"
+    )
+    logger = setup_logger(test_spec.instance_id, build_dir / "prepare_image.log")
+    try:
+        ensure_instance_image(
+            test_spec, client, logger, rm_image, force_rebuild, prefetcher
+        )
+        return True
+    except Exception as e:
+        logger.error(
+            f"Error preparing image for {test_spec.instance_id}: {e}\n"
+            f"{traceback.format_exc()}"
+        )
+        return False
+    finally:
+        close_logger(logger)
 
 
 def run_instance(
@@ -74,6 +286,11 @@ def run_instance(
     run_id: str,
     timeout: int | None = None,
     rewrite_reports: bool = False,
+    container_pool: ContainerPool | None = None,
+    image_ready: bool = False,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
 ):
     """
     Run a single instance with the given prediction.
@@ -87,6 +304,15 @@ def run_instance(
         run_id (str): Run ID
         timeout (int): Timeout for running tests
         rewrite_reports (bool): True if eval run is just to reformat existing report
+        container_pool (ContainerPool): Pool to acquire the container from / release it to.
+            If None, a new container is created and removed for this instance.
+        image_ready (bool): True if the instance image is known to exist already
+        log_git_diffs (bool): Write the full `git diff` before / after running the tests
+            to the log (otherwise only their hashes are compared)
+        stop_early (bool): Stop the tests once their results are decided (a
+            PASS_TO_PASS test failed, so the instance is unresolved)
+        decide_fast (bool): Also stop as soon as a FAIL_TO_PASS test fails, once the
+            instance is known to be unresolved
     """
     # Set up logging directory
     instance_id = test_spec.instance_id
@@ -135,133 +361,196 @@ def run_instance(
 
     # Run the instance
     container = None
+    # Only containers whose run finished normally go back to the pool
+    reusable = False
     try:
         # Build + start instance container (instance image should already be built)
-        container = build_container(
-            test_spec, client, run_id, logger, rm_image, force_rebuild
-        )
-        container.start()
-        logger.info(f"Container for {instance_id} started: {container.id}")
-
-        # Copy model prediction as patch file to container
-        patch_file = Path(log_dir / "patch.diff")
-        patch_file.write_text(pred[KEY_PREDICTION] or "")
-        logger.info(
-            f"Intermediate patch for {instance_id} written to {patch_file}, now applying to container..."
-        )
-        copy_to_container(container, patch_file, PurePosixPath(DOCKER_PATCH))
-
-        # Attempt to apply patch to container (TODO: FIX THIS)
-        applied_patch = False
-        for git_apply_cmd in GIT_APPLY_CMDS:
-            val = container.exec_run(
-                f"{git_apply_cmd} {DOCKER_PATCH}",
-                workdir=DOCKER_WORKDIR,
-                user=DOCKER_USER,
+        if container_pool is not None:
+            container = container_pool.acquire(
+                test_spec, logger, rm_image, force_rebuild, image_ready=image_ready
             )
-            if val.exit_code == 0:
-                logger.info(f"{APPLY_PATCH_PASS}:\n{val.output.decode(UTF8)}")
-                applied_patch = True
-                break
-            else:
-                logger.info(f"Failed to apply patch to container: {git_apply_cmd}")
-        if not applied_patch:
-            logger.info(f"{APPLY_PATCH_FAIL}:\n{val.output.decode(UTF8)}")
-            raise EvaluationError(
-                instance_id,
-                f"{APPLY_PATCH_FAIL}:\n{val.output.decode(UTF8)}",
+        else:
+            container = build_container(
+                test_spec,
+                client,
+                run_id,
                 logger,
+                rm_image,
+                force_rebuild,
+                image_ready=image_ready,
             )
+            container.start()
+            logger.info(f"Container for {instance_id} started: {container.id}")
 
-        # Get git diff before running eval script
-        git_diff_output_before = (
-            container.exec_run(
-                "git -c core.fileMode=false diff", workdir=DOCKER_WORKDIR
-            )
-            .output.decode(UTF8)
-            .strip()
+        # Copy model prediction as patch file + eval script to container
+        copy_files_to_container(
+            container, write_eval_files(test_spec, pred, log_dir, logger)
         )
-        logger.info(f"Git diff before:\n{git_diff_output_before}")
 
-        eval_file = Path(log_dir / "eval.sh")
-        eval_file.write_text(test_spec.eval_script)
-        logger.info(
-            f"Eval script for {instance_id} written to {eval_file}; copying to container..."
-        )
-        copy_to_container(container, eval_file, PurePosixPath("/eval.sh"))
+        # Apply patch to container: the whole GIT_APPLY_CMDS fallback chain and the
+        # diff hash are run in a single exec
+        result = apply_patch(container, log_diff=log_git_diffs)
+        check_patch_applied(result, instance_id, logger)
 
-        # Run eval script, write output to logs
-        test_output, timed_out, total_runtime = exec_run_with_timeout(
-            container, "/bin/bash /eval.sh", timeout
-        )
+        # Run eval script, streaming output to logs
         test_output_path = log_dir / LOG_TEST_OUTPUT
-        logger.info(f"Test runtime: {total_runtime:_.2f} seconds")
-        with open(test_output_path, "w") as f:
-            f.write(test_output)
-            logger.info(f"Test output for {instance_id} written to {test_output_path}")
-            if timed_out:
-                f.write(f"\n\nTimeout error: {timeout} seconds exceeded.")
-                raise EvaluationError(
-                    instance_id,
-                    f"Test timed out after {timeout} seconds.",
-                    logger,
-                )
-
-        # Get git diff after running eval script (ignore permission changes)
-        git_diff_output_after = (
-            container.exec_run(
-                "git -c core.fileMode=false diff", workdir=DOCKER_WORKDIR
+        with make_test_output_capture(
+            test_spec, test_output_path, stop_early, decide_fast
+        ) as capture:
+            _, timed_out, total_runtime = exec_run_with_timeout(
+                container, "/bin/bash /eval.sh", timeout, capture=capture
             )
-            .output.decode(UTF8)
-            .strip()
+        check_test_run(
+            instance_id, test_output_path, capture, timed_out, total_runtime, timeout, logger
         )
 
         # Check if git diff changed after running eval script
-        logger.info(f"Git diff after:\n{git_diff_output_after}")
-        if git_diff_output_after != git_diff_output_before:
-            logger.info("Git diff changed after running eval script")
+        check_git_diff(result, *get_git_diff(container, log_diff=log_git_diffs), logger)
 
         # Get report from test output
-        logger.info(f"Grading answer for {instance_id}...")
-        report = get_eval_report(
-            test_spec=test_spec,
-            prediction=pred,
-            test_log_path=test_output_path,
-            include_tests_status=True,
+        report = write_report(
+            test_spec, pred, test_output_path, report_path, capture, logger
         )
-        logger.info(
-            f"report: {report}\n"
-            f"Result for {instance_id}: resolved: {report[instance_id]['resolved']}"
-        )
-
-        # Write report to report.json
-        with open(report_path, "w") as f:
-            f.write(json.dumps(report, indent=4))
+        # Tests stopped early may still be running in the container
+        reusable = not capture.stopped_early
         return instance_id, report
-    except EvaluationError as e:
-        error_msg = traceback.format_exc()
-        logger.info(error_msg)
-        print(e)
-    except BuildImageError as e:
-        error_msg = traceback.format_exc()
-        logger.info(error_msg)
-        print(e)
     except Exception as e:
-        error_msg = (
-            f"Error in evaluating model for {instance_id}: {e}\n"
-            f"{traceback.format_exc()}\n"
-            f"Check ({logger.log_file}) for more information."
-        )
-        logger.error(error_msg)
+        log_instance_error(e, instance_id, logger)
     finally:
-        # Remove instance container + image, close logger
-        cleanup_container(client, container, logger)
+        # Remove (or reset + pool) instance container, remove image, close logger
+        if container_pool is not None:
+            container_pool.release(container, logger, reusable)
+        else:
+            cleanup_container(client, container, logger)
         if rm_image:
+            if container_pool is not None:
+                container_pool.evict(test_spec.instance_image_key)
             remove_image(client, test_spec.instance_image_key, logger)
         close_logger(logger)
     return
 
 
+def run_instance_group(
+    test_spec: TestSpec,
+    preds: list[dict],
+    rm_image: bool,
+    force_rebuild: bool,
+    client: docker.DockerClient,
+    run_id: str,
+    timeout: int | None = None,
+    rewrite_reports: bool = False,
+    container_pool: ContainerPool | None = None,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+    prefetcher: ImagePrefetcher | None = None,
+):
+    """
+    Run every prediction (e.g. one per model) for a single instance back to back,
+    sharing one instance image check / build and, if given, the container pool.
+
+    Args:
+        test_spec (TestSpec): TestSpec instance
+        preds (list): Predictions for this instance, one per model
+        rm_image (bool): Whether to remove the image after all predictions have run
+            (normally False; run_instances removes images once their last consumer is done)
+        prefetcher (ImagePrefetcher): Prefetcher pulling remote instance images ahead
+        (other args are the same as `run_instance`)
+    """
+    image_ready = False
+    if not rewrite_reports:
+        # Check for (and build / pull) the instance image once for the whole group
+        image_ready = prepare_group_image(
+            test_spec, client, rm_image, force_rebuild, prefetcher
+        )
+
+    try:
+        for pred in preds:
+            run_instance(
+                test_spec,
+                pred,
+                False,
+                force_rebuild and not image_ready,
+                client,
+                run_id,
+                timeout,
+                rewrite_reports,
+                container_pool,
+                image_ready=image_ready,
+                log_git_diffs=log_git_diffs,
+                stop_early=stop_early,
+                decide_fast=decide_fast,
+            )
+    finally:
+        if rm_image:
+            if container_pool is not None:
+                container_pool.evict(test_spec.instance_image_key)
+            remove_image(client, test_spec.instance_image_key, "quiet")
+
+
+def group_predictions(
+    test_specs: list[TestSpec], predictions: dict | list[dict]
+) -> list[tuple[TestSpec, list[dict]]]:
+    """
+    Group predictions (from one or more models) by instance, skipping instances
+    without any prediction.
+    """
+    if isinstance(predictions, dict):
+        predictions = [predictions]
+    groups = []
+    for test_spec in test_specs:
+        preds = [p[test_spec.instance_id] for p in predictions if test_spec.instance_id in p]
+        if preds:
+            groups.append((test_spec, preds))
+    return groups
+
+
+def get_image_keys(test_spec: TestSpec) -> tuple[str, ...]:
+    """
+    Images needed to run a test spec, outermost first.
+    """
+    if test_spec.is_remote_image:
+        return (test_spec.instance_image_key,)
+    return (
+        test_spec.base_image_key,
+        test_spec.env_image_key,
+        test_spec.instance_image_key,
+    )
+
+
+def start_image_prefetcher(
+    client: docker.DockerClient,
+    test_specs: list[TestSpec],
+    image_keys: list[tuple[str, ...]],
+    prefetch_workers: int,
+    max_ahead: int,
+) -> ImagePrefetcher | None:
+    """
+    Start pulling the remote instance images of the test specs ahead of the workers,
+    in the order the image scheduler of `run_threadpool` / `run_async_pool` runs them.
+
+    Args:
+        client (docker.DockerClient): Docker client to pull with
+        test_specs (list): Test spec of each payload
+        image_keys (list): Image keys of each payload (see `get_image_keys`)
+        prefetch_workers (int): Maximum number of concurrent pulls (0 to not prefetch)
+        max_ahead (int): Maximum number of prefetched images not yet in use
+    Returns:
+        ImagePrefetcher: the started prefetcher, or None if there is nothing to prefetch
+    """
+    if prefetch_workers <= 0:
+        return None
+    order = sorted(range(len(test_specs)), key=lambda i: image_keys[i])
+    remote_images = [
+        test_specs[i].instance_image_key
+        for i in order
+        if test_specs[i].is_remote_image
+    ]
+    if not remote_images:
+        return None
+    return ImagePrefetcher(client, remote_images, prefetch_workers, max_ahead).start()
+
+
 def run_instances(
     predictions: dict,
     instances: list,
@@ -274,12 +563,28 @@ def run_instances(
     namespace: str = "swebench",
     instance_image_tag: str = "latest",
     rewrite_reports: bool = False,
+    reuse_containers: bool = False,
+    max_live_images: int | None = None,
+    prior_images: set | None = None,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+    select_tests: bool = False,
+    prefetch_workers: int = 2,
+    image_cache: ImageCache | None = None,
 ):
     """
     Run all instances for the given predictions in parallel.
 
+    Predictions for the same instance (e.g. from several models) are grouped and run
+    back to back on the same instance image. Work is scheduled by image: instances
+    sharing an env image run together, at most `max_live_images` distinct images are
+    in use at once, and each image is removed (if the cache level says so) as soon
+    as the last instance needing it finishes.
+
     Args:
-        predictions (dict): Predictions dict generated by the model
+        predictions (dict | list[dict]): Predictions dict generated by the model, or a
+            list of such dicts (one per model) to evaluate in a single batch
         instances (list): List of instances
         cache_level (str): Cache level
         clean (bool): Clean images above cache level
@@ -287,57 +592,433 @@ def run_instances(
         max_workers (int): Maximum number of workers
         run_id (str): Run ID
         timeout (int): Timeout for running tests
+        reuse_containers (bool): Keep containers in a warm pool and reset them between
+            predictions for the same instance image instead of recreating them
+        max_live_images (int): Maximum number of distinct images in use at once
+        prior_images (set): Images that existed before the run (listed if not given)
+        log_git_diffs (bool): Write full git diffs to the instance logs
+        stop_early (bool): Stop each instance's tests once their results are decided
+        decide_fast (bool): Also stop as soon as the resolved outcome is decided
+        select_tests (bool): Run only the FAIL_TO_PASS / PASS_TO_PASS tests where
+            the test command allows it
+        prefetch_workers (int): Number of concurrent pulls prefetching remote instance
+            images ahead of the workers (0 to pull them in the workers)
+        image_cache (ImageCache): Keep images within a disk budget (evicting the least
+            recently used ones) instead of removing them by cache level
     """
     client = docker.from_env()
+    container_pool = None
+    if reuse_containers and not rewrite_reports:
+        container_pool = ContainerPool(client, run_id, max_idle=max(max_workers, 1))
     test_specs = list(
         map(
             lambda instance: make_test_spec(
-                instance, namespace=namespace, instance_image_tag=instance_image_tag
+                instance,
+                namespace=namespace,
+                instance_image_tag=instance_image_tag,
+                select_tests=select_tests,
             ),
             instances,
         )
     )
 
     # print number of existing instance images
+    if prior_images is None:
+        prior_images = list_images(client)
     instance_image_ids = {x.instance_image_key for x in test_specs}
-    existing_images = {
-        tag
-        for i in client.images.list(all=True)
-        for tag in i.tags
-        if tag in instance_image_ids
-    }
+    existing_images = prior_images & instance_image_ids
     if not force_rebuild and len(existing_images):
         print(
             f"Found {len(existing_images)} existing instance images. Will reuse them."
         )
 
+    # group predictions by instance
+    groups = group_predictions(test_specs, predictions)
+    image_keys = [get_image_keys(test_spec) for test_spec, _ in groups]
+
+    # pull remote instance images ahead of the workers
+    prefetcher = None
+    if not rewrite_reports and not force_rebuild:
+        prefetcher = start_image_prefetcher(
+            client,
+            [test_spec for test_spec, _ in groups],
+            image_keys,
+            prefetch_workers,
+            max_ahead=max_live_images or max_workers,
+        )
+
+    payloads = [
+        (
+            test_spec,
+            preds,
+            False,
+            force_rebuild,
+            client,
+            run_id,
+            timeout,
+            rewrite_reports,
+            container_pool,
+            log_git_diffs,
+            stop_early,
+            decide_fast,
+            prefetcher,
+        )
+        for test_spec, preds in groups
+    ]
+
+    if image_cache is not None and not rewrite_reports:
+        if container_pool is not None:
+            image_cache.on_evict = container_pool.evict
+        image_cache.protect({key for keys in image_keys for key in keys})
+
+    def release_image(image_key: str):
+        # Called once the last instance using the image has finished
+        if image_cache is not None:
+            image_cache.release(image_key)
+            image_cache.enforce()
+            return
+        if not should_remove(image_key, cache_level, clean, prior_images):
+            return
+        if container_pool is not None:
+            container_pool.evict(image_key)
+        remove_image(client, image_key, "quiet")
+
     # run instances in parallel
-    payloads = []
-    for test_spec in test_specs:
-        payloads.append(
-            (
+    num_preds = sum(len(payload[1]) for payload in payloads)
+    print(f"Running {num_preds} predictions for {len(payloads)} instances...")
+    try:
+        run_threadpool(
+            run_instance_group,
+            payloads,
+            max_workers,
+            image_keys=None if rewrite_reports else image_keys,
+            max_live_images=max_live_images,
+            on_image_done=release_image,
+        )
+    finally:
+        if container_pool is not None:
+            container_pool.close()
+        if prefetcher is not None:
+            prefetcher.close()
+            print(prefetcher.summary())
+    print("All instances run.")
+
+
+async def run_instance_async(
+    test_spec: TestSpec,
+    pred: dict,
+    client: AsyncDockerClient,
+    docker_client: docker.DockerClient,
+    run_id: str,
+    timeout: int | None = None,
+    force_rebuild: bool = False,
+    image_ready: bool = False,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+):
+    """
+    Asyncio version of `run_instance`: container operations go through the async
+    Docker backend, so no thread is held while the tests run. Image preparation
+    and grading (blocking, CPU / build bound) run in worker threads.
+
+    Args:
+        test_spec (TestSpec): TestSpec instance
+        pred (dict): Prediction w/ model_name_or_path, model_patch, instance_id
+        client (AsyncDockerClient): Async Docker client for container operations
+        docker_client (docker.DockerClient): Docker client for building / pulling images
+        run_id (str): Run ID
+        timeout (int): Timeout for running tests
+        force_rebuild (bool): Whether to force rebuild the image
+        image_ready (bool): True if the instance image is known to exist already
+        log_git_diffs (bool): Write full git diffs to the log
+        stop_early (bool): Stop the tests once their results are decided
+        decide_fast (bool): Also stop as soon as the resolved outcome is decided
+    """
+    # Set up logging directory
+    instance_id = test_spec.instance_id
+    model_name_or_path = pred.get(KEY_MODEL, "None").replace("/", "__")
+    log_dir = RUN_EVALUATION_LOG_DIR / run_id / model_name_or_path / instance_id
+    report_path = log_dir / LOG_REPORT
+    if report_path.exists():
+        return instance_id, json.loads(report_path.read_text())
+
+    # Set up logger
+    log_dir.mkdir(parents=True, exist_ok=True)
+    logger = setup_logger(instance_id, log_dir / LOG_INSTANCE)
+
+    container_id = None
+    try:
+        if not image_ready:
+            await asyncio.to_thread(
+                ensure_instance_image,
                 test_spec,
-                predictions[test_spec.instance_id],
-                should_remove(
-                    test_spec.instance_image_key,
-                    cache_level,
-                    clean,
-                    existing_images,
-                ),
+                docker_client,
+                logger,
+                False,
                 force_rebuild,
-                client,
-                run_id,
-                timeout,
-                rewrite_reports,
             )
+
+        # Create + start instance container
+        logger.info(f"Creating container for {instance_id}...")
+        try:
+            container_id = await client.create_container(
+                image=test_spec.instance_image_key,
+                name=test_spec.get_instance_container_name(run_id),
+                command=["tail", "-f", "/dev/null"],
+                user=DOCKER_USER,
+                platform=test_spec.platform,
+                cap_add=test_spec.docker_specs.get("run_args", {}).get("cap_add", []),
+            )
+            await client.start_container(container_id)
+        except AsyncDockerError as e:
+            logger.error(f"Error creating container for {instance_id}: {e}")
+            raise BuildImageError(instance_id, str(e), logger) from e
+        logger.info(f"Container for {instance_id} started: {container_id}")
+
+        # Copy model prediction as patch file + eval script to container
+        await client.put_archive(
+            container_id, "/", make_archive(write_eval_files(test_spec, pred, log_dir, logger))
+        )
+
+        # Apply patch to container: the whole GIT_APPLY_CMDS fallback chain and the
+        # diff hash are run in a single exec
+        exit_code, output, _, _ = await client.exec_run(
+            container_id,
+            ["/bin/bash", "-c", make_apply_patch_script(log_diff=log_git_diffs)],
+            user=DOCKER_USER,
+        )
+        result = parse_apply_patch_output(exit_code, output.decode(UTF8, errors="replace"))
+        check_patch_applied(result, instance_id, logger)
+
+        # Run eval script, streaming output to logs
+        test_output_path = log_dir / LOG_TEST_OUTPUT
+        with make_test_output_capture(
+            test_spec, test_output_path, stop_early, decide_fast
+        ) as capture:
+            _, _, timed_out, total_runtime = await client.exec_run(
+                container_id,
+                "/bin/bash /eval.sh",
+                timeout=timeout,
+                on_output=capture.feed,
+            )
+        check_test_run(
+            instance_id, test_output_path, capture, timed_out, total_runtime, timeout, logger
         )
 
-    # run instances in parallel
-    print(f"Running {len(instances)} instances...")
-    run_threadpool(run_instance, payloads, max_workers)
+        # Check if git diff changed after running eval script
+        _, output, _, _ = await client.exec_run(
+            container_id,
+            ["/bin/bash", "-c", f"cd {DOCKER_WORKDIR} && {make_git_diff_script(log_git_diffs)}"],
+            user=DOCKER_USER,
+        )
+        _, diff_hash_after, diff_after = parse_git_diff_output(
+            output.decode(UTF8, errors="replace")
+        )
+        check_git_diff(result, diff_hash_after, diff_after, logger)
+
+        # Get report from test output (grading is CPU bound, so in a worker thread)
+        report = await asyncio.to_thread(
+            write_report, test_spec, pred, test_output_path, report_path, capture, logger
+        )
+        return instance_id, report
+    except Exception as e:
+        log_instance_error(e, instance_id, logger)
+    finally:
+        # Remove instance container (also if cancelled), close logger
+        if container_id is not None:
+            try:
+                # `tail -f /dev/null` ignores SIGTERM, so skip the graceful stop
+                await asyncio.shield(client.remove_container(container_id, force=True))
+                logger.info(f"Container {container_id} removed.")
+            except Exception as e:
+                logger.info(f"Failed to remove container {container_id}: {e}")
+        close_logger(logger)
+    return
+
+
+async def run_instance_group_async(
+    test_spec: TestSpec,
+    preds: list[dict],
+    force_rebuild: bool,
+    client: AsyncDockerClient,
+    docker_client: docker.DockerClient,
+    run_id: str,
+    timeout: int | None = None,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+    prefetcher: ImagePrefetcher | None = None,
+):
+    """
+    Asyncio version of `run_instance_group`: prepare the instance image once, then
+    run every prediction for the instance back to back.
+    """
+    image_ready = await asyncio.to_thread(
+        prepare_group_image, test_spec, docker_client, False, force_rebuild, prefetcher
+    )
+
+    for pred in preds:
+        await run_instance_async(
+            test_spec,
+            pred,
+            client,
+            docker_client,
+            run_id,
+            timeout,
+            force_rebuild=force_rebuild and not image_ready,
+            image_ready=image_ready,
+            log_git_diffs=log_git_diffs,
+            stop_early=stop_early,
+            decide_fast=decide_fast,
+        )
+
+
+def run_instances_async(
+    predictions: dict | list[dict],
+    instances: list,
+    cache_level: str,
+    clean: bool,
+    force_rebuild: bool,
+    max_workers: int,
+    run_id: str,
+    timeout: int,
+    namespace: str = "swebench",
+    instance_image_tag: str = "latest",
+    max_live_images: int | None = None,
+    prior_images: set | None = None,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+    select_tests: bool = False,
+    prefetch_workers: int = 2,
+    image_cache: ImageCache | None = None,
+):
+    """
+    Run all instances for the given predictions on the asyncio Docker backend.
+
+    Scheduling and image cleanup are the same as `run_instances`, but up to
+    `max_workers` evaluations run concurrently on a single event loop, so
+    `max_workers` can be in the hundreds without as many OS threads.
+
+    Args:
+        (same as `run_instances`)
+    """
+    docker_client = docker.from_env()
+    client = AsyncDockerClient.from_env()
+    test_specs = [
+        make_test_spec(
+            instance,
+            namespace=namespace,
+            instance_image_tag=instance_image_tag,
+            select_tests=select_tests,
+        )
+        for instance in instances
+    ]
+    if prior_images is None:
+        prior_images = list_images(docker_client)
+    existing_images = prior_images & {x.instance_image_key for x in test_specs}
+    if not force_rebuild and len(existing_images):
+        print(
+            f"Found {len(existing_images)} existing instance images. Will reuse them."
+        )
+
+    groups = group_predictions(test_specs, predictions)
+    image_keys = [get_image_keys(test_spec) for test_spec, _ in groups]
+    prefetcher = None
+    if not force_rebuild:
+        prefetcher = start_image_prefetcher(
+            docker_client,
+            [test_spec for test_spec, _ in groups],
+            image_keys,
+            prefetch_workers,
+            max_ahead=max_live_images or max_workers,
+        )
+    payloads = [
+        (
+            test_spec,
+            preds,
+            force_rebuild,
+            client,
+            docker_client,
+            run_id,
+            timeout,
+            log_git_diffs,
+            stop_early,
+            decide_fast,
+            prefetcher,
+        )
+        for test_spec, preds in groups
+    ]
+
+    if image_cache is not None:
+        image_cache.protect({key for keys in image_keys for key in keys})
+
+    def release_image(image_key: str):
+        if image_cache is not None:
+            image_cache.release(image_key)
+            image_cache.enforce()
+        elif should_remove(image_key, cache_level, clean, prior_images):
+            remove_image(docker_client, image_key, "quiet")
+
+    num_preds = sum(len(preds) for _, preds in groups)
+    print(f"Running {num_preds} predictions for {len(payloads)} instances (async)...")
+    try:
+        asyncio.run(
+            run_async_pool(
+                run_instance_group_async,
+                payloads,
+                max_workers,
+                image_keys=image_keys,
+                max_live_images=max_live_images,
+                on_image_done=release_image,
+            )
+        )
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+            print(prefetcher.summary())
     print("All instances run.")
 
 
+def _run_instances(*args, async_backend: bool = False, **kwargs):
+    """
+    Run instances with the threaded or (if requested) asyncio Docker backend.
+    Rewriting reports always uses the threaded backend; container reuse is only
+    supported by the threaded backend.
+    """
+    rewrite_reports = kwargs.pop("rewrite_reports", False)
+    reuse_containers = kwargs.pop("reuse_containers", False)
+    if async_backend and reuse_containers:
+        raise ValueError("Cannot reuse containers with the async backend.")
+    if async_backend and not rewrite_reports:
+        return run_instances_async(*args, **kwargs)
+    return run_instances(
+        *args,
+        rewrite_reports=rewrite_reports,
+        reuse_containers=reuse_containers,
+        **kwargs,
+    )
+
+
+def clean_run_images(
+    client: docker.DockerClient,
+    prior_images: set,
+    cache_level: str,
+    clean: bool,
+    image_cache: ImageCache | None = None,
+):
+    """
+    Clean images after a run: by cache level (see `clean_images`), or, with an image
+    cache, by evicting least recently used images until it is within its budget.
+    """
+    if image_cache is None:
+        clean_images(client, prior_images, cache_level, clean)
+        return
+    image_cache.enforce()
+    image_cache.save()
+
+
 def get_dataset_from_preds(
     dataset_name: str,
     split: str,
@@ -442,7 +1123,7 @@ def main(
     dataset_name: str,
     split: str,
     instance_ids: list,
-    predictions_path: str,
+    predictions_path: str | list[str],
     max_workers: int,
     force_rebuild: bool,
     cache_level: str,
@@ -455,9 +1136,21 @@ def main(
     modal: bool,
     instance_image_tag: str = "latest",
     report_dir: str = ".",
+    reuse_containers: bool = False,
+    max_live_images: int | None = None,
+    async_backend: bool = False,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+    select_tests: bool = False,
+    prefetch_workers: int = 2,
+    cache_budget: str | None = None,
 ):
     """
     Run evaluation harness for the given dataset and predictions.
+
+    If the predictions (one or more files) contain several models, all models are
+    evaluated in one batch and a run report is written per model.
     """
     namespace = None if namespace == "" else namespace
 
@@ -477,10 +1170,46 @@ def main(
 
     if force_rebuild and namespace is not None:
         raise ValueError("Cannot force rebuild and use a namespace at the same time.")
+    if async_backend and reuse_containers:
+        raise ValueError("Cannot reuse containers with the async backend.")
 
-    # load predictions as map of instance_id to prediction
-    predictions = get_predictions_from_file(predictions_path, dataset_name, split)
-    predictions = {pred[KEY_INSTANCE_ID]: pred for pred in predictions}
+    # load predictions as map of model to map of instance_id to prediction
+    if isinstance(predictions_path, str):
+        predictions_path = [predictions_path]
+    predictions_by_model = {}
+    for path in predictions_path:
+        for pred in get_predictions_from_file(path, dataset_name, split):
+            model = pred.get(KEY_MODEL, "None")
+            predictions_by_model.setdefault(model, {})[pred[KEY_INSTANCE_ID]] = pred
+    if len(predictions_by_model) > 1:
+        if modal:
+            raise ValueError("Batch evaluation of several models is not supported on Modal.")
+        return run_batch(
+            predictions_by_model,
+            dataset_name,
+            split,
+            instance_ids,
+            max_workers,
+            force_rebuild,
+            cache_level,
+            clean,
+            open_file_limit,
+            run_id,
+            timeout,
+            namespace,
+            rewrite_reports,
+            instance_image_tag,
+            reuse_containers,
+            max_live_images,
+            async_backend,
+            log_git_diffs,
+            stop_early,
+            decide_fast,
+            select_tests,
+            prefetch_workers,
+            cache_budget,
+        )
+    predictions = next(iter(predictions_by_model.values()), {})
 
     # get dataset from predictions
     dataset = get_dataset_from_preds(
@@ -502,30 +1231,152 @@ def main(
         resource.setrlimit(resource.RLIMIT_NOFILE, (open_file_limit, open_file_limit))
     client = docker.from_env()
 
-    existing_images = list_images(client)
-    if not dataset:
-        print("No instances to run.")
-    else:
-        # build environment images + run instances
-        if namespace is None and not rewrite_reports:
-            build_env_images(client, dataset, force_rebuild, max_workers)
-        run_instances(
-            predictions,
-            dataset,
-            cache_level,
-            clean,
-            force_rebuild,
-            max_workers,
-            run_id,
-            timeout,
-            namespace=namespace,
-            instance_image_tag=instance_image_tag,
-            rewrite_reports=rewrite_reports,
+    try:
+        existing_images = list_images(client)
+        image_cache = None
+        if cache_budget is not None:
+            image_cache = ImageCache(client, cache_budget, DEFAULT_STATE_PATH)
+        if not dataset:
+            print("No instances to run.")
+        else:
+            # build environment images + run instances
+            if namespace is None and not rewrite_reports:
+                build_env_images(client, dataset, force_rebuild, max_workers)
+            _run_instances(
+                predictions,
+                dataset,
+                cache_level,
+                clean,
+                force_rebuild,
+                max_workers,
+                run_id,
+                timeout,
+                namespace=namespace,
+                instance_image_tag=instance_image_tag,
+                rewrite_reports=rewrite_reports,
+                reuse_containers=reuse_containers,
+                max_live_images=max_live_images,
+                prior_images=existing_images,
+                async_backend=async_backend,
+                log_git_diffs=log_git_diffs,
+                stop_early=stop_early,
+                decide_fast=decide_fast,
+                select_tests=select_tests,
+                prefetch_workers=prefetch_workers,
+                image_cache=image_cache,
+            )
+
+        # clean images + make final report
+        clean_run_images(client, existing_images, cache_level, clean, image_cache)
+        return make_run_report(predictions, full_dataset, run_id, client)
+    finally:
+        # Stop following the daemon's image events
+        close_image_inventory(client)
+
+
+def run_batch(
+    predictions_by_model: dict,
+    dataset_name: str,
+    split: str,
+    instance_ids: list,
+    max_workers: int,
+    force_rebuild: bool,
+    cache_level: str,
+    clean: bool,
+    open_file_limit: int,
+    run_id: str,
+    timeout: int,
+    namespace: str | None,
+    rewrite_reports: bool,
+    instance_image_tag: str = "latest",
+    reuse_containers: bool = False,
+    max_live_images: int | None = None,
+    async_backend: bool = False,
+    log_git_diffs: bool = False,
+    stop_early: bool = False,
+    decide_fast: bool = False,
+    select_tests: bool = False,
+    prefetch_workers: int = 2,
+    cache_budget: str | None = None,
+):
+    """
+    Run evaluation harness for several models' predictions in one batch.
+
+    Every model's patch for an instance runs back to back on the same instance image;
+    logs and reports keep the usual per-model layout under RUN_EVALUATION_LOG_DIR.
+
+    Args:
+        predictions_by_model (dict): Map of model name to predictions dict
+        (other args are the same as `main`)
+    Returns:
+        list of run report paths, one per model
+    """
+    full_dataset = load_swebench_dataset(dataset_name, split, instance_ids)
+
+    # get the instances left to run for each model
+    predictions_to_run = []
+    instances = {}
+    for model, predictions in predictions_by_model.items():
+        print(f"Model {model}: {len(predictions)} predictions")
+        dataset = get_dataset_from_preds(
+            dataset_name, split, instance_ids, predictions, run_id, rewrite_reports
+        )
+        ids_to_run = {i[KEY_INSTANCE_ID] for i in dataset}
+        predictions_to_run.append(
+            {k: v for k, v in predictions.items() if k in ids_to_run}
         )
+        instances.update({i[KEY_INSTANCE_ID]: i for i in dataset})
 
-    # clean images + make final report
-    clean_images(client, existing_images, cache_level, clean)
-    return make_run_report(predictions, full_dataset, run_id, client)
+    # run instances locally
+    if platform.system() == "Linux":
+        resource.setrlimit(resource.RLIMIT_NOFILE, (open_file_limit, open_file_limit))
+    client = docker.from_env()
+
+    try:
+        existing_images = list_images(client)
+        image_cache = None
+        if cache_budget is not None:
+            image_cache = ImageCache(client, cache_budget, DEFAULT_STATE_PATH)
+        if not instances:
+            print("No instances to run.")
+        else:
+            # build environment images + run instances
+            dataset = list(instances.values())
+            if namespace is None and not rewrite_reports:
+                build_env_images(client, dataset, force_rebuild, max_workers)
+            _run_instances(
+                predictions_to_run,
+                dataset,
+                cache_level,
+                clean,
+                force_rebuild,
+                max_workers,
+                run_id,
+                timeout,
+                namespace=namespace,
+                instance_image_tag=instance_image_tag,
+                rewrite_reports=rewrite_reports,
+                reuse_containers=reuse_containers,
+                max_live_images=max_live_images,
+                prior_images=existing_images,
+                async_backend=async_backend,
+                log_git_diffs=log_git_diffs,
+                stop_early=stop_early,
+                decide_fast=decide_fast,
+                select_tests=select_tests,
+                prefetch_workers=prefetch_workers,
+                image_cache=image_cache,
+            )
+
+        # clean images + make final report for each model
+        clean_run_images(client, existing_images, cache_level, clean, image_cache)
+        return [
+            make_run_report(predictions, full_dataset, run_id, client)
+            for predictions in predictions_by_model.values()
+        ]
+    finally:
+        # Stop following the daemon's image events
+        close_image_inventory(client)
 
 
 if __name__ == "__main__":
@@ -552,8 +1403,10 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--predictions_path",
+        nargs="+",
         type=str,
-        help="Path to predictions file - if 'gold', uses gold predictions",
+        help="Path(s) to predictions file(s) - if 'gold', uses gold predictions. "
+        "Predictions from several models are evaluated in one batch",
         required=True,
     )
 
@@ -609,6 +1462,62 @@ if __name__ == "__main__":
     parser.add_argument(
         "--report_dir", type=str, default=".", help="Directory to write reports to"
     )
+    parser.add_argument(
+        "--reuse_containers",
+        type=str2bool,
+        default=False,
+        help="Keep started containers in a pool and reset them (git reset + clean) for the next prediction on the same instance image",
+    )
+    parser.add_argument(
+        "--max_live_images",
+        type=int,
+        default=None,
+        help="Maximum number of distinct images in use at once; images are removed (per cache level) as soon as their last instance finishes",
+    )
+
+    parser.add_argument(
+        "--async_backend",
+        type=str2bool,
+        default=False,
+        help="Run containers through the asyncio Docker backend (scales to hundreds of concurrent evaluations via --max_workers)",
+    )
+
+    parser.add_argument(
+        "--log_git_diffs",
+        type=str2bool,
+        default=False,
+        help="Write the full git diff before / after running tests to the instance logs (by default only diff hashes are compared)",
+    )
+    parser.add_argument(
+        "--stop_early",
+        type=str2bool,
+        default=False,
+        help="Stop running an instance's tests as soon as a PASS_TO_PASS test fails (the instance is then unresolved)",
+    )
+    parser.add_argument(
+        "--decide_fast",
+        type=str2bool,
+        default=False,
+        help="Like --stop_early, but also stop as soon as a FAIL_TO_PASS test fails (only the resolved outcome is reliable); records decided_early in report.json",
+    )
+    parser.add_argument(
+        "--select_tests",
+        type=str2bool,
+        default=False,
+        help="Rewrite test commands to run only the FAIL_TO_PASS / PASS_TO_PASS tests (pytest, jest and go test; other commands run in full)",
+    )
+    parser.add_argument(
+        "--prefetch_workers",
+        type=int,
+        default=2,
+        help="Number of concurrent pulls prefetching remote (--namespace) instance images ahead of the workers; 0 pulls them in the workers",
+    )
+    parser.add_argument(
+        "--cache_budget",
+        type=str,
+        default=None,
+        help="Disk budget for images (e.g. 1.5TB); replaces --cache_level / --clean: least recently used images are evicted (instance images first) whenever the budget is exceeded, except those pending instances still need",
+    )
 
     # Modal execution args
     parser.add_argument("--modal", type=str2bool, default=False, help="Run on Modal")
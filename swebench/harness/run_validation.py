@@ -2,21 +2,24 @@ from __future__ import annotations
 
 import docker
 import json
+import os
 import platform
+import re
+import threading
 import traceback
 
 if platform.system() == "Linux":
     import resource
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from pathlib import Path, PurePosixPath
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
 
 from swebench.harness.constants import (
     APPLY_PATCH_FAIL,
     APPLY_PATCH_PASS,
     DOCKER_PATCH,
-    DOCKER_USER,
-    DOCKER_WORKDIR,
     INSTANCE_IMAGE_BUILD_DIR,
     KEY_INSTANCE_ID,
     KEY_MODEL,
@@ -25,16 +28,19 @@ from swebench.harness.constants import (
     LOG_INSTANCE,
     LOG_TEST_OUTPUT,
     LOG_PRE_TEST_OUTPUT,
+    LOG_PREPARE_OUTPUT,
+    LOG_VALIDATION_LEDGER,
     RUN_EVALUATION_LOG_DIR,
+    RUN_VALIDATION_LOG_DIR,
     FAIL_TO_PASS,
     PASS_TO_PASS,
-    UTF8,
     TestStatus,
 )
 from swebench.harness.docker_utils import (
+    apply_patch,
     clean_images,
     cleanup_container,
-    copy_to_container,
+    copy_files_to_container,
     exec_run_with_timeout,
     list_images,
     remove_image,
@@ -47,13 +53,26 @@ from swebench.harness.docker_build import (
     close_logger,
     setup_logger,
 )
+from swebench.harness.image_inventory import close_image_inventory
 from swebench.harness.grading import get_eval_report, get_logs_eval
+from swebench.harness.log_capture import (
+    MAX_HEAD_CHARS,
+    MAX_TAIL_CHARS,
+    TestOutputCapture,
+)
 from swebench.harness.reporting import make_run_report
 from swebench.harness.modal_eval import (
     run_instances_modal,
     validate_modal_credentials,
 )
 from swebench.harness.test_spec.test_spec import make_test_spec, TestSpec
+from swebench.harness.validation_ledger import (
+    CLASSIFIED,
+    IMAGE_READY,
+    POST_DONE,
+    PRE_DONE,
+    ValidationLedger,
+)
 from swebench.harness.utils import (
     EvaluationError,
     load_swebench_dataset,
@@ -62,13 +81,6 @@ from swebench.harness.utils import (
     str2bool,
 )
 
-GIT_APPLY_CMDS = [
-    "git apply --verbose",
-    "git apply --verbose --reject",
-    "patch --batch --fuzz=5 -p1 -i",
-]
-
-
 def get_p2p_f2p(
     pre_test_map: dict,
     post_test_map: dict,
@@ -104,6 +116,203 @@ def is_validated_instance(fail2pass: list[str]) -> bool:
 
 
 
+def make_rerun_spec(
+    instance: dict, test_spec: TestSpec, tests: list[str]
+) -> TestSpec | None:
+    """
+    TestSpec whose eval scripts run only `tests` (see `test_selection`), or None if
+    the instance's test command cannot be narrowed down to them.
+    """
+    rerun_instance = {**instance, FAIL_TO_PASS: tests, PASS_TO_PASS: []}
+    kwargs = dict(
+        namespace=test_spec.namespace,
+        base_image_tag=test_spec.base_image_tag,
+        env_image_tag=test_spec.env_image_tag,
+        instance_image_tag=test_spec.instance_image_tag,
+    )
+    rerun_spec = make_test_spec(rerun_instance, select_tests=True, **kwargs)
+    if rerun_spec.eval_script == make_test_spec(rerun_instance, **kwargs).eval_script:
+        return None
+    return rerun_spec
+
+
+def get_test_stability(
+    tests: list[str], runs: list[tuple[dict[str, str], dict[str, str]]]
+) -> dict[str, dict[str, int]]:
+    """
+    Count, for each test, the runs (pairs of pre / post patch test maps) in which it
+    went from failing to passing.
+    """
+    fail2pass_runs = [set(get_p2p_f2p(pre, post)[1]) for pre, post in runs]
+    return {
+        test: {
+            "runs": len(runs),
+            "fail_to_pass": sum(test in fail2pass for fail2pass in fail2pass_runs),
+        }
+        for test in tests
+    }
+
+
+def write_test_map(path: Path, test_map: dict[str, str]):
+    """
+    Write a test map atomically, so a crash cannot leave a truncated map behind for
+    a resumed run to read.
+    """
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(test_map, indent=4))
+    os.replace(tmp_path, path)
+
+
+def load_test_map(path: Path) -> dict[str, str] | None:
+    """Test map written by a previous run, or None if it is missing or unreadable"""
+    try:
+        test_map = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+    return test_map if isinstance(test_map, dict) else None
+
+
+def rerun_test_phases(
+    rerun_spec: TestSpec,
+    client: docker.DockerClient,
+    run_id: str,
+    log_dir: Path,
+    timeout: int | None,
+    logger,
+    reruns: int,
+    patch: str,
+    snapshot_key: str | None = None,
+    rerun_slots: threading.Semaphore | None = None,
+) -> list[tuple[dict[str, str], dict[str, str]]]:
+    """
+    Rerun the pre and post patch tests of `rerun_spec`, each run of each phase in
+    its own container, all at once (or as many at once as `rerun_slots` allows).
+
+    Args:
+        rerun_spec (TestSpec): TestSpec running the tests to rerun (see `make_rerun_spec`)
+        client (docker.DockerClient): Docker client
+        run_id (str): Run ID
+        log_dir (Path): Instance log directory
+        timeout (int): Timeout for running tests
+        logger (logging.Logger): Instance logger
+        reruns (int): Number of reruns
+        patch (str): Gold patch
+        snapshot_key (str): Snapshot to start the containers from, if any (see
+            `run_instance`); otherwise they start from the instance image
+        rerun_slots (threading.Semaphore): Shared by the reruns of all instances,
+            each rerun container holds a slot while it exists
+    Returns:
+        pre and post patch test maps of each rerun
+    """
+
+    def run_once(i: int, phase: str) -> dict[str, str]:
+        with rerun_slots or nullcontext():
+            return run_in_container(i, phase)
+
+    def run_in_container(i: int, phase: str) -> dict[str, str]:
+        container = None
+        try:
+            container = build_container(
+                rerun_spec,
+                client,
+                run_id,
+                logger,
+                False,
+                container_name=(
+                    f"{rerun_spec.get_instance_container_name(run_id)}.rerun{i}.{phase}"
+                ),
+                image_ready=True,
+                image=snapshot_key,
+            )
+            container.start()
+            if snapshot_key is not None and phase == "post":
+                # Rebuild after the gold patch, the snapshot has the unpatched build
+                script = "/eval_post_tests.sh"
+                files = {script: rerun_spec.eval_post_tests_script}
+            elif snapshot_key is not None:
+                script = "/eval_tests.sh"
+                files = {script: rerun_spec.eval_tests_script}
+            else:
+                script = "/eval.sh"
+                files = {script: rerun_spec.eval_script, DOCKER_PATCH: patch}
+            copy_files_to_container(container, files)
+            if phase == "post":
+                result = apply_patch(container)
+                if not result.applied:
+                    raise EvaluationError(
+                        rerun_spec.instance_id,
+                        f"{APPLY_PATCH_FAIL}:\n{result.output}",
+                        logger,
+                    )
+            test_map, _ = run_test_phase(
+                rerun_spec,
+                container,
+                script,
+                log_dir / f"rerun_{i}_{phase}_test_output.txt",
+                timeout,
+                logger,
+                f"rerun {i} {phase} patch",
+            )
+            return test_map
+        finally:
+            cleanup_container(client, container, logger)
+
+    with ThreadPoolExecutor(max_workers=2 * reruns) as executor:
+        futures = [
+            (executor.submit(run_once, i, "pre"), executor.submit(run_once, i, "post"))
+            for i in range(1, reruns + 1)
+        ]
+        return [(pre.result(), post.result()) for pre, post in futures]
+
+
+def get_snapshot_key(test_spec: TestSpec, run_id: str) -> str:
+    """Image name for the snapshot of an instance's container after the test patch"""
+    tag = re.sub(r"[^\w.-]", "_", run_id)[:128]
+    return f"sweb.snapshot.{test_spec.instance_id.lower()}:{tag}"
+
+
+def run_test_phase(
+    test_spec: TestSpec,
+    container,
+    script: str,
+    output_path: Path,
+    timeout: int | None,
+    logger,
+    phase: str,
+) -> tuple[dict[str, str], bool]:
+    """
+    Run an eval script in the container, streaming its output to `output_path`,
+    and parse the test map from it.
+
+    Args:
+        test_spec (TestSpec): TestSpec instance
+        container (docker.Container): Container to run the script in
+        script (str): Path of the script in the container
+        output_path (Path): Path to write the test output to
+        timeout (int): Timeout for running tests
+        logger (logging.Logger): Instance logger
+        phase (str): Phase name for the logs, e.g. "pre patch"
+    Returns:
+        test map, whether the test output was found (see `get_logs_eval`)
+    """
+    instance_id = test_spec.instance_id
+    with TestOutputCapture(output_path, MAX_HEAD_CHARS, MAX_TAIL_CHARS) as capture:
+        _, timed_out, total_runtime = exec_run_with_timeout(
+            container, f"/bin/bash {script}", timeout, capture=capture
+        )
+    logger.info(f"Test runtime: {total_runtime:_.2f} seconds")
+    logger.info(f"Test output of {phase} for {instance_id} written to {output_path}")
+    if timed_out:
+        with open(output_path, "a") as f:
+            f.write(f"\n\nTimeout error: {timeout} seconds exceeded.")
+        raise EvaluationError(
+            instance_id,
+            f"{phase.capitalize()} test timed out after {timeout} seconds.",
+            logger,
+        )
+    return get_logs_eval(test_spec, output_path)
+
+
 def run_instance(
     instance: dict,
     test_spec: TestSpec,
@@ -114,6 +323,11 @@ def run_instance(
     run_id: str,
     timeout: int | None = None,
     rewrite_reports: bool = False,
+    snapshot_phases: bool = False,
+    parallel_phases: bool = False,
+    flaky_reruns: int = 0,
+    ledger: ValidationLedger | None = None,
+    rerun_slots: threading.Semaphore | None = None,
 ):
     """
     Run a single instance with the given prediction.
@@ -127,6 +341,22 @@ def run_instance(
         run_id (str): Run ID
         timeout (int): Timeout for running tests
         rewrite_reports (bool): True if eval run is just to reformat existing report
+        snapshot_phases (bool): Prepare the tests (test patch, build) once and snapshot
+            the container; the pre patch tests then run in that container and the post
+            patch tests (after rerunning the build commands on the gold patch) in a new
+            container from the snapshot, instead of running the whole eval script
+            twice in one container
+        parallel_phases (bool): Run the pre and post patch tests at once, in two
+            containers (from the snapshot if `snapshot_phases` is set, else from the
+            instance image)
+        flaky_reruns (int): Rerun the FAIL_TO_PASS candidates this many more times
+            (only those tests, in parallel containers) and drop the ones that do not
+            go from failing to passing every time; the counts are recorded in
+            instance.json as `test_stability`
+        ledger (ValidationLedger): Record of completed phases; phases the instance
+            already completed in a previous run are not run again
+        rerun_slots (threading.Semaphore): Bounds the number of rerun containers
+            of all instances at once (see `rerun_test_phases`)
     """
     # Set up logging directory
     instance_id = test_spec.instance_id
@@ -154,142 +384,228 @@ def run_instance(
     log_file = log_dir / LOG_INSTANCE
     logger = setup_logger(instance_id, log_file)
 
+    def record(phase: str):
+        if ledger is not None:
+            ledger.record(instance_id, phase)
+
     # Run the instance
     container = None
+    post_container = None
+    snapshot_key = None
     try:
-        # Build + start instance container (instance image should already be built)
-        container = build_container(
-            test_spec, client, run_id, logger, rm_image, force_rebuild
-        )
-        container.start()
-        logger.info(f"Container for {instance_id} started: {container.id}")
-
-        # Get the test map before applying the gold patch
-        logger.info("Working on get test map before applying the gold patch...")
-
-        # 1. Copy the eval script to the container
-        eval_file = Path(log_dir / "eval.sh")
-        eval_file.write_text(test_spec.eval_script)
-        logger.info(
-            f"Eval script for {instance_id} written to {eval_file}; copying to container..."
-        )
-        copy_to_container(container, eval_file, PurePosixPath("/eval.sh"))
-
-        # 2. Run the eval script
-        pre_test_output, timed_out, total_runtime = exec_run_with_timeout(
-            container, "/bin/bash /eval.sh", timeout
-        )
-        pre_test_output_path = log_dir / LOG_PRE_TEST_OUTPUT
-        logger.info(f"Test runtime: {total_runtime:_.2f} seconds")
-        with open(pre_test_output_path, "w") as f:
-            f.write(pre_test_output)
-            logger.info(f"Test output of pre patch for {instance_id} written to {pre_test_output_path}")
-            if timed_out:
-                f.write(f"\n\nTimeout error: {timeout} seconds exceeded.")
-                raise EvaluationError(
-                    instance_id,
-                    f"Pre Patch Test timed out after {timeout} seconds.",
-                    logger,
+        # Resume from the test maps of a previous run, if any (see ValidationLedger);
+        # a phase whose map is missing or unreadable is run again, with those after it
+        pre_test_map = post_test_map = None
+        if ledger is not None and ledger.done(instance_id, PRE_DONE):
+            pre_test_map = load_test_map(log_dir / "pre_test_map.json")
+            if pre_test_map is not None and ledger.done(instance_id, POST_DONE):
+                post_test_map = load_test_map(log_dir / "post_test_map.json")
+            if pre_test_map is None:
+                logger.info(f"Pre test map for {instance_id} missing, rerunning")
+            else:
+                logger.info(
+                    f"Resuming {instance_id} after "
+                    f"{POST_DONE if post_test_map is not None else PRE_DONE}"
                 )
 
-        # 3. Get the test map
-        pre_test_map, found = get_logs_eval(test_spec, pre_test_output_path)
-        with open(log_dir / "pre_test_map.json", "w") as f:
-            json.dump(pre_test_map, f, indent=4)
-            logger.info(f"Pre test map for {instance_id} written to {f.name}")
-
-        if not found:
-            raise EvaluationError(
-                instance_id,
-                f"Bad test map for pre patch test: {instance_id}",
-                logger,
+        if post_test_map is None:
+            # Build + start instance container (instance image should already be built)
+            container = build_container(
+                test_spec, client, run_id, logger, rm_image, force_rebuild
             )
-
-        # Copy model prediction as patch file to container
-        patch_file = Path(log_dir / "patch.diff")
-        patch_file.write_text(pred[KEY_PREDICTION] or "")
-        logger.info(
-            f"Intermediate patch for {instance_id} written to {patch_file}, now applying to container..."
-        )
-        copy_to_container(container, patch_file, PurePosixPath(DOCKER_PATCH))
-
-        # Attempt to apply patch to container (TODO: FIX THIS)
-        applied_patch = False
-        for git_apply_cmd in GIT_APPLY_CMDS:
-            val = container.exec_run(
-                f"{git_apply_cmd} {DOCKER_PATCH}",
-                workdir=DOCKER_WORKDIR,
-                user=DOCKER_USER,
+            container.start()
+            logger.info(f"Container for {instance_id} started: {container.id}")
+            record(IMAGE_READY)
+
+            # 1. Copy the eval script(s) + gold patch to the container
+            eval_file = Path(log_dir / "eval.sh")
+            eval_file.write_text(test_spec.eval_script)
+            patch_file = Path(log_dir / "patch.diff")
+            patch_file.write_text(pred[KEY_PREDICTION] or "")
+            logger.info(
+                f"Eval script for {instance_id} written to {eval_file}, "
+                f"patch written to {patch_file}; copying to container..."
             )
-            if val.exit_code == 0:
-                logger.info(f"{APPLY_PATCH_PASS}:\n{val.output.decode(UTF8)}")
-                applied_patch = True
-                break
-            else:
-                logger.info(f"Failed to apply patch to container: {git_apply_cmd}")
-        if not applied_patch:
-            logger.info(f"{APPLY_PATCH_FAIL}:\n{val.output.decode(UTF8)}")
-            raise EvaluationError(
-                instance_id,
-                f"{APPLY_PATCH_FAIL}:\n{val.output.decode(UTF8)}",
-                logger,
-            )
-
-        # Get git diff before running eval script
-        git_diff_output_before = (
-            container.exec_run(
-                "git -c core.fileMode=false diff", workdir=DOCKER_WORKDIR
-            )
-            .output.decode(UTF8)
-            .strip()
-        )
-        logger.info(f"Git diff before:\n{git_diff_output_before}")
-
-        eval_file = Path(log_dir / "eval.sh")
-        eval_file.write_text(test_spec.eval_script)
-        logger.info(
-            f"Eval script for {instance_id} written to {eval_file}; copying to container..."
-        )
-        copy_to_container(container, eval_file, PurePosixPath("/eval.sh"))
-
-        # Run eval script, write output to logs
-        test_output, timed_out, total_runtime = exec_run_with_timeout(
-            container, "/bin/bash /eval.sh", timeout
-        )
-        test_output_path = log_dir / LOG_TEST_OUTPUT
-        logger.info(f"Test runtime: {total_runtime:_.2f} seconds")
-        with open(test_output_path, "w") as f:
-            f.write(test_output)
-            logger.info(f"Test output for {instance_id} written to {test_output_path}")
-            if timed_out:
-                f.write(f"\n\nTimeout error: {timeout} seconds exceeded.")
-                raise EvaluationError(
-                    instance_id,
-                    f"Test timed out after {timeout} seconds.",
+            files = {
+                "/eval.sh": test_spec.eval_script,
+                DOCKER_PATCH: pred[KEY_PREDICTION] or "",
+            }
+            if snapshot_phases:
+                files["/eval_prepare.sh"] = test_spec.eval_prepare_script
+                files["/eval_tests.sh"] = test_spec.eval_tests_script
+                files["/eval_post_tests.sh"] = test_spec.eval_post_tests_script
+            copy_files_to_container(container, files)
+
+            tests_script = post_tests_script = "/eval.sh"
+            if snapshot_phases:
+                # Apply the test patch + build once, then snapshot the container
+                output, timed_out, total_runtime = exec_run_with_timeout(
+                    container, "/bin/bash /eval_prepare.sh", timeout
+                )
+                prepare_output_path = log_dir / LOG_PREPARE_OUTPUT
+                prepare_output_path.write_text(output)
+                logger.info(
+                    f"Prepare runtime: {total_runtime:_.2f} seconds, "
+                    f"output written to {prepare_output_path}"
+                )
+                if timed_out:
+                    raise EvaluationError(
+                        instance_id,
+                        f"Test preparation timed out after {timeout} seconds.",
+                        logger,
+                    )
+                snapshot_key = get_snapshot_key(test_spec, run_id)
+                container.commit(*snapshot_key.split(":"))
+                logger.info(f"Container for {instance_id} snapshotted to {snapshot_key}")
+                tests_script = "/eval_tests.sh"
+                # The snapshot has the build of the unpatched repo, so the post patch
+                # tests rerun the build commands after the gold patch
+                post_tests_script = "/eval_post_tests.sh"
+
+            def run_pre_phase() -> tuple[dict[str, str], bool]:
+                logger.info("Working on get test map before applying the gold patch...")
+                pre_test_map, found = run_test_phase(
+                    test_spec,
+                    container,
+                    tests_script,
+                    log_dir / LOG_PRE_TEST_OUTPUT,
+                    timeout,
                     logger,
+                    "pre patch",
                 )
-
-        post_test_map, found = get_logs_eval(test_spec, test_output_path)
-        with open(log_dir / "post_test_map.json", "w") as f:
-            json.dump(post_test_map, f, indent=4)
-            logger.info(f"Post test map for {instance_id} written to {f.name}")
+                pre_test_map_path = log_dir / "pre_test_map.json"
+                write_test_map(pre_test_map_path, pre_test_map)
+                logger.info(f"Pre test map for {instance_id} written to {pre_test_map_path}")
+                return pre_test_map, found
+
+            def run_post_phase() -> dict[str, str]:
+                logger.info(f"Applying patch for {instance_id} to container...")
+                # Apply patch (trying each of GIT_APPLY_CMDS) and get the diff in one exec
+                result = apply_patch(post_container, log_diff=True)
+                if not result.applied:
+                    logger.info(f"{APPLY_PATCH_FAIL}:\n{result.output}")
+                    raise EvaluationError(
+                        instance_id,
+                        f"{APPLY_PATCH_FAIL}:\n{result.output}",
+                        logger,
+                    )
+                logger.info(f"{APPLY_PATCH_PASS}:\n{result.output}")
+                logger.info(f"Patch applied with: {result.strategy}")
+                logger.info(f"Git diff before:\n{result.diff}")
+
+                post_test_map, _ = run_test_phase(
+                    test_spec,
+                    post_container,
+                    post_tests_script,
+                    log_dir / LOG_TEST_OUTPUT,
+                    timeout,
+                    logger,
+                    "post patch",
+                )
+                post_test_map_path = log_dir / "post_test_map.json"
+                write_test_map(post_test_map_path, post_test_map)
+                logger.info(f"Post test map for {instance_id} written to {post_test_map_path}")
+                return post_test_map
+
+            run_pre = pre_test_map is None
+            if run_pre and (snapshot_phases or parallel_phases):
+                # Sibling container for the post patch tests, restored from the snapshot
+                # (or, without one, a second container from the instance image)
+                post_container = build_container(
+                    test_spec,
+                    client,
+                    run_id,
+                    logger,
+                    rm_image,
+                    container_name=f"{test_spec.get_instance_container_name(run_id)}.post",
+                    image_ready=True,
+                    image=snapshot_key,
+                )
+                post_container.start()
+                logger.info(f"Post patch container for {instance_id} started: {post_container.id}")
+                if not snapshot_phases:
+                    copy_files_to_container(post_container, files)
+            else:
+                post_container = container
+
+            if run_pre and parallel_phases:
+                # 2. Run the tests with and without the gold patch at once
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    pre_future = executor.submit(run_pre_phase)
+                    post_future = executor.submit(run_post_phase)
+                    pre_test_map, found = pre_future.result()
+                    post_test_map = post_future.result()
+            elif run_pre:
+                # 2. Run the tests before applying the gold patch
+                pre_test_map, found = run_pre_phase()
+            if run_pre:
+                if not found:
+                    raise EvaluationError(
+                        instance_id,
+                        f"Bad test map for pre patch test: {instance_id}",
+                        logger,
+                    )
+                record(PRE_DONE)
+            if post_test_map is None:
+                # 3. Apply the gold patch and run the tests again
+                post_test_map = run_post_phase()
+            record(POST_DONE)
 
         pass2pass, fail2pass = get_p2p_f2p(pre_test_map, post_test_map)
         if not is_validated_instance(fail2pass):
             logger.info("Skipping %s: no FAIL_TO_PASS tests discovered.", instance_id)
+            record(CLASSIFIED)
             return
 
+        test_stability = {}
+        if flaky_reruns > 0:
+            # Rerun the tests that changed status; drop those that don't always do
+            rerun_spec = make_rerun_spec(instance, test_spec, fail2pass)
+            if rerun_spec is None:
+                logger.info("Skipping flaky test reruns: tests cannot be selected")
+            else:
+                logger.info(f"Rerunning {len(fail2pass)} tests {flaky_reruns} times...")
+                runs = rerun_test_phases(
+                    rerun_spec,
+                    client,
+                    run_id,
+                    log_dir,
+                    timeout,
+                    logger,
+                    flaky_reruns,
+                    pred[KEY_PREDICTION] or "",
+                    snapshot_key,
+                    rerun_slots,
+                )
+                test_stability = get_test_stability(
+                    fail2pass, [(pre_test_map, post_test_map)] + runs
+                )
+                flaky = [
+                    test
+                    for test, counts in test_stability.items()
+                    if counts["fail_to_pass"] < counts["runs"]
+                ]
+                if flaky:
+                    logger.info(f"Dropping {len(flaky)} flaky tests: {flaky}")
+                fail2pass = [test for test in fail2pass if test not in flaky]
+                if not is_validated_instance(fail2pass):
+                    logger.info("Skipping %s: all FAIL_TO_PASS tests are flaky.", instance_id)
+                    record(CLASSIFIED)
+                    return
+
         with open(log_dir / "instance.json", "w") as f:
             json.dump(
                 {
                     **instance,
                     FAIL_TO_PASS: fail2pass,
                     PASS_TO_PASS: pass2pass,
+                    **({"test_stability": test_stability} if test_stability else {}),
                 },
                 f,
                 indent=4,
             )
             logger.info(f"Instance for {instance_id} written to {f.name}")
+        record(CLASSIFIED)
 
     except EvaluationError as e:
         error_msg = traceback.format_exc()
@@ -307,8 +623,12 @@ def run_instance(
         )
         logger.error(error_msg)
     finally:
-        # Remove instance container + image, close logger
+        # Remove instance container(s) + snapshot + image, close logger
         cleanup_container(client, container, logger)
+        if post_container is not None and post_container is not container:
+            cleanup_container(client, post_container, logger)
+        if snapshot_key is not None:
+            remove_image(client, snapshot_key, logger)
         if rm_image:
             remove_image(client, test_spec.instance_image_key, logger)
         close_logger(logger)
@@ -327,6 +647,10 @@ def run_instances(
     namespace: str = "swebench",
     instance_image_tag: str = "latest",
     rewrite_reports: bool = False,
+    snapshot_phases: bool = False,
+    parallel_phases: bool = False,
+    flaky_reruns: int = 0,
+    ledger: ValidationLedger | None = None,
 ):
     """
     Run all instances for the given predictions in parallel.
@@ -340,6 +664,11 @@ def run_instances(
         max_workers (int): Maximum number of workers
         run_id (str): Run ID
         timeout (int): Timeout for running tests
+        snapshot_phases (bool): Run the pre / post patch tests from a snapshot taken
+            after the test patch is applied (see `run_instance`)
+        parallel_phases (bool): Run each instance's pre and post patch tests at once
+        flaky_reruns (int): Number of reruns to detect flaky FAIL_TO_PASS tests
+        ledger (ValidationLedger): Record of completed phases to resume from
     """
     client = docker.from_env()
     instances_map = {i[KEY_INSTANCE_ID]: i for i in instances}
@@ -354,6 +683,10 @@ def run_instances(
 
     todo_specs = test_specs
 
+    # Reruns of all instances share max_workers containers, on top of the (at most
+    # two) containers of each worker, instead of 2 * flaky_reruns per worker
+    rerun_slots = threading.BoundedSemaphore(max(max_workers, 1))
+
     # run instances in parallel
     payloads = []
     for test_spec in todo_specs:
@@ -368,12 +701,21 @@ def run_instances(
                 run_id,
                 timeout,
                 rewrite_reports,
+                snapshot_phases,
+                parallel_phases,
+                flaky_reruns,
+                ledger,
+                rerun_slots,
             )
         )
 
     # run instances in parallel
     print(f"Running {len(todo_specs)} instances...")
-    run_threadpool(run_instance, payloads, max_workers)
+    try:
+        run_threadpool(run_instance, payloads, max_workers)
+    finally:
+        # Stop following the daemon's image events
+        close_image_inventory(client)
     print("All instances run.")
 
 
@@ -385,11 +727,13 @@ def get_dataset_from_preds(
     run_id: str,
     rewrite_reports: bool,
     exclude_completed: bool = True,
+    ledger: ValidationLedger | None = None,
 ):
     """
     Return only instances that have predictions and are in the dataset.
     If instance_ids is provided, only return instances with those IDs.
-    If exclude_completed is True, only return instances that have not been run yet.
+    If exclude_completed is True, only return instances that have not been run yet
+    (have a report, or are classified in `ledger`).
     """
     # load dataset
     dataset = load_swebench_dataset(dataset_name, split)
@@ -453,7 +797,9 @@ def get_dataset_from_preds(
             / prediction[KEY_INSTANCE_ID]
             / LOG_REPORT
         )
-        if report_file.exists():
+        if report_file.exists() or (
+            ledger is not None and ledger.done(instance[KEY_INSTANCE_ID], CLASSIFIED)
+        ):
             completed_ids.add(instance[KEY_INSTANCE_ID])
 
     if completed_ids and exclude_completed:
@@ -494,6 +840,9 @@ def main(
     modal: bool,
     instance_image_tag: str = "latest",
     report_dir: str = ".",
+    snapshot_phases: bool = False,
+    parallel_phases: bool = False,
+    flaky_reruns: int = 0,
 ):
     """
     Run evaluation harness for the given dataset and predictions.
@@ -511,9 +860,16 @@ def main(
     predictions = get_predictions_from_file(predictions_path, dataset_name, split)
     predictions = {pred[KEY_INSTANCE_ID]: pred for pred in predictions}
 
-    # get dataset from predictions
+    # get dataset from predictions, skipping instances this run already classified
+    ledger = ValidationLedger(RUN_VALIDATION_LOG_DIR / run_id / LOG_VALIDATION_LEDGER)
     dataset = get_dataset_from_preds(
-        dataset_name, split, instance_ids, predictions, run_id, rewrite_reports
+        dataset_name,
+        split,
+        instance_ids,
+        predictions,
+        run_id,
+        rewrite_reports,
+        ledger=ledger,
     )
 
     # run instances locally
@@ -535,6 +891,10 @@ def main(
             namespace=namespace,
             instance_image_tag=instance_image_tag,
             rewrite_reports=rewrite_reports,
+            snapshot_phases=snapshot_phases,
+            parallel_phases=parallel_phases,
+            flaky_reruns=flaky_reruns,
+            ledger=ledger,
         )
 
 
@@ -619,6 +979,24 @@ if __name__ == "__main__":
     parser.add_argument(
         "--report_dir", type=str, default=".", help="Directory to write reports to"
     )
+    parser.add_argument(
+        "--snapshot_phases",
+        type=str2bool,
+        default=False,
+        help="Apply the test patch once and snapshot the container; run the pre and post patch tests from the snapshot",
+    )
+    parser.add_argument(
+        "--parallel_phases",
+        type=str2bool,
+        default=False,
+        help="Run the pre and post patch tests of an instance at once, in two containers",
+    )
+    parser.add_argument(
+        "--flaky_reruns",
+        type=int,
+        default=0,
+        help="Rerun FAIL_TO_PASS candidates this many times and drop the ones with differing results",
+    )
 
     # Modal execution args
     parser.add_argument("--modal", type=str2bool, default=False, help="Run on Modal")
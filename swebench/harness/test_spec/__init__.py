@@ -3,6 +3,7 @@ from swebench.harness.test_spec import (
     create_scripts,
     javascript,
     python,
+    test_selection,
 )
 
 
@@ -11,4 +12,5 @@ __all__ = [
     "create_scripts",
     "javascript",
     "python",
+    "test_selection",
 ]
@@ -6,7 +6,12 @@ from swebench.harness.constants import (
     END_TEST_OUTPUT,
     START_TEST_OUTPUT,
 )
-from swebench.harness.test_spec.utils import make_eval_script_list_common
+from swebench.harness.test_spec.utils import (
+    get_test_report,
+    make_clear_test_report_commands,
+    make_eval_script_list_common,
+    make_test_report_commands,
+)
 from unidiff import PatchSet
 
 
@@ -101,5 +106,9 @@ def make_eval_script_list_js(
         test_commands = MAP_REPO_TO_TEST_CMDS[instance["repo"]](instance)
         idx_start_test_out = eval_commands.index(f": '{START_TEST_OUTPUT}'")
         idx_end_test_out = eval_commands.index(f": '{END_TEST_OUTPUT}'")
-        eval_commands[idx_start_test_out + 1 : idx_end_test_out] = test_commands
+        eval_commands[idx_start_test_out + 1 : idx_end_test_out] = [
+            *make_clear_test_report_commands(get_test_report(instance, specs)),
+            *test_commands,
+            *make_test_report_commands(get_test_report(instance, specs)),
+        ]
     return eval_commands
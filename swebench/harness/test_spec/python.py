@@ -15,6 +15,11 @@ from swebench.harness.constants import (
     END_TEST_OUTPUT,
 )
 from swebench.harness.utils import get_modified_files
+from swebench.harness.test_spec.utils import (
+    get_test_report,
+    make_clear_test_report_commands,
+    make_test_report_commands,
+)
 from functools import cache
 
 HEADERS = {
@@ -291,14 +296,20 @@ def make_eval_script_list_py(
     apply_test_patch_command = (
         f"git apply -v - <<'{HEREDOC_DELIMITER}'\n{test_patch}\n{HEREDOC_DELIMITER}"
     )
-    test_command = " ".join(
-        [
-            MAP_REPO_VERSION_TO_SPECS[instance["repo"]][instance["version"]][
-                "test_cmd"
-            ],
-            *get_test_directives(instance),
+    if instance.get("test_cmds"):
+        # Test commands narrowed down to the graded tests (see `test_selection`)
+        test_commands = instance["test_cmds"]
+    else:
+        test_commands = [
+            " ".join(
+                [
+                    MAP_REPO_VERSION_TO_SPECS[instance["repo"]][instance["version"]][
+                        "test_cmd"
+                    ],
+                    *get_test_directives(instance),
+                ]
+            )
         ]
-    )
     eval_commands = [
         "source /opt/miniconda3/bin/activate",
         f"conda activate {env_name}",
@@ -322,7 +333,9 @@ def make_eval_script_list_py(
         reset_tests_command,
         apply_test_patch_command,
         f": '{START_TEST_OUTPUT}'",
-        test_command,
+        *make_clear_test_report_commands(get_test_report(instance, specs)),
+        *test_commands,
+        *make_test_report_commands(get_test_report(instance, specs)),
         f": '{END_TEST_OUTPUT}'",
         reset_tests_command,  # Revert tests after done, leave the repo in the same state as before
     ]
@@ -0,0 +1,178 @@
+"""
+Rewrite an instance's test commands to run only the tests that are graded
+(FAIL_TO_PASS and PASS_TO_PASS), instead of the whole suite.
+
+Selection maps the test names reported by a log parser back to selectors of the
+test runner. A command is only rewritten when that mapping is unambiguous;
+otherwise the full command is kept. Selectors may pick a superset of the graded
+tests (e.g. every parametrization of a pytest test), never a subset.
+"""
+
+import re
+import shlex
+
+from typing import Callable, Optional
+
+from swebench.harness.log_parsers.go import parse_log_gotest
+from swebench.harness.log_parsers.javascript import parse_log_jest
+from swebench.harness.log_parsers.python import (
+    parse_log_pytest,
+    parse_log_pytest_options,
+    parse_log_pytest_v2,
+)
+
+# Longest test command (in characters) a selection may produce
+MAX_SELECTION_CHARS = 100_000
+
+# Shell syntax (operators, expansions) that requoting the command would break, or
+# that makes it unclear which program the selectors would go to
+SHELL_CHARS = set("&|;<>$`*?~[(")
+
+PYTEST_NODE_ID = re.compile(r"^[\w./-]+\.py(::\S+)?$")
+# Options taking the next argument as their value (so it is not a test path)
+PYTEST_VALUE_OPTIONS = {
+    "-c", "-k", "-m", "-n", "-o", "-p", "-W",
+    "--basetemp", "--confcutdir", "--cov", "--cov-config", "--cov-report",
+    "--deselect", "--dist", "--durations", "--ignore", "--ignore-glob",
+    "--junitxml", "--log-level", "--maxfail", "--numprocesses", "--override-ini",
+    "--rootdir", "--tb", "--timeout",
+}  # fmt: skip
+PYTEST_FLAG_OPTIONS = {
+    "-l", "-q", "-s", "-v", "-x",
+    "--color=no", "--disable-warnings", "--exitfirst", "--full-trace",
+    "--no-header", "--quiet", "--showlocals", "--strict-markers", "--verbose",
+}  # fmt: skip
+
+GO_TEST_NAME = re.compile(r"^\w+$")
+
+
+def _tokenize(cmd: str) -> Optional[list[str]]:
+    try:
+        tokens = shlex.split(cmd)
+    except ValueError:
+        return None
+    if any(SHELL_CHARS.intersection(token) for token in tokens):
+        return None
+    return tokens
+
+
+def _find_program(tokens: list[str], name: str) -> int:
+    """Index of the token running `name` (e.g. `pytest`, `.bin/jest`), -1 if none"""
+    for i, token in enumerate(tokens):
+        if token.rsplit("/", 1)[-1] == name:
+            return i
+    return -1
+
+
+def _join(tokens: list[str]) -> str:
+    return " ".join(shlex.quote(token) for token in tokens)
+
+
+def select_pytest(cmd: str, tests: list[str]) -> Optional[str]:
+    """
+    Replace the test paths of a pytest command with the node IDs of `tests`
+    (without parametrization, so every parametrization of a test runs).
+    """
+    tokens = _tokenize(cmd)
+    if tokens is None or any(not PYTEST_NODE_ID.match(t.split("[")[0]) for t in tests):
+        return None
+    start = _find_program(tokens, "pytest")
+    if start == -1:
+        return None
+    args = []
+    prev = None
+    for token in tokens[start + 1 :]:
+        if token.startswith("-"):
+            args.append(token)
+            prev = token
+            continue
+        if prev in PYTEST_VALUE_OPTIONS:
+            args.append(token)
+        elif not (
+            prev is None
+            or prev in PYTEST_FLAG_OPTIONS
+            or "=" in prev
+            # Short option with its value attached (e.g. `-rA`)
+            or (len(prev) > 2 and not prev.startswith("--"))
+        ):
+            # Unknown option: its argument may be a value rather than a test path
+            return None
+        # else: test path, replaced by the selection
+        prev = None
+    node_ids = list(dict.fromkeys(test.split("[")[0] for test in tests))
+    return _join(tokens[: start + 1] + args + node_ids)
+
+
+def _js_regex_escape(text: str) -> str:
+    return re.sub(r"[\\^$.*+?()[\]{}|/]", r"\\\g<0>", text)
+
+
+def select_jest(cmd: str, tests: list[str]) -> Optional[str]:
+    """
+    Add a `-t` pattern matching the names of `tests` to a jest command.
+    Jest matches `-t` against the full test name (describe blocks included), while
+    --verbose output only shows the test's own name, so names are matched as suffixes.
+    """
+    tokens = _tokenize(cmd)
+    if tokens is None:
+        return None
+    start = _find_program(tokens, "jest")
+    if start == -1 or any(
+        t in ("-t", "--testNamePattern") or t.startswith("--testNamePattern=")
+        for t in tokens
+    ):
+        return None
+    pattern = "(" + "|".join(_js_regex_escape(t) for t in tests) + ")$"
+    return _join(tokens[: start + 1] + ["-t", pattern] + tokens[start + 1 :])
+
+
+def select_gotest(cmd: str, tests: list[str]) -> Optional[str]:
+    """
+    Add a `-run` regex matching the top-level tests of `tests` to a `go test` command
+    (subtests run with their parent).
+    """
+    tokens = _tokenize(cmd)
+    if tokens is None:
+        return None
+    start = _find_program(tokens, "go")
+    if start == -1 or tokens[start + 1 : start + 2] != ["test"]:
+        return None
+    if any(t == "-run" or t.startswith("-run=") for t in tokens):
+        return None
+    names = list(dict.fromkeys(test.split("/")[0] for test in tests))
+    if any(not GO_TEST_NAME.match(name) for name in names):
+        return None
+    pattern = "^(" + "|".join(names) + ")$"
+    return _join(tokens[: start + 2] + ["-run", pattern] + tokens[start + 2 :])
+
+
+MAP_PARSER_TO_SELECTOR: dict[Callable, Callable[[str, list[str]], Optional[str]]] = {
+    parse_log_gotest: select_gotest,
+    parse_log_jest: select_jest,
+    parse_log_pytest: select_pytest,
+    parse_log_pytest_options: select_pytest,
+    parse_log_pytest_v2: select_pytest,
+}
+
+
+def select_test_cmds(
+    test_cmds: list[str], log_parser: Optional[Callable], tests: list[str]
+) -> Optional[list[str]]:
+    """
+    Rewrite test commands to run only `tests`.
+
+    Args:
+        test_cmds (list): Test commands of the instance
+        log_parser (callable): Log parser of the instance
+        tests (list): Names of the tests to run, as reported by `log_parser`
+    Returns:
+        The rewritten commands, or None if the full commands should be kept (no
+        selector for the parser, or a command / test name it cannot map)
+    """
+    selector = MAP_PARSER_TO_SELECTOR.get(log_parser)
+    if selector is None or not tests or len(test_cmds) != 1:
+        return None
+    selected = selector(test_cmds[0], tests)
+    if selected is None or len(selected) > MAX_SELECTION_CHARS:
+        return None
+    return [selected]
@@ -2,15 +2,17 @@ import hashlib
 import json
 import platform
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Optional, Union, cast, Callable
 
 from swebench.harness.constants import (
     DEFAULT_DOCKER_SPECS,
+    DOCKER_SNAPSHOT_ENV,
     KEY_INSTANCE_ID,
     LATEST,
     MAP_REPO_TO_EXT,
     MAP_REPO_VERSION_TO_SPECS,
+    START_TEST_OUTPUT,
     USE_X86,
     SWEbenchInstance,
 )
@@ -24,8 +26,14 @@ from swebench.harness.test_spec.create_scripts import (
     make_env_script_list,
     make_eval_script_list,
 )
+from swebench.harness.test_spec.test_selection import select_test_cmds
+from swebench.harness.test_spec.utils import get_test_cmds, get_test_report
+from swebench.harness.log_parsers import MAP_REPO_TO_PARSER
 from swebench.harness.log_parsers.python import parse_log_pytest
 
+# Bash-internal variables left out of the shell state saved by `eval_prepare_script`
+SNAPSHOT_SKIP_VARS = "BASH[A-Z_]*|DIRSTACK|FUNCNAME|GROUPS|PIPESTATUS|_"
+
 
 @dataclass
 class TestSpec:
@@ -49,6 +57,9 @@ class TestSpec:
     base_image_tag: str = LATEST
     env_image_tag: str = LATEST
     instance_image_tag: str = LATEST
+    test_report: Optional[dict] = None
+    # Commands of `eval_script_list` that build / install the repo (see `eval_post_tests_script`)
+    build_commands: list[str] = field(default_factory=list)
 
     @property
     def setup_env_script(self):
@@ -65,6 +76,57 @@ class TestSpec:
         )
         # Don't exit early because we need to revert tests at the end
 
+    @property
+    def eval_prepare_script(self):
+        """
+        Part of `eval_script` before the test output markers (test patch applied,
+        build commands run). It ends by saving the shell state (variables,
+        functions, working directory) for `eval_tests_script`, so the container can
+        be snapshotted in between and the tests run more than once from the same
+        state. Readonly and bash-internal variables are not saved; shell options
+        (`set` / `shopt`) other than those of the script header are not restored.
+        """
+        start = self.eval_script_list.index(f": '{START_TEST_OUTPUT}'")
+        save_env = (
+            "{ declare -p | grep -vE "
+            f"'^declare -[a-zA-Z-]*r|^declare -[a-zA-Z-]* ({SNAPSHOT_SKIP_VARS})='; "
+            f'declare -f; echo "cd $(printf %q "$PWD")"; }} > {DOCKER_SNAPSHOT_ENV}'
+        )
+        return (
+            "\n".join(
+                ["#!/bin/bash", "set -uxo pipefail"]
+                + self.eval_script_list[:start]
+                + [save_env]
+            )
+            + "\n"
+        )
+
+    @property
+    def eval_tests_script(self):
+        """Rest of `eval_script`, run from the state left by `eval_prepare_script`"""
+        return self._make_tests_script([])
+
+    @property
+    def eval_post_tests_script(self):
+        """
+        `eval_tests_script` for after a patch is applied to the snapshot: the
+        build commands run again first, so the tests do not run against the
+        build of the unpatched repo.
+        """
+        return self._make_tests_script(self.build_commands)
+
+    def _make_tests_script(self, commands: list[str]) -> str:
+        start = self.eval_script_list.index(f": '{START_TEST_OUTPUT}'")
+        restore_env = f"{{ set +x; }} 2>/dev/null; source {DOCKER_SNAPSHOT_ENV}; set -x"
+        return (
+            "\n".join(
+                ["#!/bin/bash", "set -uxo pipefail", restore_env]
+                + commands
+                + self.eval_script_list[start:]
+            )
+            + "\n"
+        )
+
     @property
     def install_repo_script(self):
         return (
@@ -174,13 +236,39 @@ def get_test_specs_from_dataset(
     )
 
 
+# Log parsers SWE-bench-Live instances can name in their "log_parser" field
+MAP_NAME_TO_LOG_PARSER = {
+    "pytest": parse_log_pytest,
+}
+
+
+def get_instance_log_parser(instance: SWEbenchInstance) -> Optional[Callable]:
+    """Log parser named by the instance, if any (else the repo's parser is used)"""
+    if instance.get("log_parser"):
+        return MAP_NAME_TO_LOG_PARSER[instance["log_parser"]]
+    return None
+
+
 def make_test_spec(
     instance: SWEbenchInstance,
     namespace: Optional[str] = None,
     base_image_tag: str = LATEST,
     env_image_tag: str = LATEST,
     instance_image_tag: str = LATEST,
+    select_tests: bool = False,
 ) -> TestSpec:
+    """
+    Create the TestSpec for an instance.
+
+    If `select_tests` is set, the instance's test commands (or its specs' `test_cmd`)
+    are rewritten to run only its FAIL_TO_PASS and PASS_TO_PASS tests where the log
+    parser allows it (see `test_selection.select_test_cmds`).
+
+    If the instance (or its specs) sets `test_report`, e.g. `{"format": "junit",
+    "paths": ["target/surefire-reports/*.xml"]}`, its tests are graded from that
+    machine-readable report (see `log_parsers.structured`). With JUnit reports, a
+    Maven suite can run as a single `mvn test` instead of one build per test.
+    """
     if isinstance(instance, TestSpec):
         return instance
     assert base_image_tag is not None, "base_image_tag cannot be None"
@@ -224,22 +312,31 @@ def make_test_spec(
         )
         env_script_list = make_env_script_list(instance, specs, env_name)
 
+    log_parser = get_instance_log_parser(instance)
+
+    if select_tests and (specs or instance.get("test_cmds")):
+        test_cmds = select_test_cmds(
+            get_test_cmds(instance),
+            log_parser or MAP_REPO_TO_PARSER.get(repo),
+            fail_to_pass + pass_to_pass,
+        )
+        if test_cmds is not None:
+            instance = {**instance, "test_cmds": test_cmds}
+
     eval_script_list = make_eval_script_list(
         instance, specs, env_name, repo_directory, base_commit, test_patch
     )
+    # Build / install commands the eval script runs before the tests (the `build`
+    # commands, or `install` for Python repos), to rerun after a patch
+    start = eval_script_list.index(f": '{START_TEST_OUTPUT}'")
+    spec_builds = [*specs.get("build", []), specs.get("install")]
+    build_commands = [cmd for cmd in eval_script_list[:start] if cmd in spec_builds]
     if platform.machine() in {"aarch64", "arm64"}:
         # use arm64 unless explicitly specified
         arch = "arm64" if instance_id not in USE_X86 else "x86_64"
     else:
         arch = "x86_64"
 
-    log_parser = None
-    if instance.get("log_parser"):
-        log_parser_map = {
-            "pytest": parse_log_pytest,
-        }
-        log_parser = log_parser_map[instance["log_parser"]]  
-
     return TestSpec(
         instance_id=instance_id,
         repo=repo,
@@ -257,4 +354,6 @@ def make_test_spec(
         env_image_tag=env_image_tag,
         instance_image_tag=instance_image_tag,
         log_parser=log_parser,
+        test_report=get_test_report(instance, specs),
+        build_commands=build_commands,
     )
@@ -1,7 +1,11 @@
+import json
+
 from swebench.harness.constants import (
     END_TEST_OUTPUT,
+    END_TEST_REPORT,
     MAP_REPO_VERSION_TO_SPECS,
     START_TEST_OUTPUT,
+    START_TEST_REPORT,
 )
 from swebench.harness.utils import get_modified_files
 
@@ -18,6 +22,49 @@ def get_test_cmds(instance) -> list:
     return [test_cmd] if isinstance(test_cmd, str) else test_cmd
 
 
+def get_test_report(instance, specs) -> dict | None:
+    """
+    Structured test report settings of an instance (see `log_parsers.structured`),
+    from the instance itself or else from its specs.
+    """
+    test_report = instance.get("test_report") or specs.get("test_report")
+    if isinstance(test_report, str):
+        return json.loads(test_report)
+    return test_report
+
+
+def make_test_report_commands(test_report) -> list:
+    """
+    Commands that print the test report files matching `test_report["paths"]`
+    (shell globs, relative to the repo directory) between START_TEST_REPORT /
+    END_TEST_REPORT markers, with tracing off so the markers only appear once.
+    """
+    if not test_report or not test_report.get("paths"):
+        return []
+    return [
+        "{ set +x; } 2>/dev/null; "
+        f"for f in {' '.join(test_report['paths'])}; do "
+        f'[ -f "$f" ] && {{ echo "{START_TEST_REPORT}"; cat "$f"; echo; '
+        f'echo "{END_TEST_REPORT}"; }}; '
+        "done; set -x"
+    ]
+
+
+def make_clear_test_report_commands(test_report) -> list:
+    """
+    Commands that remove the test report files matching `test_report["paths"]`
+    before the tests run, so reports left in the image (or by a previous run in
+    the container) are not graded as this run's results.
+    """
+    if not test_report or not test_report.get("paths"):
+        return []
+    return [
+        "{ set +x; } 2>/dev/null; "
+        f"rm -f {' '.join(test_report['paths'])}; "
+        "set -x"
+    ]
+
+
 # MARK: Script Creation Functions
 
 
@@ -90,7 +137,9 @@ def make_eval_script_list_common(
         apply_test_patch_command,
         *build_commands,
         f": '{START_TEST_OUTPUT}'",
+        *make_clear_test_report_commands(get_test_report(instance, specs)),
         *test_commands,
+        *make_test_report_commands(get_test_report(instance, specs)),
         f": '{END_TEST_OUTPUT}'",
         reset_tests_command,
     ]
@@ -1,10 +1,12 @@
+import asyncio
 import json
 import re
 import requests
 import traceback
 
 from argparse import ArgumentTypeError
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datasets import Dataset, load_dataset, load_from_disk
 from dotenv import load_dotenv
 from pathlib import Path
@@ -12,9 +14,11 @@ from tqdm import tqdm
 from typing import cast
 from swebench.harness.constants import (
     SWEbenchInstance,
+    FAIL_TO_PASS,
     KEY_INSTANCE_ID,
     KEY_MODEL,
     KEY_PREDICTION,
+    PASS_TO_PASS,
 )
 from unidiff import PatchSet
 
@@ -76,9 +80,155 @@ def get_predictions_from_file(predictions_path: str, dataset_name: str, split: s
     return predictions
 
 
-def run_threadpool(func, payloads, max_workers):
+class ImageScheduler:
+    """
+    Schedules payloads by the Docker images they need.
+
+    Payloads are ordered so that work sharing an image (e.g. env image, then instance
+    image) runs together, at most `max_live_images` distinct images are in use at once,
+    and an image is released as soon as its last consumer finishes.
+
+    An image is "live" from the moment its first consumer starts until its last
+    consumer finishes.
+    """
+
+    def __init__(
+        self, image_keys: list[tuple[str, ...]], max_live_images: int | None = None
+    ):
+        """
+        Args:
+            image_keys (list): Image keys needed by each payload, outermost first
+                (e.g. `(env_image_key, instance_image_key)`)
+            max_live_images (int): Maximum number of distinct live images, None for no limit
+        """
+        self.image_keys = image_keys
+        self.max_live_images = max_live_images
+        self._order = deque(sorted(range(len(image_keys)), key=lambda i: image_keys[i]))
+        self._by_last_key = {}
+        for i in self._order:
+            if image_keys[i]:
+                self._by_last_key.setdefault(image_keys[i][-1], deque()).append(i)
+        self._remaining = Counter(key for keys in image_keys for key in set(keys))
+        self._dispatched = [False] * len(image_keys)
+        self._pending = len(image_keys)
+        self._live = set()
+        self._running = 0
+
+    def __len__(self):
+        """Number of payloads not yet dispatched"""
+        return self._pending
+
+    def next(self) -> int | None:
+        """
+        Return the index of the next payload to run, or None if nothing can start
+        until a running payload finishes (or everything has been dispatched).
+        """
+        # Prefer payloads whose images are all live already
+        for key in list(self._live):
+            queue = self._by_last_key.get(key)
+            while queue and self._dispatched[queue[0]]:
+                queue.popleft()
+            if queue and self._live.issuperset(self.image_keys[queue[0]]):
+                return self._dispatch(queue.popleft())
+        while self._order and self._dispatched[self._order[0]]:
+            self._order.popleft()
+        if not self._order:
+            return None
+        idx = self._order[0]
+        new_images = set(self.image_keys[idx]) - self._live
+        if (
+            self._running
+            and self.max_live_images is not None
+            and len(self._live) + len(new_images) > self.max_live_images
+        ):
+            return None
+        return self._dispatch(self._order.popleft())
+
+    def done(self, idx: int) -> list[str]:
+        """
+        Mark a payload as finished. Returns the images that no longer have any
+        consumers left, innermost first.
+        """
+        self._running -= 1
+        released = []
+        for key in reversed(self.image_keys[idx]):
+            self._remaining[key] -= 1
+            if self._remaining[key] == 0:
+                self._live.discard(key)
+                released.append(key)
+        return released
+
+    def _dispatch(self, idx: int) -> int:
+        self._dispatched[idx] = True
+        self._pending -= 1
+        self._running += 1
+        self._live.update(self.image_keys[idx])
+        return idx
+
+
+def _release_images(released: list[str], on_image_done):
+    for key in released:
+        try:
+            on_image_done(key)
+        except Exception as e:
+            print(f"Error releasing image {key}: {type(e)}: {e}")
+            traceback.print_exc()
+
+
+def run_threadpool(
+    func,
+    payloads,
+    max_workers,
+    image_keys: list[tuple[str, ...]] | None = None,
+    max_live_images: int | None = None,
+    on_image_done=None,
+):
+    """
+    Run a function over a list of payloads in a thread pool.
+
+    If `image_keys` (the images needed by each payload) is given, payloads are
+    scheduled with an ImageScheduler: grouped by image, limited to `max_live_images`
+    distinct images at once, and `on_image_done(image_key)` is called as soon as the
+    last payload needing an image finishes.
+    """
     if max_workers <= 0:
-        return run_sequential(func, payloads)
+        return run_sequential(func, payloads, image_keys, on_image_done)
+    if image_keys is None:
+        return _run_threadpool_unordered(func, payloads, max_workers)
+    scheduler = ImageScheduler(image_keys, max_live_images)
+    succeeded, failed = [], []
+    with tqdm(total=len(payloads), smoothing=0) as pbar:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            while len(scheduler) or futures:
+                # Start as much work as the scheduler allows
+                while len(futures) < max_workers:
+                    idx = scheduler.next()
+                    if idx is None:
+                        break
+                    futures[executor.submit(func, *payloads[idx])] = idx
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx = futures.pop(future)
+                    try:
+                        future.result()
+                        succeeded.append(payloads[idx])
+                    except Exception as e:
+                        print(f"{type(e)}: {e}")
+                        traceback.print_exc()
+                        failed.append(payloads[idx])
+                    if on_image_done is not None:
+                        _release_images(scheduler.done(idx), on_image_done)
+                    else:
+                        scheduler.done(idx)
+                    pbar.update(1)
+                    pbar.set_description(
+                        f"{len(succeeded)} ran successfully, {len(failed)} failed"
+                    )
+    return succeeded, failed
+
+
+def _run_threadpool_unordered(func, payloads, max_workers):
     succeeded, failed = [], []
     with tqdm(total=len(payloads), smoothing=0) as pbar:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -102,30 +252,100 @@ def run_threadpool(func, payloads, max_workers):
     return succeeded, failed
 
 
-def run_sequential(func, args_list):
+async def run_async_pool(
+    coro_func,
+    payloads,
+    max_concurrency,
+    image_keys: list[tuple[str, ...]] | None = None,
+    max_live_images: int | None = None,
+    on_image_done=None,
+):
+    """
+    Asyncio counterpart of `run_threadpool`: run a coroutine function over a list of
+    payloads with at most `max_concurrency` tasks in flight on the current event loop.
+
+    Scheduling by `image_keys` works as in `run_threadpool`; `on_image_done` is a
+    regular (blocking) function and is run in a worker thread.
+    """
+    if image_keys is None:
+        image_keys = [() for _ in payloads]
+    scheduler = ImageScheduler(image_keys, max_live_images)
+    max_concurrency = max(max_concurrency, 1)
+    succeeded, failed = [], []
+    with tqdm(total=len(payloads), smoothing=0) as pbar:
+        tasks = {}
+        while len(scheduler) or tasks:
+            while len(tasks) < max_concurrency:
+                idx = scheduler.next()
+                if idx is None:
+                    break
+                tasks[asyncio.ensure_future(coro_func(*payloads[idx]))] = idx
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                idx = tasks.pop(task)
+                try:
+                    task.result()
+                    succeeded.append(payloads[idx])
+                except Exception as e:
+                    print(f"{type(e)}: {e}")
+                    traceback.print_exc()
+                    failed.append(payloads[idx])
+                released = scheduler.done(idx)
+                if on_image_done is not None and released:
+                    await asyncio.to_thread(_release_images, released, on_image_done)
+                pbar.update(1)
+                pbar.set_description(
+                    f"{len(succeeded)} ran successfully, {len(failed)} failed"
+                )
+    return succeeded, failed
+
+
+def run_sequential(func, args_list, image_keys=None, on_image_done=None):
     """
     Run a function with a list of arguments sequentially
     """
+    order = range(len(args_list))
+    scheduler = None
+    if image_keys is not None:
+        scheduler = ImageScheduler(image_keys)
+        order = iter(scheduler.next, None)
     succeeded, failed = [], []
     pbar = tqdm(total=len(args_list), smoothing=0)
-    for args in args_list:
+    for idx in order:
+        args = args_list[idx]
         try:
             func(*args)
             succeeded.append(args)
         except Exception:
             traceback.print_exc()
             failed.append(args)
+        if scheduler is not None:
+            released = scheduler.done(idx)
+            if on_image_done is not None:
+                _release_images(released, on_image_done)
         pbar.update(1)
         pbar.set_description(f"{len(succeeded)} ran successfully, {len(failed)} failed")
     pbar.close()
     return succeeded, failed
 
 
+def decode_test_lists(instance: dict) -> SWEbenchInstance:
+    """
+    Decode the FAIL_TO_PASS / PASS_TO_PASS fields of an instance in place, if they
+    are JSON strings, so they are not decoded again for every TestSpec made from it.
+    """
+    for key in (FAIL_TO_PASS, PASS_TO_PASS):
+        if isinstance(instance.get(key), str):
+            instance[key] = json.loads(instance[key])
+    return cast(SWEbenchInstance, instance)
+
+
 def load_swebench_dataset(
     name="SWE-bench/SWE-bench", split="test", instance_ids=None
 ) -> list[SWEbenchInstance]:
     """
-    Load SWE-bench dataset from Hugging Face Datasets or local .json/.jsonl file
+    Load SWE-bench dataset from Hugging Face Datasets or local .json/.jsonl file.
+    The FAIL_TO_PASS / PASS_TO_PASS test lists are decoded once, here.
     """
     # check that all instance IDs are in the dataset
     if instance_ids:
@@ -165,7 +385,7 @@ def load_swebench_dataset(
             for instance in dataset
             if instance[KEY_INSTANCE_ID] in instance_ids
         ]
-    return [cast(SWEbenchInstance, instance) for instance in dataset]
+    return [decode_test_lists(instance) for instance in dataset]
 
 
 ### MARK - Patch Correction
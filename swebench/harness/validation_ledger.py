@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+from pathlib import Path
+
+# Phases of run_validation.run_instance, in order
+IMAGE_READY = "image_ready"
+PRE_DONE = "pre_done"
+POST_DONE = "post_done"
+CLASSIFIED = "classified"
+PHASES = [IMAGE_READY, PRE_DONE, POST_DONE, CLASSIFIED]
+
+
+class ValidationLedger:
+    """
+    Append-only JSONL record of the phases each instance of a validation run has
+    completed, so a restarted run can resume each instance from its last
+    completed phase instead of from scratch.
+
+    Each line is `{"instance_id": ..., "phase": ..., "time": ...}`. Lines are
+    appended (and flushed) as phases complete, from any worker thread; a partial
+    last line left by a crash is ignored when the ledger is loaded.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._done: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+        self._partial = False  # whether the file ends with a partial line
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    self._partial = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._done.setdefault(record["instance_id"], set()).add(
+                        record["phase"]
+                    )
+
+    def record(self, instance_id: str, phase: str):
+        """Record that `instance_id` has completed `phase`"""
+        if phase not in PHASES:
+            raise ValueError(f"Unknown validation phase: {phase}")
+        record = {"instance_id": instance_id, "phase": phase, "time": time.time()}
+        with self._lock:
+            self._done.setdefault(instance_id, set()).add(phase)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                if self._partial:
+                    f.write("\n")
+                    self._partial = False
+                f.write(json.dumps(record) + "\n")
+
+    def done(self, instance_id: str, phase: str) -> bool:
+        """Whether `instance_id` has completed `phase`"""
+        return phase in self._done.get(instance_id, ())
+
+    def last_phase(self, instance_id: str) -> str | None:
+        """Last phase (in PHASES order) `instance_id` has completed, if any"""
+        done = [phase for phase in PHASES if self.done(instance_id, phase)]
+        return done[-1] if done else None
@@ -0,0 +1,64 @@
+import threading
+
+from swebench.harness.build_graph import BuildGraph, run_build_graph
+
+
+def make_graph(build=lambda name: None):
+    graph = BuildGraph()
+    graph.add("base", "base", build, ("base",))
+    graph.add("env_fast", "env", build, ("env_fast",), parent="base")
+    graph.add("env_slow", "env", build, ("env_slow",), parent="base")
+    graph.add("inst_fast", "instance", build, ("inst_fast",), parent="env_fast")
+    for i in range(3):
+        name = f"inst_slow{i}"
+        graph.add(name, "instance", build, (name,), parent="env_slow")
+    return graph
+
+
+def test_build_graph_orders_by_dependencies_and_critical_path():
+    graph = make_graph()
+    assert graph.next().image_name == "base"
+    # Nothing else is ready until the base image is built
+    assert graph.next() is None
+    graph.done("base", True)
+    # Both env images are ready as soon as the base image is built
+    first = graph.next().image_name
+    second = graph.next().image_name
+    assert {first, second} == {"env_fast", "env_slow"}
+    # Instances of an env image start as soon as it is built
+    graph.done("env_fast", True)
+    assert graph.next().image_name == "inst_fast"
+    graph.done("env_slow", False)
+    assert graph.next() is None
+    assert sorted(graph.skipped) == ["inst_slow0", "inst_slow1", "inst_slow2"]
+    assert len(graph) == 0
+
+
+def test_build_graph_prefers_critical_path():
+    graph = BuildGraph()
+    build = lambda name: None
+    graph.add("lone_instance", "instance", build, ("lone_instance",), parent="x")
+    graph.add("env", "env", build, ("env",), parent="y")
+    graph.add("inst", "instance", build, ("inst",), parent="env")
+    assert graph.next().image_name == "env"
+    assert graph.next().image_name == "lone_instance"
+
+
+def test_run_build_graph_builds_instances_before_slow_env_finishes():
+    env_slow_done = threading.Event()
+    order = []
+
+    def build(name):
+        if name == "env_slow":
+            # Wait until the instance of the other env image is built
+            assert env_slow_done.wait(5)
+        order.append(name)
+        if name == "inst_fast":
+            env_slow_done.set()
+        if name == "inst_slow1":
+            raise RuntimeError(name)
+
+    successful, failed = run_build_graph(make_graph(build), max_workers=2)
+    assert order.index("inst_fast") < order.index("env_slow")
+    assert failed == ["inst_slow1"]
+    assert len(successful) == 6
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from swebench.harness.buildkit import (
+    CONDA_PKGS_DIRS,
+    BuildKitBuilder,
+    add_cache_mounts,
+)
+
+ENV_DOCKERFILE = """FROM --platform=linux/x86_64 sweb.base.py.x86_64:latest
+
+COPY ./setup_env.sh /root/
+RUN sed -i -e 's/\\r$//' /root/setup_env.sh
+RUN /bin/bash -c "source ~/.bashrc && /root/setup_env.sh"
+"""
+
+
+def test_add_cache_mounts_only_to_install_steps():
+    dockerfile = add_cache_mounts(ENV_DOCKERFILE)
+    lines = dockerfile.splitlines()
+    assert lines[0] == "# syntax=docker/dockerfile:1"
+    # Conda's cache directory is a build argument of the stage, not a variable of
+    # the install command (which would only reach the first command of a chain)
+    assert lines[2] == f"ARG CONDA_PKGS_DIRS={CONDA_PKGS_DIRS}"
+    assert lines[5] == "RUN sed -i -e 's/\\r$//' /root/setup_env.sh"
+    assert lines[6].startswith("RUN --mount=type=cache,target=/root/.cache/pip")
+    assert lines[6].endswith(
+        'sharing=shared /bin/bash -c "source ~/.bashrc && /root/setup_env.sh"'
+    )
+    # Idempotent
+    assert add_cache_mounts(dockerfile) == dockerfile
+    # Crate sources are extracted into the image, only the downloads are cached
+    assert "target=/root/.cargo/registry/cache," in lines[6]
+    assert "target=/root/.cargo/registry," not in lines[6]
+    assert "target=/root/.npm/_cacache," in lines[6]
+    assert "target=/root/.npm," not in lines[6]
+
+
+def test_build_command_imports_own_and_parent_caches(tmp_path):
+    (tmp_path / "sweb.base.py.x86_64__latest").mkdir()
+    (tmp_path / "sweb.base.py.x86_64__latest" / "index.json").write_text("{}")
+    builder = BuildKitBuilder(cache_dir=tmp_path)
+    command = builder.build_command(
+        "sweb.env.py.x86_64.abc:latest", Path("/build"), ENV_DOCKERFILE, "linux/x86_64"
+    )
+    assert command[:3] == ["docker", "buildx", "build"]
+    assert command[command.index("--cache-from") + 1] == (
+        f"type=local,src={tmp_path / 'sweb.base.py.x86_64__latest'}"
+    )
+    assert command.count("--cache-from") == 1  # no cache exported for the env image yet
+    assert command[command.index("--cache-to") + 1] == (
+        f"type=local,dest={tmp_path / 'sweb.env.py.x86_64.abc__latest'},mode=max"
+    )
+    registry = BuildKitBuilder(cache_registry="localhost:5000/sweb-cache")
+    command = registry.build_command(
+        "sweb.env.py.x86_64.abc:latest", Path("/build"), ENV_DOCKERFILE, "linux/x86_64"
+    )
+    assert command.count("--cache-from") == 2
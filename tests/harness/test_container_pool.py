@@ -0,0 +1,124 @@
+import itertools
+import logging
+import subprocess
+
+from types import SimpleNamespace
+
+import pytest
+
+from swebench.harness import container_pool
+from swebench.harness.constants import DOCKER_PATCH, DOCKER_WORKDIR
+from swebench.harness.container_pool import ContainerPool
+
+LOGGER = logging.getLogger("test_container_pool")
+
+
+class FakeContainer:
+    """
+    Container whose execs run locally, with DOCKER_WORKDIR mapped to `repo` (and the
+    files the reset removes next to it)
+    """
+
+    ids = itertools.count()
+
+    def __init__(self, repo):
+        self.id = f"c{next(self.ids)}"
+        self.name = self.id
+        self.repo = repo
+        self.removed = False
+
+    def start(self):
+        pass
+
+    def exec_run(self, cmd, user=None):
+        script = (
+            cmd[-1]
+            .replace(DOCKER_WORKDIR, str(self.repo))
+            .replace(DOCKER_PATCH, str(self.repo.parent / "patch.diff"))
+            .replace(" /eval.sh", f" {self.repo.parent / 'eval.sh'}")
+        )
+        proc = subprocess.run(
+            ["/bin/bash", "-c", script], capture_output=True, cwd=self.repo
+        )
+        return SimpleNamespace(exit_code=proc.returncode, output=proc.stdout + proc.stderr)
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+def git(repo, *args):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    (tmp_path / ".gitignore").write_text("*.xml\n")
+    (tmp_path / "a.py").write_text("a = 1\n")
+    git(tmp_path, "add", ".")
+    git(
+        tmp_path, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "base"
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def pool(repo, monkeypatch):
+    monkeypatch.setattr(
+        container_pool, "build_container", lambda *args, **kwargs: FakeContainer(repo)
+    )
+    return ContainerPool(client=None, run_id="test")
+
+
+def make_spec(build_commands=()):
+    return SimpleNamespace(
+        instance_id="owner__repo-1",
+        instance_image_key="sweb.eval.x86_64.owner__repo-1:latest",
+        build_commands=list(build_commands),
+        get_instance_container_name=lambda run_id: f"sweb.eval.owner__repo-1.{run_id}",
+    )
+
+
+def test_release_resets_the_repo_including_ignored_files(pool, repo):
+    spec = make_spec()
+    container = pool.acquire(spec, LOGGER, nocache=False)
+    (repo / "a.py").write_text("a = 2\n")
+    (repo / "new.py").write_text("")
+    (repo / "report.xml").write_text("<testsuite/>")  # ignored by .gitignore
+    pool.release(container, LOGGER)
+    assert not container.removed
+    assert (repo / "a.py").read_text() == "a = 1\n"
+    assert not (repo / "new.py").exists()
+    assert not (repo / "report.xml").exists()
+    assert pool.acquire(spec, LOGGER, nocache=False) is container
+
+
+def test_containers_of_failed_runs_are_not_pooled(pool):
+    spec = make_spec()
+    container = pool.acquire(spec, LOGGER, nocache=False)
+    pool.release(container, LOGGER, reusable=False)
+    assert container.removed
+    assert pool.acquire(spec, LOGGER, nocache=False) is not container
+
+
+def test_containers_of_specs_that_build_are_not_pooled(pool):
+    spec = make_spec(["make"])
+    container = pool.acquire(spec, LOGGER, nocache=False)
+    pool.release(container, LOGGER)
+    assert container.removed
+
+
+def test_containers_with_ignored_files_at_start_are_not_pooled(pool, repo):
+    (repo / "build.xml").write_text("")
+    container = pool.acquire(make_spec(), LOGGER, nocache=False)
+    pool.release(container, LOGGER)
+    assert container.removed
+
+
+def test_evict_removes_idle_containers_of_an_image(pool):
+    spec = make_spec()
+    container = pool.acquire(spec, LOGGER, nocache=False)
+    pool.release(container, LOGGER)
+    pool.evict(spec.instance_image_key)
+    assert container.removed
+    assert pool.acquire(spec, LOGGER, nocache=False) is not container
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import shutil
+import struct
+import tempfile
+
+from pathlib import Path
+
+import pytest
+
+from swebench.harness.constants import DOCKER_KILL_PROCESSES
+from swebench.harness.docker_async import AsyncDockerClient, AsyncDockerError
+
+
+def frame(stream: int, payload: bytes) -> bytes:
+    """Frame of the multiplexed stream of an exec (1 = stdout, 2 = stderr)"""
+    return struct.pack(">BxxxL", stream, len(payload)) + payload
+
+
+class FakeDocker:
+    """
+    Docker Engine API over a unix socket, serving the requests AsyncDockerClient
+    makes to run an exec. The exec `run` writes `frames` then either exits or,
+    if `hang` is set, runs until it is killed.
+    """
+
+    def __init__(self, socket_path: str, frames=(), hang=False):
+        self.socket_path = socket_path
+        self.frames = list(frames)
+        self.hang = hang
+        self.execs = {}  # exec ID -> create request body
+        self.killed = asyncio.Event()
+        self.streaming = asyncio.Event()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_unix_server(self.handle, self.socket_path)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        method, path, _ = (await reader.readline()).decode().split()
+        headers = {}
+        while (line := await reader.readline()) != b"\r\n":
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        try:
+            await self.route(method, path, json.loads(body) if body else None, writer)
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body, writer):
+        if path == "/chunked":
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                b"6;ext=1\r\n{\"a\": \r\n2\r\n1}\r\n0\r\n\r\n"
+            )
+        elif path == "/missing":
+            self.respond(writer, 404, {"message": "No such container: c"})
+        elif method == "POST" and path == "/containers/c/exec":
+            exec_id = "kill" if body["Cmd"] == DOCKER_KILL_PROCESSES else "run"
+            self.execs[exec_id] = body
+            self.respond(writer, 201, {"Id": exec_id})
+        elif path == "/exec/run/json":
+            running = self.hang and not self.killed.is_set()
+            self.respond(writer, 200, {"Running": running, "ExitCode": 3})
+        elif path == "/exec/kill/start":
+            self.killed.set()
+            self.respond(writer, 200, None)
+        elif path == "/exec/run/start":
+            writer.write(
+                b"HTTP/1.1 101 UPGRADED\r\n"
+                b"Content-Type: application/vnd.docker.raw-stream\r\n"
+                b"Connection: Upgrade\r\nUpgrade: tcp\r\n\r\n"
+            )
+            for data in self.frames:
+                writer.write(data)
+                await writer.drain()
+            self.streaming.set()
+            if self.hang:
+                await self.killed.wait()
+        else:
+            self.respond(writer, 500, {"message": f"unexpected {method} {path}"})
+
+    @staticmethod
+    def respond(writer, status, data):
+        payload = json.dumps(data).encode() if data is not None else b""
+        writer.write(
+            f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode()
+            + payload
+        )
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to ~100 characters, so not under tmp_path
+    tmp_dir = tempfile.mkdtemp(prefix="docker")
+    yield str(Path(tmp_dir) / "docker.sock")
+    shutil.rmtree(tmp_dir)
+
+
+def test_request_reads_chunked_bodies_and_raises_api_errors(socket_path):
+    async def main():
+        client = AsyncDockerClient(socket_path)
+        async with FakeDocker(socket_path):
+            assert await client.request("GET", "/chunked") == {"a": 1}
+            with pytest.raises(AsyncDockerError) as e:
+                await client.request("GET", "/missing")
+            assert (e.value.status, e.value.message) == (404, "No such container: c")
+
+    asyncio.run(main())
+
+
+def test_exec_run_demultiplexes_the_output_stream(socket_path):
+    stdout = frame(1, b"collected 2 items\n")
+    frames = [
+        stdout[:3],  # header split across reads
+        stdout[3:] + frame(2, b"warning\n"),
+        frame(1, b""),
+        frame(1, b"PASSED a\n"),
+    ]
+
+    async def main():
+        client = AsyncDockerClient(socket_path)
+        async with FakeDocker(socket_path, frames) as docker:
+            result = await client.exec_run("c", "/bin/bash /eval.sh", user="nonroot")
+            assert docker.execs["run"]["Cmd"] == ["/bin/bash", "/eval.sh"]
+            assert docker.execs["run"]["User"] == "nonroot"
+            assert not docker.killed.is_set()
+        return result
+
+    exit_code, output, timed_out, _ = asyncio.run(main())
+    assert (exit_code, timed_out) == (3, False)
+    assert output == b"collected 2 items\nwarning\nPASSED a\n"
+
+
+def test_exec_run_kills_the_command_on_timeout_or_cancel(socket_path):
+    frames = [frame(1, b"running\n")]
+
+    async def timeout():
+        client = AsyncDockerClient(socket_path)
+        async with FakeDocker(socket_path, frames, hang=True) as docker:
+            result = await client.exec_run("c", ["sleep", "inf"], timeout=0.5)
+            assert docker.killed.is_set()
+        return result
+
+    exit_code, output, timed_out, _ = asyncio.run(timeout())
+    assert (exit_code, output, timed_out) == (None, b"running\n", True)
+
+    async def cancel():
+        client = AsyncDockerClient(socket_path)
+        async with FakeDocker(socket_path, frames, hang=True) as docker:
+            task = asyncio.create_task(client.exec_run("c", ["sleep", "inf"]))
+            await docker.streaming.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert docker.killed.is_set()
+
+    asyncio.run(cancel())
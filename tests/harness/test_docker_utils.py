@@ -0,0 +1,53 @@
+import io
+import tarfile
+
+import pytest
+
+from swebench.harness.constants import (
+    APPLY_PATCH_STRATEGY,
+    GIT_DIFF_HASH,
+    GIT_DIFF_OUTPUT,
+)
+from swebench.harness.docker_utils import make_archive, parse_apply_patch_output
+
+
+def test_make_archive_holds_files_without_directory_entries():
+    data = make_archive({"/tmp/patch.diff": "diff --git", "/eval.sh": b"echo hi\n"})
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        members = tar.getmembers()
+        assert [m.name for m in members] == ["tmp/patch.diff", "eval.sh"]
+        assert all(m.isfile() for m in members)
+        assert tar.extractfile("eval.sh").read() == b"echo hi\n"
+
+
+def test_make_archive_sets_file_modes():
+    data = make_archive({"/eval.sh": "echo hi", "/tmp/a": "a"}, {"/eval.sh": 0o755})
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        assert tar.getmember("eval.sh").mode == 0o755
+        assert tar.getmember("tmp/a").mode == 0o644
+
+
+def test_make_archive_rejects_relative_paths():
+    with pytest.raises(ValueError):
+        make_archive({"eval.sh": "echo hi"})
+
+
+def test_parse_apply_patch_output():
+    output = (
+        "error: patch failed: a.py:1\n"
+        "Failed to apply patch to container: git apply --verbose\n"
+        "Applied patch a.py with 1 reject...\n"
+        f"{APPLY_PATCH_STRATEGY} git apply --verbose --reject\n"
+        f"{GIT_DIFF_OUTPUT}\n"
+        "diff --git a/a.py b/a.py\n"
+        f"{GIT_DIFF_HASH} 0123abcd\n"
+    )
+    result = parse_apply_patch_output(0, output)
+    assert result.applied
+    assert result.strategy == "git apply --verbose --reject"
+    assert result.diff_hash == "0123abcd"
+    assert result.diff == "diff --git a/a.py b/a.py"
+    assert result.output.endswith("1 reject...\n")
+
+    failed = parse_apply_patch_output(1, "Failed to apply patch to container: patch\n")
+    assert not failed.applied and failed.strategy is None and failed.diff_hash is None
@@ -0,0 +1,128 @@
+import os
+import random
+import time
+
+from swebench.harness import grading, parsed_log_cache, run_validation
+from swebench.harness.constants import (
+    END_TEST_OUTPUT,
+    FAIL_TO_FAIL,
+    FAIL_TO_PASS,
+    PASS_TO_FAIL,
+    PASS_TO_PASS,
+    START_TEST_OUTPUT,
+    EvalType,
+)
+from swebench.harness.constants import TestStatus as Status
+
+
+def check_test_cases_per_test(test_cases, sm, eval_type):
+    """Per-test grading, as get_eval_tests_report used to do it"""
+    success, failed = [], []
+    for test_case in test_cases:
+        if eval_type == EvalType.FAIL_ONLY:
+            if sm.get(test_case) == Status.FAILED.value:
+                failed.append(test_case)
+            else:
+                success.append(test_case)
+        elif grading.test_passed(test_case, sm):
+            success.append(test_case)
+        elif grading.test_failed(test_case, sm):
+            failed.append(test_case)
+    return success, failed
+
+
+def test_get_eval_tests_report_matches_per_test_grading():
+    rng = random.Random(0)
+    tests = [f"tests/a.py::test_{i}[{i % 7}]" for i in range(200)]
+    statuses = [x.value for x in Status]
+    for eval_type in EvalType:
+        sm = {t: rng.choice(statuses) for t in tests if rng.random() < 0.8}
+        # Gold lists keep their order and duplicates in the report
+        gold = {
+            key: rng.sample(tests, 50) + tests[:3]
+            for key in [FAIL_TO_PASS, PASS_TO_PASS, FAIL_TO_FAIL, PASS_TO_FAIL]
+        }
+        report = grading.get_eval_tests_report(
+            sm, gold, calculate_to_fail=True, eval_type=eval_type
+        )
+        for key, test_cases in gold.items():
+            success, failed = check_test_cases_per_test(test_cases, sm, eval_type)
+            assert report[key] == {"success": success, "failure": failed}
+
+
+def test_get_logs_eval_caches_parsed_log_next_to_log(tmp_path):
+    test_spec = run_validation.make_test_spec(
+        {
+            "instance_id": "owner__repo-1",
+            "repo": "owner/repo",
+            "base_commit": "abc123",
+            "test_patch": "",
+            "test_cmds": ["pytest -rA"],
+            "log_parser": "pytest",
+        }
+    )
+    log = tmp_path / "test_output.txt"
+    log.write_text(f"{START_TEST_OUTPUT}\nPASSED tests/a.py::t\n{END_TEST_OUTPUT}\n")
+    expected = ({"tests/a.py::t": "PASSED"}, True)
+    assert grading.get_logs_eval(test_spec, str(log)) == expected
+    cache_path = parsed_log_cache.get_cache_path(log)
+    assert cache_path == tmp_path / "test_output.parsed.json"
+
+    # Cached results are returned for the same log and parser version
+    cache_path.write_text(cache_path.read_text().replace('"PASSED"', '"XFAIL"'))
+    assert grading.get_logs_eval(test_spec, str(log)) == (
+        {"tests/a.py::t": "XFAIL"},
+        True,
+    )
+    # ... but not once the log changes
+    log.write_text(f"{START_TEST_OUTPUT}\nFAILED tests/a.py::t\n{END_TEST_OUTPUT}\n")
+    assert grading.get_logs_eval(test_spec, str(log)) == (
+        {"tests/a.py::t": "FAILED"},
+        True,
+    )
+    assert grading.get_logs_eval(test_spec, str(log), use_cache=False) == (
+        {"tests/a.py::t": "FAILED"},
+        True,
+    )
+
+
+def test_parsed_log_cache_is_only_written_when_it_changes(tmp_path, monkeypatch):
+    test_spec = run_validation.make_test_spec(
+        {
+            "instance_id": "owner__repo-1",
+            "repo": "owner/repo",
+            "base_commit": "abc123",
+            "test_patch": "",
+            "test_cmds": ["pytest -rA"],
+            "log_parser": "pytest",
+        }
+    )
+    log = tmp_path / "test_output.txt"
+    log.write_text(f"{START_TEST_OUTPUT}\nPASSED tests/a.py::t\n{END_TEST_OUTPUT}\n")
+    old = time.time_ns() - 10 * parsed_log_cache.RACY_WINDOW_NS
+    os.utime(log, ns=(old, old))
+    writes = []
+    write = parsed_log_cache.ParsedLogCache._write
+    monkeypatch.setattr(
+        parsed_log_cache.ParsedLogCache,
+        "_write",
+        lambda self, entry: writes.append(entry) or write(self, entry),
+    )
+    expected = ({"tests/a.py::t": "PASSED"}, True)
+    assert grading.get_logs_eval(test_spec, str(log)) == expected
+    assert len(writes) == 1
+    # The key covers the grading code, not only the parser
+    grading_hash = parsed_log_cache._module_source_hash("swebench.harness.grading")
+    assert grading_hash in writes[0]["parser_version"]
+
+    def parse_logs_eval(*args):
+        raise AssertionError("cached log parsed again")
+
+    monkeypatch.setattr(grading, "parse_logs_eval", parse_logs_eval)
+    assert grading.get_logs_eval(test_spec, str(log)) == expected
+    assert len(writes) == 1
+    # Same content with a new mtime: the cached stat is updated, once
+    os.utime(log, ns=(old + 1, old + 1))
+    assert grading.get_logs_eval(test_spec, str(log)) == expected
+    assert grading.get_logs_eval(test_spec, str(log)) == expected
+    assert len(writes) == 2 and writes[1]["stat"][1] == old + 1
@@ -0,0 +1,72 @@
+import json
+
+from swebench.harness.image_cache import ImageCache, parse_size
+
+GB = 1 << 30
+
+
+class FakeClient:
+    """Docker client with images of the given (unshared) sizes in GB"""
+
+    def __init__(self, sizes):
+        self.sizes = dict(sizes)
+        self.images = self
+
+    def df(self):
+        return {
+            "LayersSize": sum(self.sizes.values()) * GB,
+            "Images": [
+                {
+                    "Id": f"sha256:{name}",
+                    "RepoTags": [name],
+                    "Size": size * GB,
+                    "SharedSize": 0,
+                    "Created": 0,
+                }
+                for name, size in self.sizes.items()
+            ],
+        }
+
+    def remove(self, name, force=False):
+        del self.sizes[name]
+
+
+def test_image_cache_evicts_lru_instance_images_first(tmp_path):
+    client = FakeClient(
+        {
+            "sweb.base.py.x86_64:latest": 2,
+            "sweb.env.py.x86_64.a:latest": 4,
+            "sweb.eval.x86_64.old:latest": 3,
+            "sweb.eval.x86_64.new:latest": 3,
+            "sweb.eval.x86_64.pending:latest": 3,
+            "python:3.11": 5,
+        }
+    )
+    state_path = tmp_path / "image_cache.json"
+    cache = ImageCache(client, "17GB", state_path)
+    cache.protect(["sweb.eval.x86_64.pending:latest"])
+    cache.touch("sweb.eval.x86_64.old:latest")
+    cache.touch("sweb.eval.x86_64.new:latest")
+    # 20 GB used: evicting the least recently used instance image is enough
+    assert cache.enforce() == ["sweb.eval.x86_64.old:latest"]
+    assert cache.usage == 17 * GB
+
+    cache.budget = parse_size("6GB")
+    evicted = cache.enforce()
+    # Pending instance images and non-sweb images are never evicted
+    assert evicted == [
+        "sweb.eval.x86_64.new:latest",
+        "sweb.env.py.x86_64.a:latest",
+        "sweb.base.py.x86_64:latest",
+    ]
+    assert set(client.sizes) == {"sweb.eval.x86_64.pending:latest", "python:3.11"}
+
+    cache.release("sweb.eval.x86_64.pending:latest")
+    assert cache.enforce() == ["sweb.eval.x86_64.pending:latest"]
+    assert "sweb.eval.x86_64.pending:latest" not in json.loads(state_path.read_text())
+
+
+def test_parse_size():
+    assert parse_size("1.5TB") == int(1.5 * (1 << 40))
+    assert parse_size("500 gb") == 500 * GB
+    assert parse_size(123) == 123
@@ -0,0 +1,107 @@
+import threading
+
+import docker.errors
+
+from swebench.harness.image_inventory import ImageInventory
+
+
+class FakeImage:
+    def __init__(self, id, tags):
+        self.id = id
+        self.tags = tags
+
+
+class FakeImages:
+    def __init__(self, images):
+        self.images = {image.id: image for image in images}
+        self.calls = {"list": 0, "get": 0}
+
+    def list(self, all=False):
+        self.calls["list"] += 1
+        return list(self.images.values())
+
+    def get(self, name):
+        self.calls["get"] += 1
+        for image in self.images.values():
+            if name == image.id or name in image.tags:
+                return image
+        raise docker.errors.ImageNotFound(name)
+
+
+class FakeClient:
+    def __init__(self, images, events=()):
+        self.images = FakeImages(images)
+        self._events = events
+
+    def events(self, **kwargs):
+        yield from self._events
+
+
+def image_event(action, image_id, name=None):
+    attributes = {"name": name} if name else {}
+    return {
+        "Type": "image",
+        "Action": action,
+        "Actor": {"ID": image_id, "Attributes": attributes},
+    }
+
+
+def test_image_inventory_tracks_image_events():
+    client = FakeClient([FakeImage("sha256:a", ["sweb.env.a:latest"])])
+    inventory = ImageInventory(client, watch=False)
+    assert inventory.exists("sweb.env.a:latest")
+    assert "sweb.eval.b:latest" not in inventory
+
+    # Built image gets tagged
+    client.images.images["sha256:b"] = FakeImage("sha256:b", ["sweb.eval.b:latest"])
+    inventory.handle_event(image_event("tag", "sha256:b", "sweb.eval.b:latest"))
+    assert "sweb.eval.b:latest" in inventory
+
+    # Tag moved from b to a new image c
+    client.images.images["sha256:b"].tags = []
+    client.images.images["sha256:c"] = FakeImage("sha256:c", ["sweb.eval.b:latest"])
+    inventory.handle_event(image_event("tag", "sha256:c", "sweb.eval.b:latest"))
+    inventory.handle_event(image_event("untag", "sha256:b", "sha256:b"))
+    assert inventory.tags() == {"sweb.env.a:latest", "sweb.eval.b:latest"}
+
+    # Image deleted
+    del client.images.images["sha256:c"]
+    inventory.handle_event(image_event("delete", "sha256:c", "sha256:c"))
+    assert inventory.tags() == {"sweb.env.a:latest"}
+
+    inventory.discard("sweb.env.a:latest")
+    assert not inventory.exists("sweb.env.a:latest")
+    # Lookups use the snapshot, not a request per image
+    assert client.images.calls["list"] == 1
+
+
+def test_image_inventory_resnapshots_after_event_stream_ends():
+    client = FakeClient(
+        [FakeImage("sha256:a", ["sweb.env.a:latest"])],
+        events=[{"Type": "container", "Action": "start"}],
+    )
+    inventory = ImageInventory(client)
+    assert inventory.exists("sweb.env.a:latest")
+    inventory._watcher.join(timeout=5)
+    assert inventory._stale
+    client.images.images["sha256:b"] = FakeImage("sha256:b", ["sweb.eval.b:latest"])
+    assert inventory.exists("sweb.eval.b:latest")
+    assert client.images.calls["list"] == 2
+    inventory.close()
+
+
+def test_image_inventory_restarts_a_watcher_that_is_still_exiting():
+    client = FakeClient([FakeImage("sha256:a", ["sweb.env.a:latest"])])
+    inventory = ImageInventory(client)
+    # The previous watcher's stream ended and it marked the inventory stale, but
+    # its thread has not exited yet when the refresh runs
+    exiting = threading.Event()
+    old_watcher = inventory._watcher = threading.Thread(target=exiting.wait, daemon=True)
+    old_watcher.start()
+    inventory._watcher_ended.set()
+    inventory._stale = True
+    assert inventory.exists("sweb.env.a:latest")
+    assert inventory._watcher is not old_watcher
+    assert old_watcher.is_alive()
+    exiting.set()
+    inventory.close()
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import docker.errors
+
+from swebench.harness.image_prefetch import ImagePrefetcher, PullProgress
+
+
+class FakeImage:
+    def __init__(self, name):
+        self.id = f"sha256:{name}"
+        self.tags = [name]
+
+
+class FakeClient:
+    """Docker client whose pulls take `delay` seconds and download one layer"""
+
+    def __init__(self, delay=0.05, existing=()):
+        self.local = {name: FakeImage(name) for name in existing}
+        self.pulled = []
+        self.running = 0
+        self.peak = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.images = self
+        self.api = self
+
+    def list(self, all=False):
+        return list(self.local.values())
+
+    def get(self, name):
+        if name not in self.local:
+            raise docker.errors.ImageNotFound(name)
+        return self.local[name]
+
+    def events(self, **kwargs):
+        yield from ()
+
+    def pull(self, repository, tag=None, stream=False, decode=False):
+        name = f"{repository}:{tag}"
+        with self.lock:
+            self.pulled.append(name)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        yield {"status": "Pulling from repo", "id": tag}
+        for current in (50, 100):
+            time.sleep(self.delay / 2)
+            detail = {"current": current, "total": 100}
+            yield {"status": "Downloading", "id": "layer", "progressDetail": detail}
+        yield {"status": "Pull complete", "id": "layer"}
+        with self.lock:
+            self.running -= 1
+            self.local[name] = FakeImage(name)
+
+
+def test_image_prefetcher_pulls_ahead_with_bounded_concurrency():
+    client = FakeClient(existing=["repo/a:latest"])
+    names = [f"repo/{x}:latest" for x in "aabcde"]
+    prefetcher = ImagePrefetcher(client, names, max_pulls=2, max_ahead=3)
+    # Existing and duplicate images are not pulled
+    assert len(prefetcher) == 4
+    prefetcher.start()
+    time.sleep(0.3)
+    # Only `max_ahead` images are prefetched before any is claimed
+    assert client.pulled == ["repo/b:latest", "repo/c:latest", "repo/d:latest"]
+    assert prefetcher.wait("repo/b:latest")
+    # Not started yet: the caller pulls it itself
+    assert not prefetcher.wait("repo/e:latest")
+    assert prefetcher.wait("repo/c:latest") and prefetcher.wait("repo/d:latest")
+    prefetcher.close()
+    assert client.peak <= 2
+    assert sorted(client.pulled) == names[2:5]
+    assert prefetcher.progress["repo/b:latest"].bytes_done == 100
+    assert prefetcher.summary().startswith("Prefetched 3 images")
+
+
+def test_pull_progress_counts_downloaded_layers():
+    progress = PullProgress("repo/a:latest")
+    for message in [
+        {"status": "Already exists", "id": "l1"},
+        {"status": "Downloading", "id": "l2", "progressDetail": {"current": 5, "total": 10}},
+        {"status": "Downloading", "id": "l3", "progressDetail": {"current": 1, "total": 4}},
+        {"status": "Download complete", "id": "l2"},
+    ]:
+        progress.update(message)
+    assert (progress.bytes_done, progress.bytes_total) == (11, 14)
@@ -0,0 +1,137 @@
+from swebench.harness.constants import END_TEST_OUTPUT, START_TEST_OUTPUT
+from swebench.harness.grading import TestsDoneCondition, get_logs_eval
+from swebench.harness.log_capture import TestOutputCapture
+from swebench.harness.log_parsers import IncrementalLogParser
+from swebench.harness.log_parsers.python import parse_log_django, parse_log_pytest
+from swebench.harness.run_evaluation import make_test_output_capture
+from swebench.harness.test_spec import test_spec as test_spec_module
+
+
+LOG = (
+    "+ git checkout abc\n"
+    f"+ : '{START_TEST_OUTPUT}'\n"
+    "tests/test_a.py::test_é PASSED\n"
+    "tests/test_a.py::test_b FAILED\n"
+    f"+ : '{END_TEST_OUTPUT}'\n"
+    "+ git checkout abc\n"
+).encode()
+
+
+def feed_in_chunks(capture, data, size):
+    for i in range(0, len(data), size):
+        capture.feed(data[i : i + size])
+
+
+def test_capture_streams_to_file_and_keeps_test_output_region(tmp_path):
+    expected = LOG.decode().split(START_TEST_OUTPUT)[1].split(END_TEST_OUTPUT)[0]
+    for size in (1, 3, 7, len(LOG)):
+        path = tmp_path / f"out_{size}.txt"
+        with TestOutputCapture(path) as capture:
+            # Chunk boundaries split markers and multi-byte characters
+            feed_in_chunks(capture, LOG, size)
+        assert path.read_bytes() == LOG
+        assert capture.test_output == expected
+
+
+def test_capture_caps_head_and_tail():
+    body = "".join(f"line {i}\n" for i in range(1000))
+    data = f"{START_TEST_OUTPUT}{body}{END_TEST_OUTPUT}".encode()
+    with TestOutputCapture(max_head=10, max_tail=12) as capture:
+        feed_in_chunks(capture, data, 64)
+        # Output after close is dropped
+    capture.feed(b"late output")
+    assert capture.test_output.startswith(body[:10] + "\n[... ")
+    assert capture.test_output.endswith(body[-12:])
+    assert capture.size == len(data)
+
+
+def make_test_spec(log_parser, fail_to_pass, pass_to_pass):
+    return test_spec_module.TestSpec(
+        instance_id="repo__repo-1",
+        repo="repo/repo",
+        version="1.0",
+        repo_script_list=[],
+        eval_script_list=[],
+        env_script_list=[],
+        arch="x86_64",
+        FAIL_TO_PASS=fail_to_pass,
+        PASS_TO_PASS=pass_to_pass,
+        language="py",
+        docker_specs={},
+        namespace=None,
+        log_parser=log_parser,
+    )
+
+
+PYTEST_LOG = (
+    f"+ : '{START_TEST_OUTPUT}'\n"
+    "PASSED tests/test_a.py::test_a\n"
+    "FAILED tests/test_a.py::test_b - AssertionError\n"
+    "PASSED tests/test_a.py::test_c\n"
+    f"+ : '{END_TEST_OUTPUT}'\n"
+).encode()
+
+
+def test_capture_parses_like_get_logs_eval(tmp_path):
+    for log_parser in (parse_log_pytest, parse_log_django):
+        test_spec = make_test_spec(log_parser, ["tests/test_a.py::test_b"], [])
+        for data in (PYTEST_LOG, PYTEST_LOG.replace(b"End", b"Nope")):
+            path = tmp_path / "out.txt"
+            parser = IncrementalLogParser(log_parser, test_spec)
+            with TestOutputCapture(path, parser=parser) as capture:
+                feed_in_chunks(capture, data, 5)
+            assert capture.logs_eval() == get_logs_eval(test_spec, str(path))
+
+
+def test_capture_stops_once_results_are_decided(tmp_path):
+    test_spec = make_test_spec(
+        parse_log_pytest, ["tests/test_a.py::test_a"], ["tests/test_a.py::test_b"]
+    )
+    parser = IncrementalLogParser(parse_log_pytest, test_spec)
+    with TestOutputCapture(
+        parser=parser, should_stop=TestsDoneCondition(test_spec)
+    ) as capture:
+        stopped = [capture.feed(line) for line in PYTEST_LOG.splitlines(True)]
+    # PASS_TO_PASS test_b failing decides the result before test_c runs (lines are
+    # parsed a chunk late, as the end marker may be split across chunks)
+    assert stopped == [False, False, False, True, True]
+    assert capture.logs_eval() == (
+        {
+            "tests/test_a.py::test_a": "PASSED",
+            "tests/test_a.py::test_b": "FAILED",
+            "tests/test_a.py::test_c": "PASSED",
+        },
+        True,
+    )
+
+
+def test_decide_fast_stops_on_fail_to_pass_failure():
+    test_spec = make_test_spec(
+        parse_log_pytest, ["tests/test_a.py::test_b"], ["tests/test_a.py::test_c"]
+    )
+    failed = {"tests/test_a.py::test_b": "FAILED"}
+    assert not TestsDoneCondition(test_spec)(failed)
+    assert TestsDoneCondition(test_spec, decide_fast=True)(failed)
+
+
+def test_passing_statuses_do_not_stop_the_tests():
+    # pytest -rA reports PASSED before an ERROR in the test's teardown
+    test_spec = make_test_spec(
+        parse_log_pytest, ["tests/test_a.py::test_b"], ["tests/test_a.py::test_c"]
+    )
+    condition = TestsDoneCondition(test_spec, decide_fast=True)
+    assert not condition({"tests/test_a.py::test_b": "PASSED"})
+    assert not condition({"tests/test_a.py::test_c": "PASSED"})
+    assert condition({"tests/test_a.py::test_c": "ERROR"})
+
+
+def test_only_line_local_parsers_parse_while_tests_run(tmp_path):
+    path = tmp_path / "out.txt"
+    test_spec = make_test_spec(parse_log_pytest, ["tests/test_a.py::test_b"], [])
+    with make_test_output_capture(test_spec, path, stop_early=True) as capture:
+        assert capture.parser is not None and capture.should_stop is not None
+    # Would buffer the whole test output until the tests are done
+    test_spec = make_test_spec(parse_log_django, ["tests/test_a.py::test_b"], [])
+    with make_test_output_capture(test_spec, path, stop_early=True) as capture:
+        assert capture.parser is None and capture.should_stop is None
+    assert capture.logs_eval() is None
@@ -0,0 +1,134 @@
+import subprocess
+
+from swebench.harness import grading, run_validation
+from swebench.harness.constants import (
+    END_TEST_OUTPUT,
+    END_TEST_REPORT,
+    START_TEST_OUTPUT,
+    START_TEST_REPORT,
+)
+from swebench.harness.log_parsers import benchmark, structured
+from swebench.harness.log_parsers.python import parse_log_pytest, parse_log_pytest_v2
+
+EDGE_CASES = "\n".join(
+    [
+        "PASSED",
+        "FAILED tests/a.py::test_x - assert 1 - 2",
+        "  PASSED tests/a.py::indented",
+        "PASSEDtests/a.py::glued",
+        "ERROR tests/a.py::test_err\r",
+        "XFAIL tests/a.py::test_xfail reason",
+        "tests/a.py::test_old \x1b[32mPASSED\x1b[0m",
+        "SKIPPED [1] tests/a.py:3: skipped",
+        "",
+    ]
+)
+
+
+def test_pytest_parsers_match_legacy_implementation():
+    log = EDGE_CASES + benchmark.make_log("pytest", 50_000)
+    assert parse_log_pytest(log, None) == benchmark.legacy_parse_log_pytest(log, None)
+    assert parse_log_pytest_v2(log, None) == benchmark.legacy_parse_log_pytest_v2(
+        log, None
+    )
+    assert parse_log_pytest(EDGE_CASES, None)["tests/a.py::test_x"] == "FAILED"
+
+
+def test_junit_report_is_graded_with_fallback_to_console_parser(tmp_path):
+    instance = {
+        "instance_id": "owner__repo-1",
+        "repo": "owner/repo",
+        "base_commit": "abc123",
+        "test_patch": "diff --git a/tests/test_a.py b/tests/test_a.py\n",
+        "test_cmds": ["mvn test"],
+        "log_parser": "pytest",
+        "test_report": {"format": "junit", "paths": ["target/*.xml"]},
+    }
+    test_spec = run_validation.make_test_spec(instance)
+    assert "target/*.xml" in test_spec.eval_script
+    report = (
+        '<?xml version="1.0"?><testsuite>'
+        '<testcase classname="a.FooTest" name="testOk"/>'
+        '<testcase classname="a.FooTest" name="testBad"><failure/></testcase>'
+        '<testcase classname="a.FooTest" name="testSkip"><skipped/></testcase>'
+        "</testsuite>"
+    )
+    log = tmp_path / "test_output.txt"
+    log.write_text(
+        f"{START_TEST_OUTPUT}\nPASSED ignored\n{START_TEST_REPORT}\n{report}\n"
+        f"{END_TEST_REPORT}\n{END_TEST_OUTPUT}\n"
+    )
+    assert grading.get_logs_eval(test_spec, str(log)) == (
+        {
+            "a.FooTest.testOk": "PASSED",
+            "a.FooTest.testBad": "FAILED",
+            "a.FooTest.testSkip": "SKIPPED",
+        },
+        True,
+    )
+    # No report written: fall back to the console log parser
+    log.write_text(f"{START_TEST_OUTPUT}\nPASSED tests/a.py::t\n{END_TEST_OUTPUT}\n")
+    assert grading.get_logs_eval(test_spec, str(log)) == (
+        {"tests/a.py::t": "PASSED"},
+        True,
+    )
+
+
+def test_json_reports_are_read_from_the_console_output():
+    log = "\n".join(
+        [
+            "+ go test -json ./...",
+            '{"Action":"run","Test":"TestA"}',
+            '{"Action":"pass","Test":"TestA"}',
+            '{"Action":"fail","Test":"TestB"}',
+            '{"Action":"pass","Package":"pkg"}',
+        ]
+    )
+    assert structured.parse_test_report(log, {"format": "gotest_json"}) == {
+        "TestA": "PASSED",
+        "TestB": "FAILED",
+    }
+    log = (
+        "yarn run v1\n"
+        '{"testResults":[{"assertionResults":['
+        '{"ancestorTitles":["Map"],"title":"sets","status":"passed"},'
+        '{"ancestorTitles":[],"title":"gets","status":"pending"}]}]}'
+    )
+    assert structured.parse_test_report(log, {"format": "jest_json"}) == {
+        "Map > sets": "PASSED",
+        "gets": "SKIPPED",
+    }
+
+
+def test_leftover_reports_are_removed_before_the_tests_run(tmp_path):
+    instance = {
+        "instance_id": "owner__repo-1",
+        "repo": "owner/repo",
+        "base_commit": "abc123",
+        "test_patch": "diff --git a/tests/test_a.py b/tests/test_a.py\n",
+        "test_cmds": ["echo 'PASSED tests/a.py::t'"],
+        "log_parser": "pytest",
+        "test_report": {"format": "junit", "paths": ["target/*.xml"]},
+    }
+    test_spec = run_validation.make_test_spec(instance)
+    # A report from an earlier run, e.g. left in the image or a pooled container
+    (tmp_path / "target").mkdir()
+    (tmp_path / "target" / "old.xml").write_text(
+        '<testsuite><testcase classname="a.FooTest" name="testOk"/></testsuite>'
+    )
+    lines = test_spec.eval_script_list
+    start = lines.index(f": '{START_TEST_OUTPUT}'")
+    end = lines.index(f": '{END_TEST_OUTPUT}'")
+    output = subprocess.run(
+        ["/bin/bash", "-c", "\n".join(lines[start : end + 1])],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    ).stdout
+    log = tmp_path / "test_output.txt"
+    log.write_text(f"{START_TEST_OUTPUT}\n{output}{END_TEST_OUTPUT}\n")
+    assert not (tmp_path / "target" / "old.xml").exists()
+    assert grading.get_logs_eval(test_spec, str(log)) == (
+        {"tests/a.py::t": "PASSED"},
+        True,
+    )
@@ -0,0 +1,66 @@
+import json
+
+from swebench.harness import grading, regrade
+from swebench.harness.constants import (
+    END_TEST_OUTPUT,
+    LOG_TEST_OUTPUT,
+    START_TEST_OUTPUT,
+    TESTS_TIMEOUT,
+)
+
+INSTANCE = {
+    "instance_id": "owner__repo-1",
+    "repo": "owner/repo",
+    "base_commit": "abc123",
+    "test_patch": "",
+    "log_parser": "pytest",
+    "FAIL_TO_PASS": '["tests/a.py::f2p"]',
+    "PASS_TO_PASS": '["tests/a.py::p2p"]',
+}
+
+
+def test_read_test_output_matches_get_logs_eval(tmp_path):
+    test_spec = regrade.make_grading_spec(INSTANCE)
+    log = tmp_path / LOG_TEST_OUTPUT
+    for content in [
+        f"+ git apply\r\n{START_TEST_OUTPUT}\r\nPASSED tests/a.py::f2p\r\n{END_TEST_OUTPUT}\n",
+        f"{END_TEST_OUTPUT}\n{START_TEST_OUTPUT}\nPASSED tests/a.py::p2p\n",
+        f"{START_TEST_OUTPUT}\nPASSED tests/a.py::p2p\n{TESTS_TIMEOUT}\n{END_TEST_OUTPUT}",
+        "",
+    ]:
+        log.write_bytes(content.encode())
+        expected = grading.get_logs_eval(test_spec, str(log))
+        test_output = regrade.read_test_output(log)
+        if test_output is None:
+            assert expected == ({}, False)
+        else:
+            assert expected == (grading.get_log_parser(test_spec)(test_output, test_spec), True)
+
+
+def test_regrade_instance_writes_report(tmp_path):
+    log_dir = tmp_path / "run" / "model" / INSTANCE["instance_id"]
+    log_dir.mkdir(parents=True)
+    (log_dir / LOG_TEST_OUTPUT).write_text(
+        f"{START_TEST_OUTPUT}\nPASSED tests/a.py::f2p\nPASSED tests/a.py::p2p\n"
+        f"{END_TEST_OUTPUT}\n"
+    )
+    (log_dir / "report.json").write_text(
+        json.dumps({INSTANCE["instance_id"]: {"resolved": False}})
+    )
+    model, report, previous = regrade.regrade_instance(
+        regrade.make_grading_spec(INSTANCE), log_dir
+    )
+    assert (model, report["resolved"], previous) == ("model", True, False)
+    assert json.loads((log_dir / "report.json").read_text()) == {
+        INSTANCE["instance_id"]: report
+    }
+
+
+def test_make_grading_spec_uses_spec_level_test_report(monkeypatch):
+    test_report = {"format": "junit", "paths": ["target/surefire-reports/*.xml"]}
+    monkeypatch.setitem(
+        regrade.MAP_REPO_VERSION_TO_SPECS, "owner/repo", {"1.0": {"test_report": test_report}}
+    )
+    instance = {**INSTANCE, "version": "1.0"}
+    del instance["log_parser"]
+    assert regrade.make_grading_spec(instance).test_report == test_report
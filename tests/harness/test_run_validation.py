@@ -1,7 +1,122 @@
+import json
+
+from types import SimpleNamespace
+
 from swebench.harness import run_validation
+from swebench.harness.constants import START_TEST_OUTPUT
+from swebench.harness.docker_utils import ApplyPatchResult
+from swebench.harness.validation_ledger import (
+    CLASSIFIED,
+    POST_DONE,
+    PRE_DONE,
+    ValidationLedger,
+)
 
 
 def test_is_validated_instance_requires_fail_to_pass():
     assert not run_validation.is_validated_instance(["tests/foo::bar"], [])
     assert run_validation.is_validated_instance([], ["tests/foo::bar"])
     assert run_validation.is_validated_instance(["tests/foo::baz"], ["tests/foo::bar"])
+
+
+INSTANCE = {
+    "instance_id": "owner__repo-1",
+    "repo": "owner/repo",
+    "base_commit": "abc123",
+    "test_patch": "diff --git a/tests/test_a.py b/tests/test_a.py\n",
+    "test_cmds": ["pytest -rA"],
+    "log_parser": "pytest",
+}
+
+
+def test_eval_script_splits_at_test_output_for_snapshots():
+    test_spec = run_validation.make_test_spec(dict(INSTANCE))
+    prepare = test_spec.eval_prepare_script
+    tests = test_spec.eval_tests_script
+    assert "git apply" in prepare and "pytest -rA" not in prepare
+    assert "git apply" not in tests and "pytest -rA" in tests
+    assert START_TEST_OUTPUT not in prepare
+    assert tests.splitlines()[3] == f": '{START_TEST_OUTPUT}'"
+
+
+def test_post_tests_script_rebuilds_after_the_patch():
+    test_spec = run_validation.make_test_spec(
+        {
+            "instance_id": "redis__redis-13115",
+            "repo": "redis/redis",
+            "version": "13115",
+            "base_commit": "abc123",
+            "test_patch": "diff --git a/tests/a.tcl b/tests/a.tcl\n",
+        }
+    )
+    assert test_spec.build_commands == ["make distclean", "make"]
+    assert "make distclean" not in test_spec.eval_tests_script
+    post = test_spec.eval_post_tests_script.splitlines()
+    assert post[3:6] == ["make distclean", "make", f": '{START_TEST_OUTPUT}'"]
+    assert "declare -f" in test_spec.eval_prepare_script
+
+
+def test_get_test_stability_counts_fail_to_pass_runs():
+    runs = [
+        ({"a": "FAILED", "b": "FAILED"}, {"a": "PASSED", "b": "PASSED"}),
+        ({"a": "FAILED", "b": "PASSED"}, {"a": "PASSED", "b": "PASSED"}),
+    ]
+    assert run_validation.get_test_stability(["a", "b"], runs) == {
+        "a": {"runs": 2, "fail_to_pass": 2},
+        "b": {"runs": 2, "fail_to_pass": 1},
+    }
+
+
+def test_make_rerun_spec_selects_only_the_rerun_tests():
+    test_spec = run_validation.make_test_spec(dict(INSTANCE))
+    rerun_spec = run_validation.make_rerun_spec(
+        INSTANCE, test_spec, ["tests/test_a.py::test_x"]
+    )
+    assert "pytest -rA tests/test_a.py::test_x" in rerun_spec.eval_script
+    assert run_validation.make_rerun_spec(
+        {**INSTANCE, "test_cmds": ["./run_tests.sh"]}, test_spec, ["tests/test_a.py::test_x"]
+    ) is None
+
+
+def test_resume_reruns_phases_whose_test_map_is_unreadable(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_validation, "RUN_EVALUATION_LOG_DIR", tmp_path)
+    log_dir = tmp_path / "run" / "gold" / INSTANCE["instance_id"]
+    log_dir.mkdir(parents=True)
+    ledger = ValidationLedger(tmp_path / "ledger.jsonl")
+    ledger.record(INSTANCE["instance_id"], PRE_DONE)
+    ledger.record(INSTANCE["instance_id"], POST_DONE)
+    run_validation.write_test_map(log_dir / "pre_test_map.json", {"t": "FAILED"})
+    # Crash while writing the post patch test map (before it was written atomically)
+    (log_dir / "post_test_map.json").write_text('{"t": "PAS')
+
+    container = SimpleNamespace(id="c", start=lambda: None)
+    monkeypatch.setattr(run_validation, "build_container", lambda *a, **k: container)
+    monkeypatch.setattr(run_validation, "copy_files_to_container", lambda *a: None)
+    monkeypatch.setattr(run_validation, "cleanup_container", lambda *a: None)
+    monkeypatch.setattr(
+        run_validation,
+        "apply_patch",
+        lambda *a, **k: ApplyPatchResult(applied=True, strategy="git apply", output=""),
+    )
+    phases = []
+
+    def run_test_phase(test_spec, container, script, output_path, timeout, logger, phase):
+        phases.append(phase)
+        return {"t": "PASSED"}, True
+
+    monkeypatch.setattr(run_validation, "run_test_phase", run_test_phase)
+    test_spec = run_validation.make_test_spec(dict(INSTANCE))
+    run_validation.run_instance(
+        dict(INSTANCE),
+        test_spec,
+        {"model_name_or_path": "gold", "model_patch": "", "instance_id": "x"},
+        rm_image=False,
+        force_rebuild=False,
+        client=None,
+        run_id="run",
+        ledger=ledger,
+    )
+    assert phases == ["post patch"]
+    assert run_validation.load_test_map(log_dir / "post_test_map.json") == {"t": "PASSED"}
+    assert ledger.done(INSTANCE["instance_id"], CLASSIFIED)
+    assert json.loads((log_dir / "instance.json").read_text())["FAIL_TO_PASS"] == ["t"]
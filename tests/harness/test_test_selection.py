@@ -0,0 +1,59 @@
+from swebench.harness.log_parsers.go import parse_log_gotest
+from swebench.harness.log_parsers.javascript import parse_log_jest
+from swebench.harness.log_parsers.python import parse_log_django, parse_log_pytest
+from swebench.harness.test_spec.test_selection import select_test_cmds
+from swebench.harness.test_spec.test_spec import make_test_spec
+
+
+def test_select_pytest_replaces_test_paths_with_node_ids():
+    selected = select_test_cmds(
+        ["python -m pytest -rA --tb=short -p no:cacheprovider tests/"],
+        parse_log_pytest,
+        ["tests/test_a.py::test_x[a b]", "tests/test_a.py::test_x[c]", "tests/b.py::T::t"],
+    )
+    assert selected == [
+        "python -m pytest -rA --tb=short -p no:cacheprovider "
+        "tests/test_a.py::test_x tests/b.py::T::t"
+    ]
+
+
+def test_select_jest_and_go_test_add_name_patterns():
+    assert select_test_cmds(
+        ["npx jest --verbose src/"], parse_log_jest, ["renders (ok)", "a.b"]
+    ) == ["npx jest -t '(renders \\(ok\\)|a\\.b)$' --verbose src/"]
+    assert select_test_cmds(
+        ["go test -v ./..."], parse_log_gotest, ["TestA/sub", "TestB", "TestA"]
+    ) == ["go test -run '^(TestA|TestB)$' -v ./..."]
+
+
+def test_select_falls_back_to_full_command_when_ambiguous():
+    tests = ["tests/b.py::t"]
+    # Unknown option whose argument may be a value
+    assert select_test_cmds(["pytest --weird tests/"], parse_log_pytest, tests) is None
+    # Shell syntax
+    assert select_test_cmds(["pytest tests/ 2>&1 | tee log"], parse_log_pytest, tests) is None
+    # Not a node ID
+    assert select_test_cmds(["pytest tests/"], parse_log_pytest, ["test_x (a.B)"]) is None
+    # No selector for the parser
+    assert select_test_cmds(["./tests/runtests.py"], parse_log_django, tests) is None
+
+
+def test_select_tests_narrows_the_swe_bench_python_test_command():
+    instance = {
+        "instance_id": "astropy__astropy-1",
+        "repo": "astropy/astropy",
+        "version": "5.0",
+        "base_commit": "abc123",
+        "test_patch": "diff --git a/astropy/tests/test_a.py b/astropy/tests/test_a.py\n",
+        "FAIL_TO_PASS": ["astropy/tests/test_a.py::test_x"],
+        "PASS_TO_PASS": ["astropy/tests/test_a.py::test_y[1]"],
+    }
+    full = make_test_spec(dict(instance), namespace="swebench").eval_script
+    selected = make_test_spec(
+        dict(instance), namespace="swebench", select_tests=True
+    ).eval_script
+    assert "\npytest -rA astropy/tests/test_a.py\n" in full
+    assert (
+        "\npytest -rA astropy/tests/test_a.py::test_x astropy/tests/test_a.py::test_y\n"
+        in selected
+    )
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from swebench.harness.utils import (
+    ImageScheduler,
+    load_swebench_dataset,
+    run_async_pool,
+    run_threadpool,
+)
+
+
+def test_image_scheduler_groups_payloads_by_image():
+    keys = [("env2", "a"), ("env1", "b"), ("env2", "c"), ("env1", "d")]
+    scheduler = ImageScheduler(keys)
+    order = []
+    while (idx := scheduler.next()) is not None:
+        order.append(idx)
+    assert [keys[i][0] for i in order] == ["env1", "env1", "env2", "env2"]
+
+
+def test_image_scheduler_caps_live_images_and_releases_last_consumer():
+    keys = [("env1", "a"), ("env1", "a"), ("env1", "b")]
+    scheduler = ImageScheduler(keys, max_live_images=2)
+    first = scheduler.next()
+    # Shares every image with the running payload, so it can start
+    second = scheduler.next()
+    assert {first, second} == {0, 1}
+    # Would need a third live image
+    assert scheduler.next() is None
+    assert scheduler.done(first) == []
+    assert scheduler.done(second) == ["a"]
+    assert scheduler.next() == 2
+    assert scheduler.done(2) == ["b", "env1"]
+    assert len(scheduler) == 0
+
+
+def test_run_threadpool_releases_each_image_once():
+    keys = [("env1", f"inst{i % 3}") for i in range(9)]
+    released = []
+    succeeded, failed = run_threadpool(
+        lambda x: x,
+        [(i,) for i in range(9)],
+        4,
+        image_keys=keys,
+        max_live_images=2,
+        on_image_done=released.append,
+    )
+    assert len(succeeded) == 9 and not failed
+    assert sorted(released) == ["env1", "inst0", "inst1", "inst2"]
+    assert released[-1] == "env1"
+
+
+def test_run_async_pool_limits_concurrency():
+    running, peak = 0, 0
+
+    async def job(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if i == 3:
+            raise ValueError(i)
+
+    released = []
+    succeeded, failed = asyncio.run(
+        run_async_pool(
+            job,
+            [(i,) for i in range(8)],
+            3,
+            image_keys=[("env1", f"inst{i % 2}") for i in range(8)],
+            on_image_done=released.append,
+        )
+    )
+    assert peak == 3
+    assert len(succeeded) == 7 and failed == [(3,)]
+    assert sorted(released) == ["env1", "inst0", "inst1"]
+
+
+def test_load_swebench_dataset_decodes_test_lists_once(tmp_path):
+    path = tmp_path / "dataset.jsonl"
+    rows = [
+        {"instance_id": "a", "FAIL_TO_PASS": '["t1"]', "PASS_TO_PASS": "[]"},
+        {"instance_id": "b", "FAIL_TO_PASS": ["t2"]},
+    ]
+    path.write_text("\n".join(json.dumps(row) for row in rows))
+    dataset = load_swebench_dataset(str(path))
+    assert dataset[0]["FAIL_TO_PASS"] == ["t1"] and dataset[0]["PASS_TO_PASS"] == []
+    assert dataset[1]["FAIL_TO_PASS"] == ["t2"] and "PASS_TO_PASS" not in dataset[1]
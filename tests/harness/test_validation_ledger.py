@@ -0,0 +1,24 @@
+from swebench.harness.validation_ledger import (
+    CLASSIFIED,
+    IMAGE_READY,
+    PRE_DONE,
+    ValidationLedger,
+)
+
+
+def test_ledger_resumes_from_recorded_phases(tmp_path):
+    path = tmp_path / "run" / "ledger.jsonl"
+    ledger = ValidationLedger(path)
+    ledger.record("a", IMAGE_READY)
+    ledger.record("a", PRE_DONE)
+    ledger.record("b", CLASSIFIED)
+    # A crash mid-write leaves a partial last line
+    with open(path, "a") as f:
+        f.write('{"instance_id": "c", "ph')
+
+    reloaded = ValidationLedger(path)
+    assert reloaded.last_phase("a") == PRE_DONE
+    assert reloaded.done("b", CLASSIFIED)
+    assert reloaded.last_phase("c") is None
+    reloaded.record("c", IMAGE_READY)
+    assert ValidationLedger(path).last_phase("c") == IMAGE_READY